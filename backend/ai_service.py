@@ -1,15 +1,31 @@
 from flask import jsonify
 import requests
+import http_client
 import os
 import json
+import hashlib
+import math
+import time
+
+import settings
+from bulkhead_service import BULKHEADS, BulkheadFull
+from cache_service import SingleFlight, SingleFlightTimeout, SQLiteTTLStore, TTLCache
+from job_service import JobQueue, JobRejected
+from layout_service import compute_layout
 
 # --- CONFIGURATION ---
+settings.load_environment()
+
 # The GEMINI_API_KEY must be set in your backend/.env file
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 # Use the best model for flash and fast generation
 GEMINI_MODEL = "gemini-2.5-flash-preview-09-2025" 
 # Use the correct API URL structure
 GEMINI_API_URL = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
+# Streaming variant; alt=sse makes Gemini send one JSON chunk per SSE 'data:' line
+GEMINI_STREAM_URL = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:streamGenerateContent?alt=sse&key={GEMINI_API_KEY}"
+# Seconds to connect, then the longest allowed gap between streamed chunks
+GEMINI_STREAM_TIMEOUT = (10, 30)
 
 # System instruction is crucial for enforcing the spatial planning constraint (Novelty Claim)
 SYSTEM_PROMPT = (
@@ -20,18 +36,153 @@ SYSTEM_PROMPT = (
     "list formatting."
 )
 
+# --- PLAN CACHE ---
+# Generated plans keyed by a hash of the normalized prompt, SYSTEM_PROMPT and
+# GEMINI_MODEL, so changing either of those never serves an old plan.
+AI_PLAN_CACHE_TTL_SECONDS = int(os.getenv("AI_PLAN_CACHE_TTL_SECONDS", str(60 * 60 * 24)))
+AI_PLAN_CACHE = TTLCache(
+    max_entries=int(os.getenv("AI_PLAN_CACHE_MAX_ENTRIES", "512")),
+    ttl_seconds=AI_PLAN_CACHE_TTL_SECONDS,
+    name='ai_plans'
+)
+
+# Optional on-disk layer that survives restarts and is shared by worker
+# processes. Set AI_PLAN_CACHE_PATH to an empty value to disable it.
+AI_PLAN_CACHE_PATH = os.getenv(
+    "AI_PLAN_CACHE_PATH",
+    os.path.join(settings.BACKEND_DIR, '.cache', 'ai_plans.sqlite3')
+)
+AI_PLAN_STORE = SQLiteTTLStore(
+    AI_PLAN_CACHE_PATH,
+    table='ai_plans',
+    ttl_seconds=AI_PLAN_CACHE_TTL_SECONDS
+) if AI_PLAN_CACHE_PATH else None
+
+# Identical prompts submitted together share one Gemini call. Waiters give up
+# a little after the 30s request timeout.
+AI_PLAN_FILLS = SingleFlight(wait_timeout_seconds=35, name='ai_plans')
+
+# --- PLAN JOBS ---
+# Background plan generation for POST /ai/plan/jobs. A small worker pool runs
+# generate_garden_plan so slow Gemini calls don't hold request threads; jobs
+# are kept in a local SQLite file and resume after a restart.
+AI_JOB_STORE_PATH = os.getenv(
+    "AI_JOB_STORE_PATH",
+    os.path.join(settings.BACKEND_DIR, '.cache', 'ai_jobs.sqlite3')
+)
+AI_PLAN_JOBS = JobQueue(
+    AI_JOB_STORE_PATH,
+    handler=lambda payload: generate_garden_plan(payload["user_input"]),
+    table='ai_plan_jobs',
+    max_workers=int(os.getenv("AI_JOB_WORKERS", "2")),
+    max_queue_depth=int(os.getenv("AI_JOB_MAX_QUEUE_DEPTH", "100")),
+    max_active_per_user=int(os.getenv("AI_JOB_MAX_PER_USER", "2")),
+    # Longer than a Gemini call, so only jobs whose worker died are retried
+    lease_seconds=120,
+    retention_seconds=int(os.getenv("AI_JOB_RETENTION_SECONDS", str(60 * 60 * 24))),
+    name='ai_plan_jobs'
+)
+# Suggested client back-off when a job is rejected
+AI_JOB_RETRY_AFTER_SECONDS = 10
+
+# Largest layout grid whose text map is included in the narrative prompt
+LAYOUT_PROMPT_MAX_MAP_CELLS = 1024
+
+# --- COLLECTION PROMPTS ---
+# Token budget for prompts built from a saved collection. Plants beyond the
+# budget are summarized as a count instead of being sent.
+AI_PROMPT_TOKEN_BUDGET = int(os.getenv("AI_PROMPT_TOKEN_BUDGET", "600"))
+# Rough size of a Gemini token in English text, for estimating prompt size
+CHARS_PER_TOKEN = 4
+# Share of the budget the user's own notes may take
+PROMPT_NOTES_BUDGET_SHARE = 0.5
+# Care values that carry no information for planning
+_PLANNING_PLACEHOLDERS = (
+    '', 'unknown', 'n/a', 'none', 'min: n/a°c, max: n/a°c',
+    'varies by species - check local climate compatibility',
+)
+
+
+def normalize_prompt(user_input: str):
+    """Case-folds and collapses whitespace so resubmitted forms share a key."""
+    return ' '.join((user_input or '').split()).casefold()
+
+
+def plan_cache_key(user_input: str):
+    """Returns the cache key for a prompt under the current model and system prompt."""
+    material = json.dumps([GEMINI_MODEL, SYSTEM_PROMPT, normalize_prompt(user_input)])
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def get_cached_plan(cache_key: str):
+    """Returns the cached plan text from memory or disk, or None."""
+    plan = AI_PLAN_CACHE.get(cache_key)
+    if plan is not None:
+        return plan
+
+    if AI_PLAN_STORE is not None:
+        plan = AI_PLAN_STORE.get(cache_key)
+        if plan is not None:
+            # Promote disk hits so repeats skip SQLite
+            AI_PLAN_CACHE.set(cache_key, plan)
+    return plan
+
+
+def store_plan(cache_key: str, plan: str):
+    """Caches a generated plan in memory and, if enabled, on disk."""
+    AI_PLAN_CACHE.set(cache_key, plan)
+    if AI_PLAN_STORE is not None:
+        AI_PLAN_STORE.set(cache_key, plan)
+
+
 def generate_garden_plan(user_input: str):
     """
-    Sends the user's garden prompt to the Gemini API and returns the plan text.
+    Returns a garden plan for the user's prompt, from the plan cache when an
+    equivalent prompt was answered before, otherwise from the Gemini API.
+    The response's 'cached' flag tells which.
     """
     if not GEMINI_API_KEY:
         return {"status": "error", "message": "Gemini API key is missing from environment."}, 500
-        
-    headers = {
-        "Content-Type": "application/json",
-    }
-    
-    payload = {
+
+    cache_key = plan_cache_key(user_input)
+
+    plan = get_cached_plan(cache_key)
+    if plan is not None:
+        return {"status": "success", "plan": plan, "cached": True}, 200
+
+    def fetch_and_store():
+        # Another flight may have filled the cache since our check above
+        plan = get_cached_plan(cache_key)
+        if plan is not None:
+            return {"status": "success", "plan": plan, "cached": True}, 200
+
+        response, status = request_garden_plan(user_input)
+        # Only successful plans are cached so failures are retried
+        if status == 200:
+            store_plan(cache_key, response["plan"])
+        return response, status
+
+    try:
+        response, status = AI_PLAN_FILLS.do(cache_key, fetch_and_store)
+    except SingleFlightTimeout:
+        return {"status": "error", "message": "Timed out waiting for the AI service."}, 504
+
+    # Waiters share the leader's dict; hand each caller its own copy
+    response = dict(response)
+    if response["status"] == "success":
+        response.setdefault("cached", False)
+    return response, status
+
+
+def _upstream_busy(error: BulkheadFull):
+    """Status dict for a Gemini call turned away by its bulkhead."""
+    return {"status": "error", "message": str(error), "code": "upstream_busy",
+            "retry_after": error.retry_after}
+
+
+def build_plan_payload(user_input: str):
+    """Builds the Gemini request body for a garden prompt."""
+    return {
         "contents": [
             {
                 "role": "user",
@@ -42,10 +193,119 @@ def generate_garden_plan(user_input: str):
             "parts": [{"text": SYSTEM_PROMPT}]
         }
     }
+
+
+def _candidate_text(data):
+    """Returns the text of the first candidate in a Gemini response or chunk."""
+    candidates = data.get('candidates') or []
+    if not candidates:
+        return None
+    parts = (candidates[0].get('content') or {}).get('parts') or []
+    return ''.join(part.get('text') or '' for part in parts) or None
+
+
+def stream_garden_plan(user_input: str):
+    """
+    Generates a garden plan with Gemini's streaming API.
+
+    Yields (event, data) pairs: ('chunk', {"text": ...}) for each piece of
+    the plan as it arrives, then either ('done', {"status": "success",
+    "plan": <full plan>, "cached": bool}) or ('error', <status dict>).
+    A cached plan is sent as a single chunk. The assembled plan is cached
+    like generate_garden_plan's. Closing the generator early (the client
+    went away) closes the upstream request and nothing is cached.
+
+    The stream holds a Gemini bulkhead slot until it ends; when none is
+    free an 'error' event with code 'upstream_busy' is sent instead.
+    """
+    if not GEMINI_API_KEY:
+        yield 'error', {"status": "error", "message": "Gemini API key is missing from environment."}
+        return
+
+    cache_key = plan_cache_key(user_input)
+    plan = get_cached_plan(cache_key)
+    if plan is not None:
+        yield 'chunk', {"text": plan}
+        yield 'done', {"status": "success", "plan": plan, "cached": True}
+        return
+
+    bulkhead = BULKHEADS['gemini']
+    try:
+        bulkhead.acquire()
+    except BulkheadFull as e:
+        yield 'error', _upstream_busy(e)
+        return
+
+    started = time.monotonic()
+    overloaded = True
+    parts = []
+    try:
+        response = http_client.post(
+            GEMINI_STREAM_URL,
+            headers={"Content-Type": "application/json"},
+            json=build_plan_payload(user_input),
+            stream=True,
+            timeout=GEMINI_STREAM_TIMEOUT,
+            bulkhead=False  # The slot above covers the whole stream
+        )
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        # Client errors (bad key, bad request) say nothing about load
+        status = getattr(e.response, 'status_code', None)
+        bulkhead.release(time.monotonic() - started,
+                         overloaded=status is None or status >= 500 or status == 429)
+        print(f"Gemini API Network Error: {e}")
+        yield 'error', {"status": "error", "message": f"Network error communicating with AI service: {e}"}
+        return
+
+    try:
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data:'):
+                continue
+            text = _candidate_text(json.loads(line[len('data:'):]))
+            if text:
+                parts.append(text)
+                yield 'chunk', {"text": text}
+        overloaded = False
+    except GeneratorExit:
+        overloaded = False
+        print(f"AI plan stream cancelled by client after {len(parts)} chunks.")
+        raise
+    except requests.exceptions.RequestException as e:
+        print(f"Gemini API Network Error: {e}")
+        yield 'error', {"status": "error", "message": f"Network error communicating with AI service: {e}"}
+        return
+    except ValueError as e:
+        overloaded = False
+        print(f"AI Service General Error: {e}")
+        yield 'error', {"status": "error", "message": "An unexpected error occurred during AI processing."}
+        return
+    finally:
+        response.close()
+        bulkhead.release(time.monotonic() - started, overloaded=overloaded)
+
+    plan = ''.join(parts)
+    if not plan:
+        yield 'error', {"status": "error", "message": "AI returned a response but no plan text was generated."}
+        return
+
+    store_plan(cache_key, plan)
+    yield 'done', {"status": "success", "plan": plan, "cached": False}
+
+
+def request_garden_plan(user_input: str):
+    """
+    Sends the user's garden prompt to the Gemini API and returns the plan text.
+    """
+    headers = {
+        "Content-Type": "application/json",
+    }
+    
+    payload = build_plan_payload(user_input)
     
     try:
         # Send request to Gemini API
-        response = requests.post(GEMINI_API_URL, headers=headers, json=payload, timeout=30)
+        response = http_client.post(GEMINI_API_URL, headers=headers, json=payload, timeout=30)
         response.raise_for_status() # Raise exception for 4xx or 5xx status codes
         
         data = response.json()
@@ -59,9 +319,230 @@ def generate_garden_plan(user_input: str):
             
             return {"status": "error", "message": "AI returned a response but no plan text was generated."}, 500
 
+        return {"status": "error", "message": "AI returned a response without any candidates."}, 500
+
+    except BulkheadFull as e:
+        print(f"Gemini call rejected: {e}")
+        return _upstream_busy(e), 503
     except requests.exceptions.RequestException as e:
         print(f"Gemini API Network Error: {e}")
         return {"status": "error", "message": f"Network error communicating with AI service: {e}"}, 500
     except Exception as e:
         print(f"AI Service General Error: {e}")
-        return {"status": "error", "message": "An unexpected error occurred during AI processing."}, 500
\ No newline at end of file
+        return {"status": "error", "message": "An unexpected error occurred during AI processing."}, 500
+
+
+def build_layout_prompt(layout: dict):
+    """Describes a computed layout for Gemini to explain, not to redo."""
+    bed = layout["bed"]
+    lines = [
+        "A garden layout has already been computed; do not move or add plants. "
+        "Write a short planting guide that explains it.",
+        f"Bed: {bed['width_in'] / 12:g} ft wide x {bed['length_in'] / 12:g} ft long, "
+        "row 0 is the north edge. Positions are inches from the north-west corner.",
+    ]
+    for placement in layout["placements"]:
+        lines.append(
+            f"- {placement['name']}: x={placement['x_in']:g}, y={placement['y_in']:g}, "
+            f"{placement['size_in']:g} in square, {placement['height_in']:g} in tall, "
+            f"needs {placement['sun']} sun, gets {placement['sun_hours']:g} h"
+        )
+    for plant in layout["unplaced"]:
+        lines.append(f"- {plant['name']}: not placed ({plant['reason']})")
+    # The text map helps for small beds but costs a token per cell
+    if bed["rows"] * bed["cols"] <= LAYOUT_PROMPT_MAX_MAP_CELLS:
+        lines.append(f"Map ({bed['cell_in']:g} in cells, '.' is empty):")
+        lines.extend(layout["map"])
+    return "\n".join(lines)
+
+
+def build_fallback_prompt(bed, plants, sun_map=None):
+    """Describes a layout request as a free-text planning prompt."""
+    sun = sun_map if isinstance(sun_map, str) else "mixed" if sun_map else "full"
+    lines = [f"Plan a {bed['width_ft']} ft x {bed['length_ft']} ft garden bed with {sun} sun. Plants:"]
+    for plant in plants:
+        details = ", ".join(
+            f"{field} {plant[field]}"
+            for field in ("quantity", "spacing_in", "height_in", "sun")
+            if plant.get(field) is not None
+        )
+        lines.append(f"- {plant['name']}" + (f" ({details})" if details else ""))
+    return "\n".join(lines)
+
+
+def plan_garden_layout(bed, plants, sun_map=None, narrative=False):
+    """
+    Lays out the bed with the local layout engine, which answers in
+    milliseconds. Gemini is only called to write a narrative around the
+    layout when `narrative` is set, or as a fallback when no plant could
+    be placed. The response's 'source' tells which of them produced it.
+    """
+    result = compute_layout(bed, plants, sun_map)
+    if result["status"] != "success":
+        return result, 400
+
+    layout = result["layout"]
+    response = {"status": "success", "layout": layout, "narrative": None, "source": "layout"}
+
+    if not layout["placements"]:
+        # Nothing fit the grid; let Gemini suggest what it can
+        fallback, status = generate_garden_plan(build_fallback_prompt(bed, plants, sun_map))
+        if status == 200:
+            response.update(narrative=fallback["plan"], source="gemini")
+        return response, 200
+
+    if narrative:
+        explained, status = generate_garden_plan(build_layout_prompt(layout))
+        if status == 200:
+            response.update(narrative=explained["plan"], source="layout+gemini")
+        else:
+            # The layout stands on its own; report why the narrative is missing
+            response["narrative_error"] = explained.get("message")
+
+    return response, 200
+
+
+def estimate_tokens(text: str):
+    """Estimates how many Gemini tokens a prompt uses."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _planning_value(value):
+    """Returns a compact care value, or None for placeholders."""
+    if value is None:
+        return None
+    text = str(value).strip()
+    # JSON path selection returns list values (e.g. Perenual sunlight) as text
+    if text.startswith('['):
+        try:
+            text = ', '.join(str(item) for item in json.loads(text))
+        except ValueError:
+            pass
+    text = ' '.join(text.split())
+    return None if text.lower() in _PLANNING_PLACEHOLDERS else text
+
+
+def build_collection_prompt(collection_name: str, plants: list, user_input: str = None,
+                            token_budget: int = None):
+    """
+    Builds a compact planning prompt from a collection's plants: one line
+    per distinct plant ("name (scientific) | light | watering | temp"),
+    duplicates folded into a count, placeholders dropped. Lines stop once
+    the next one would exceed the token budget.
+
+    Returns (prompt, stats) where stats reports the prompt size.
+    """
+    budget = token_budget or AI_PROMPT_TOKEN_BUDGET
+    lines = [
+        f"Plan a garden using the plants from my collection '{collection_name}'.",
+        "Plants (name | light | watering | temperature, xN = count):",
+    ]
+
+    if user_input:
+        # The user's notes keep at most their share of the budget
+        notes = ' '.join(user_input.split())
+        max_chars = int(budget * PROMPT_NOTES_BUDGET_SHARE * CHARS_PER_TOKEN)
+        if len(notes) > max_chars:
+            notes = notes[:max_chars].rstrip() + '...'
+        lines.insert(1, f"My notes: {notes}")
+
+    grouped = {}
+    for plant in plants:
+        name = _planning_value(plant.get('common_name')) or 'Unnamed plant'
+        scientific = _planning_value(plant.get('scientific_name'))
+        label = f"{name} ({scientific})" if scientific and scientific.lower() != name.lower() else name
+        fields = [_planning_value(plant.get(field)) for field in ('light', 'watering', 'ideal_temp')]
+        entry = grouped.setdefault(label.lower(), {"label": label, "fields": fields, "count": 0})
+        entry["count"] += 1
+
+    included = omitted = 0
+    used = estimate_tokens('\n'.join(lines))
+    for entry in grouped.values():
+        line = ' | '.join([entry["label"]] + [field or '-' for field in entry["fields"]])
+        if entry["count"] > 1:
+            line += f" x{entry['count']}"
+
+        line_tokens = estimate_tokens('\n' + line)
+        if omitted or used + line_tokens > budget:
+            omitted += entry["count"]
+            continue
+        lines.append(line)
+        used += line_tokens
+        included += entry["count"]
+
+    if omitted:
+        lines.append(f"...and {omitted} more plants not listed.")
+
+    prompt = '\n'.join(lines)
+    return prompt, {
+        "characters": len(prompt),
+        "estimated_tokens": estimate_tokens(prompt),
+        "token_budget": budget,
+        "plants_included": included,
+        "plants_omitted": omitted,
+    }
+
+
+def generate_collection_plan(collection_name: str, plants: list, user_input: str = None):
+    """
+    Generates a plan for a saved collection from a compact, token-budgeted
+    prompt. The response reports the prompt size under 'prompt'.
+    """
+    if not plants:
+        return {"status": "error", "message": "This collection has no plants to plan with."}, 400
+
+    prompt, prompt_stats = build_collection_prompt(collection_name, plants, user_input)
+    response, status = generate_garden_plan(prompt)
+
+    response = dict(response)
+    response["prompt"] = prompt_stats
+    return response, status
+
+
+def submit_plan_job(user_id: str, user_input: str):
+    """
+    Queues a plan for background generation and returns the job.
+    Rejected with 503 when the queue is full and 429 when the user already
+    has AI_JOB_MAX_PER_USER jobs pending.
+    """
+    try:
+        job = AI_PLAN_JOBS.submit(user_id, {"user_input": user_input})
+    except JobRejected as e:
+        status = 503 if e.code == 'queue_full' else 429
+        return {"status": "error", "message": e.message, "code": e.code}, status
+    except Exception as e:
+        print(f"AI job submit failed: {e}")
+        return {"status": "error", "message": "Could not queue the plan job."}, 500
+
+    return {"status": "success", "job": _public_job(job)}, 202
+
+
+def get_plan_job(user_id: str, job_id: str):
+    """Returns the state (and, once finished, the result) of a user's job."""
+    try:
+        job = AI_PLAN_JOBS.get(job_id)
+    except Exception as e:
+        print(f"AI job lookup failed: {e}")
+        return {"status": "error", "message": "Could not read the plan job."}, 500
+
+    # Other users' jobs are reported as missing rather than forbidden
+    if job is None or job["user_id"] != user_id:
+        return {"status": "error", "message": "Job not found."}, 404
+
+    return {"status": "success", "job": _public_job(job)}, 200
+
+
+def _public_job(job):
+    job = dict(job)
+    del job["user_id"]
+    return job
+
+
+def get_ai_plan_stats():
+    """Returns plan cache, request-coalescing and job queue counters."""
+    return {
+        "cache": AI_PLAN_CACHE.stats(),
+        "disk_cache_enabled": AI_PLAN_STORE is not None,
+        "single_flight": AI_PLAN_FILLS.stats(),
+        "jobs": AI_PLAN_JOBS.stats(),
+    }
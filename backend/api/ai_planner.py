@@ -1,18 +1,31 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, url_for
 # NOTE: Assuming the token_required decorator is available in api.collections
 from api.collections import token_required
-# Import the function from the AI Service Layer
-from ai_service import generate_garden_plan
+# Import the functions from the AI Service Layer
+from ai_service import (AI_JOB_RETRY_AFTER_SECONDS, generate_collection_plan,
+                        generate_garden_plan, get_plan_job, plan_garden_layout,
+                        stream_garden_plan, submit_plan_job)
+import db_service
 from cryptography.hazmat.primitives.asymmetric import ec
 from cryptography.hazmat.primitives import serialization
 import base64
 import functools 
+import json
 import jwt
 import os 
+from contextlib import closing
 
 ai_bp = Blueprint('ai', __name__)
 
 
+def _plan_response(result, status):
+    """jsonify() plus Retry-After when Gemini's bulkhead turned us away."""
+    response = jsonify(result)
+    if result.get('retry_after'):
+        response.headers['Retry-After'] = str(result['retry_after'])
+    return response, status
+
+
 @ai_bp.route('/ai/plan', methods=['POST'])
 @token_required
 def plan_garden_route():
@@ -29,4 +42,107 @@ def plan_garden_route():
     # Delegate the request to the AI Service Layer for processing by Gemini
     response, status = generate_garden_plan(user_input)
     
-    return jsonify(response), status
\ No newline at end of file
+    return _plan_response(response, status)
+
+
+def _sse_event(event, data):
+    """Formats one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@ai_bp.route('/ai/plan/stream', methods=['POST'])
+@token_required
+def stream_plan_route():
+    """
+    Streaming variant of /ai/plan. Relays the plan as Server-Sent Events:
+    'chunk' events carry text as Gemini produces it, and a final 'done'
+    (full plan) or 'error' event ends the stream.
+    """
+    data = request.get_json(silent=True) or {}
+    user_input = data.get('user_input')
+
+    if not user_input:
+        return jsonify({"error": "Missing user_input in request body."}), 400
+
+    def generate():
+        # The WSGI server closes this generator when the client disconnects;
+        # closing() passes that on so the Gemini request is closed too
+        with closing(stream_garden_plan(user_input)) as events:
+            for event, payload in events:
+                yield _sse_event(event, payload)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        # Stop reverse proxies from buffering the stream
+        "X-Accel-Buffering": "no",
+    })
+
+
+@ai_bp.route('/ai/plan/jobs', methods=['POST'])
+@token_required
+def submit_plan_job_route():
+    """
+    Queues a garden plan for background generation. Returns 202 with the
+    job at once; poll GET /ai/plan/jobs/<job_id> for the result.
+    """
+    data = request.get_json(silent=True) or {}
+    user_input = data.get('user_input')
+
+    if not user_input:
+        return jsonify({"error": "Missing user_input in request body."}), 400
+
+    result, status = submit_plan_job(request.user_id, user_input)
+    response = jsonify(result)
+    if status == 202:
+        response.headers['Location'] = url_for(
+            'ai.get_plan_job_route', job_id=result["job"]["id"])
+    elif status in (429, 503):
+        response.headers['Retry-After'] = str(AI_JOB_RETRY_AFTER_SECONDS)
+    return response, status
+
+
+@ai_bp.route('/ai/plan/jobs/<job_id>', methods=['GET'])
+@token_required
+def get_plan_job_route(job_id):
+    """Returns a plan job's state, plus its result once it has finished."""
+    response, status = get_plan_job(request.user_id, job_id)
+    return jsonify(response), status
+
+
+@ai_bp.route('/ai/layout', methods=['POST'])
+@token_required
+def plan_layout_route():
+    """
+    Computes a garden layout locally from a bed size, optional sun map and
+    plant list. With "narrative": true Gemini also writes a guide around it.
+    """
+    data = request.get_json(silent=True) or {}
+
+    response, status = plan_garden_layout(
+        data.get('bed'),
+        data.get('plants'),
+        sun_map=data.get('sun_map'),
+        narrative=bool(data.get('narrative'))
+    )
+    return jsonify(response), status
+
+
+@ai_bp.route('/ai/plan/from-collection/<collection_name>', methods=['POST'])
+@token_required
+def plan_from_collection_route(collection_name):
+    """
+    Generates a plan around the plants in one of the user's collections.
+    An optional "user_input" adds notes about the space. The response
+    reports the size of the prompt that was sent under "prompt".
+    """
+    data = request.get_json(silent=True) or {}
+
+    result = db_service.get_collection_planning_fields(request.user_id, collection_name)
+    if result['status'] == 'empty':
+        return jsonify(result), 404
+    if result['status'] == 'error':
+        return jsonify(result), 500
+
+    response, status = generate_collection_plan(
+        collection_name, result['data'], data.get('user_input'))
+    return _plan_response(response, status)
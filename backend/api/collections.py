@@ -1,10 +1,10 @@
 from flask import Blueprint, request, jsonify
+import hashlib
+import json
 import jwt
-import os
 import db_service
-from cryptography.hazmat.primitives.asymmetric import ec
-from cryptography.hazmat.primitives import serialization
-import base64
+import auth_service
+from bulkhead_service import UpstreamUnavailable
 import functools  # <-- NEW IMPORT
 
 
@@ -30,34 +30,10 @@ def token_required(f):
 
         token = auth_header.split(' ')[1].strip()  # Clean the token string
 
-        x_b64 = os.getenv("SUPABASE_JWT_X")
-        y_b64 = os.getenv("SUPABASE_JWT_Y")
-
-        # Convert base64url -> bytes
-        x_bytes = base64.urlsafe_b64decode(x_b64 + "==")
-        y_bytes = base64.urlsafe_b64decode(y_b64 + "==")
-
-        # Create public key
-        public_numbers = ec.EllipticCurvePublicNumbers(
-            int.from_bytes(x_bytes, "big"),
-            int.from_bytes(y_bytes, "big"),
-            ec.SECP256R1()
-        )
-        public_key = public_numbers.public_key()
-
-        # Export PEM string
-        pem = public_key.public_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PublicFormat.SubjectPublicKeyInfo
-        ).decode()
-
-        data = jwt.decode(
-                token,
-                pem,
-                algorithms=["ES256"],
-                audience="authenticated"
-            )
         try:
+            # 2. Verify the token (the key and verified tokens are cached)
+            data = auth_service.verify_access_token(token)
+
             # 3. Attach the user_id (the 'sub' claim in Supabase tokens)
             # to the request object
             request.user_id = data.get('sub')
@@ -118,16 +94,26 @@ def get_user_collections_route():
     """
     Retrieves all collections for the
     authenticated user. (GET method)
+    Optional: ?fields=id,common_name limits the columns returned per plant.
     """
     user_id = request.user_id
 
+    fields_param = request.args.get('fields')
+    fields = None
+    if fields_param:
+        fields = [f.strip() for f in fields_param.split(',') if f.strip()]
+
     try:
         # Delegate to the Database Service Layer
-        result = db_service.get_user_collections(user_id)
+        result = db_service.get_user_collections(user_id, fields=fields)
 
         if result['status'] == 'success':
             return jsonify(result['data']), 200
 
+        if result.get('code') == 'invalid_fields':
+            return jsonify({"status": "error",
+                            "message": result['message']}), 400
+
         # Returns 200 with an empty array if status is 'empty'
         if result['status'] == 'empty':
             return jsonify([]), 200
@@ -135,12 +121,52 @@ def get_user_collections_route():
         # Handle general database failure
         return jsonify({"status": "error", "message": result['message']}), 500
 
+    except UpstreamUnavailable:
+        # Answered with 503 + Retry-After by the app's error handler
+        raise
     except Exception as e:
         print(f"Database GET Crash: {e}")
         return jsonify({"status": "error", "message": "Failed to retrieve "
                         "collections due to server error."}), 500
 
 
+@collections_bp.route('/collections/summary', methods=['GET'])
+@token_required
+def get_collection_summary_route():
+    """
+    Returns the id, name, plant count and last-modified time of each of the
+    user's collections, without plant bodies (for the collection picker).
+    Supports conditional GET: a matching If-None-Match returns 304.
+    """
+    user_id = request.user_id
+
+    try:
+        result = db_service.get_collection_summaries(user_id)
+
+        if result['status'] == 'success':
+            summaries = result['data']
+        elif result['status'] == 'empty':
+            summaries = []
+        else:
+            return jsonify({"status": "error",
+                            "message": result['message']}), 500
+
+        body = json.dumps(summaries, sort_keys=True, default=str)
+        response = jsonify(summaries)
+        response.set_etag(hashlib.sha256(body.encode()).hexdigest())
+        # Let the browser store it but always revalidate with the ETag
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response.make_conditional(request)
+
+    except UpstreamUnavailable:
+        # Answered with 503 + Retry-After by the app's error handler
+        raise
+    except Exception as e:
+        print(f"Collection Summary Crash: {e}")
+        return jsonify({"status": "error", "message": "Failed to retrieve "
+                        "collection summary due to server error."}), 500
+
+
 @collections_bp.route('/collections/create', methods=['POST'])
 @token_required
 def create_collection_route():
@@ -175,6 +201,9 @@ def create_collection_route():
 
         return jsonify(result), 500
 
+    except UpstreamUnavailable:
+        # Answered with 503 + Retry-After by the app's error handler
+        raise
     except Exception as e:
         print(f"Server-side exception during Create Collection: {e}")
         return jsonify({"status": "error", "message": "Failed "
@@ -221,6 +250,9 @@ def delete_collection_container_route(collection_name):
 
         # If the result status was 'error', return it directly
         return jsonify(result), 500
+    except UpstreamUnavailable:
+        # Answered with 503 + Retry-After by the app's error handler
+        raise
     except Exception as e:
         print(f"Collection Container DELETE Crash: {e}")
         return jsonify({"status": "error", "message": "Failed to "
@@ -285,6 +317,9 @@ def rename_collection_route():
         # Handle other errors
         return jsonify(result), 500
 
+    except UpstreamUnavailable:
+        # Answered with 503 + Retry-After by the app's error handler
+        raise
     except Exception as e:
         print(f"Collection Rename Error: {e}")
         return jsonify({
@@ -323,6 +358,9 @@ def delete_from_collection_route(plant_id):
             # If the plant wasn't found or delete failed
             return jsonify(result), 404
 
+    except UpstreamUnavailable:
+        # Answered with 503 + Retry-After by the app's error handler
+        raise
     except Exception as e:
         print(f"Database DELETE Crash: {e}")
         return jsonify({"status": "error",
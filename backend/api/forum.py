@@ -1,24 +1,69 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 # NOTE: Assuming the token_required decorator is available in api.collections
 from api.collections import token_required
 # Import the function from the AI Service Layer
-from db_service import create_forum_comment, create_forum_post, get_post_comments, get_recent_forum_posts
+from db_service import create_forum_comment, create_forum_post, get_comment_tree, get_forum_feed_page, get_forum_post
 
 forum_bp = Blueprint('forum', __name__)
 
 @forum_bp.route('/forum/posts', methods=['GET'])
 def get_posts_route():
     """
-    Public endpoint to retrieve the list of recent forum posts.
+    Public endpoint to retrieve a page of recent forum posts, newest first.
+
+    Query params:
+        limit: Page size
+        cursor: Value of the X-Next-Cursor header from the previous page
+        excerpt: 'true' to truncate post content server-side
+    The body stays a plain list; X-Next-Cursor is omitted on the last page.
+    """
+    limit = request.args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            return jsonify({"error": "limit must be an integer."}), 400
+
+    excerpt = request.args.get('excerpt', '').lower() in ('1', 'true', 'yes')
+
+    page = get_forum_feed_page(
+        limit=limit,
+        cursor=request.args.get('cursor'),
+        excerpt=excerpt,
+    )
+
+    if page['status'] == 'success':
+        # Pages come pre-serialized from the feed cache; clients revalidate
+        # with If-None-Match / If-Modified-Since and get a 304 if unchanged
+        result = current_app.response_class(page['body'],
+                                            mimetype='application/json')
+        result.set_etag(page['etag'])
+        result.last_modified = page['last_modified']
+        result.headers['Cache-Control'] = 'public, no-cache'
+        if page.get('next_cursor'):
+            result.headers['X-Next-Cursor'] = page['next_cursor']
+        return result.make_conditional(request)
+
+    if page.get('code') == 'invalid_cursor':
+        return jsonify({"error": page['message']}), 400
+    
+    return jsonify({"error": page['message']}), 500
+
+@forum_bp.route('/forum/posts/<int:post_id>', methods=['GET'])
+def get_post_route(post_id):
     """
-    response = get_recent_forum_posts()
+    Public endpoint to retrieve a single forum post.
+    Pass ?include=comments to embed the post's comments in the same query.
+    """
+    include_comments = 'comments' in request.args.get('include', '').split(',')
+    response = get_forum_post(post_id, include_comments=include_comments)
 
     if response['status'] == 'success':
         return jsonify(response['data']), 200
-    
+
     if response['status'] == 'empty':
-        return jsonify([]), 200
-    
+        return jsonify({"error": "Post not found."}), 404
+
     return jsonify({"error": response['message']}), 500
 
 @forum_bp.route('/forum/posts', methods=['POST'])
@@ -47,15 +92,40 @@ def create_post_route():
 @forum_bp.route('/forum/posts/<post_id>/comments', methods=['GET'])
 def get_comments_route(post_id):
     """
-    Public endpoint to retrieve all comments for a specific post.
+    Public endpoint to retrieve a page of a post's comments as reply trees.
+
+    Query params:
+        parent: Return the replies under this comment id instead of the
+            top-level comments (used to expand truncated subtrees)
+        limit: Page size for that level
+        cursor: Value of the X-Next-Cursor header from the previous page
+    The total number of comments on the post is sent in X-Total-Count.
     """
-    response = get_post_comments(post_id)
+    # type=int yields None for non-numeric values, so check presence too
+    parent_id = request.args.get('parent', type=int)
+    limit = request.args.get('limit', type=int)
+    for name, value in (('parent', parent_id), ('limit', limit)):
+        if name in request.args and value is None:
+            return jsonify({"error": f"{name} must be an integer."}), 400
+
+    response = get_comment_tree(post_id, parent_id=parent_id, limit=limit,
+                                cursor=request.args.get('cursor'))
 
     if response['status'] == 'success':
-        return jsonify(response['data']), 200
+        result = jsonify(response['data'])
+        result.headers['X-Total-Count'] = str(response['comment_count'])
+        if response.get('next_cursor'):
+            result.headers['X-Next-Cursor'] = response['next_cursor']
+        return result, 200
     
     if response['status'] == 'empty':
         return jsonify([]), 200
+
+    if response.get('code') == 'invalid_cursor':
+        return jsonify({"error": response['message']}), 400
+
+    if response.get('code') == 'parent_not_found':
+        return jsonify({"error": response['message']}), 404
     
     return jsonify({"error": response['message']}), 500
 
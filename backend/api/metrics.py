@@ -0,0 +1,30 @@
+from flask import Blueprint, jsonify
+
+import ai_service
+import bulkhead_service
+import db_service
+import http_client
+
+# In-process metrics for this worker: database operations, outbound HTTP
+# calls, upstream bulkheads and cache counters. Each worker process reports its own numbers.
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Returns a JSON snapshot of this worker's metrics."""
+    metrics = {
+        "db": db_service.get_db_stats(),
+        "http": http_client.get_http_stats(),
+        "bulkheads": bulkhead_service.get_bulkhead_stats(),
+        "ai": ai_service.get_ai_plan_stats(),
+    }
+
+    # Imported here so a metrics-only app doesn't read the plant API config
+    try:
+        import plant_service
+        metrics["plants"] = plant_service.get_plant_lookup_stats()
+    except ImportError as e:
+        print(f"Plant metrics unavailable: {e}")
+
+    return jsonify(metrics), 200
@@ -1,6 +1,10 @@
 from flask import Blueprint, request, jsonify
 # Import the service directly for public plant search logic
-from plant_service import fetch_and_cache_plant_details, fetch_plant_by_type
+from plant_service import (
+    fetch_and_cache_plant_details, fetch_plant_any_type, fetch_plant_by_type
+)
+from bulkhead_service import UpstreamUnavailable
+from cache_service import SingleFlightTimeout
 # import os
 
 # Define the new Blueprint. This handles all public /plants routes.
@@ -14,17 +18,28 @@ def public_plant_search():
     This route does NOT require the @token_required decorator.
     e.g., /api/v1/plants?name=Fern&type=indoor
     or   /api/v1/plants?name=Oak&type=other
+    or   /api/v1/plants?name=Mint&type=any&prefer=indoor
+    With type=any both providers are searched in parallel and the response
+    reports which one answered in 'provider' and 'plant_type'.
     """
     plant_name = request.args.get('name')
     plant_type = request.args.get('type', 'indoor')  # Default to 'indoor'
+    prefer = request.args.get('prefer')
 
     if not plant_name:
         return jsonify({"message": "Missing 'name' query parameter."}), 400
 
     # Validate plant_type
-    if plant_type not in ['indoor', 'other']:
+    if plant_type not in ['indoor', 'other', 'any']:
         return jsonify({
-            "message": "Invalid 'type' parameter. Must be 'indoor' or 'other'."
+            "message": "Invalid 'type' parameter. "
+            "Must be 'indoor', 'other' or 'any'."
+        }), 400
+
+    if prefer and prefer not in ['indoor', 'other']:
+        return jsonify({
+            "message": "Invalid 'prefer' parameter. "
+            "Must be 'indoor' or 'other'."
         }), 400
 
     print(f"--- PUBLIC SEARCH HIT --- Searching for: '{plant_name}' (type: {plant_type})")
@@ -36,7 +51,10 @@ def public_plant_search():
 
     try:
         # Call the external service layer to get the data
-        data = fetch_plant_by_type(plant_name, plant_type)
+        if plant_type == 'any':
+            data = fetch_plant_any_type(plant_name, prefer=prefer)
+        else:
+            data = fetch_plant_by_type(plant_name, plant_type)
 
         if data:
             return jsonify(data), 200
@@ -48,6 +66,16 @@ def public_plant_search():
                         )
                         }), 404
 
+    except SingleFlightTimeout as e:
+        # An identical search is still waiting on the upstream provider
+        print(f"Timed out waiting for in-flight plant search: {e}")
+        return jsonify({"message": "Plant search timed out. "
+                        "Please try again."}), 504
+
+    except UpstreamUnavailable:
+        # Answered with 503 + Retry-After by the app's error handler
+        raise
+
     except Exception as e:
         # Catch unexpected errors during service execution
         print(f"Server-side exception during public plant search: {e}")
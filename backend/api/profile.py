@@ -1,10 +1,16 @@
 from flask import Blueprint, request, jsonify
 import requests
+import http_client
+import jwt
 import os
-from dotenv import load_dotenv
+import time
+import auth_service
+import db_service
+import settings
+from cache_service import TTLCache
 
 # Load environment variables
-load_dotenv()
+settings.load_environment()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_PUBLIC_KEY")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
@@ -13,25 +19,86 @@ SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
 AUTH_BASE_URL = f"{SUPABASE_URL}/auth/v1"
 DB_BASE_URL = f"{SUPABASE_URL}/rest/v1"
 
+# Short-lived per-user cache of the Supabase user record (id, email,
+# created_at) so profile reads don't need a round trip every time
+PROFILE_CACHE_TTL_SECONDS = int(os.getenv("PROFILE_CACHE_TTL_SECONDS", "60"))
+PROFILE_CACHE = TTLCache(
+    max_entries=1024,
+    ttl_seconds=PROFILE_CACHE_TTL_SECONDS,
+    name='profiles'
+)
+
+# When a user's email changed, keyed by user ID. Tokens issued before the
+# change carry a stale email claim. Kept for one token lifetime (1 hour).
+PROFILE_CHANGES = TTLCache(
+    max_entries=1024,
+    ttl_seconds=60 * 60,
+    name='profile_changes'
+)
+
 # Create the Blueprint
 profile_bp = Blueprint('profile', __name__)
 
 
-def get_user_from_token(auth_header):
-    """Helper function to verify token and get user info."""
+def get_user_from_token(auth_header, required_fields=('id', 'email')):
+    """
+    Helper function to verify token and get user info.
+    The token is verified locally and id/email come from its claims. The
+    Supabase user endpoint is only called when a required field is missing
+    from the claims or the claims predate a profile change; its answer is
+    cached per user for PROFILE_CACHE_TTL_SECONDS.
+    """
     if not auth_header or not auth_header.startswith('Bearer '):
         return None, {"error": "Missing or invalid authorization header"}, 401
 
     token = auth_header.split(' ')[1]
 
-    # Verify token with Supabase
+    try:
+        claims = auth_service.verify_access_token(token)
+    except jwt.InvalidTokenError:
+        return None, {"error": "Invalid or expired token"}, 401
+    except Exception as e:
+        # Local verification is misconfigured; let Supabase verify instead
+        print(f"Local token verification unavailable: {e}")
+        return _fetch_remote_user(token)
+
+    user_id = claims.get('sub')
+
+    cached = PROFILE_CACHE.get(user_id)
+    if cached is not None and all(cached.get(f) for f in required_fields):
+        return cached, None, None
+
+    user_data = {"id": user_id, "email": claims.get('email')}
+
+    changed_at = PROFILE_CHANGES.get(user_id)
+    claims_stale = changed_at is not None and claims.get('iat', 0) < changed_at
+
+    if claims_stale or not all(user_data.get(f) for f in required_fields):
+        user_data, error, status = _fetch_remote_user(token)
+        if error:
+            return None, error, status
+        PROFILE_CACHE.set(user_id, user_data)
+
+    return user_data, None, None
+
+
+def _invalidate_profile(user_id):
+    """Drops cached profile data and marks older token claims as stale."""
+    PROFILE_CACHE.invalidate(user_id)
+    PROFILE_CHANGES.set(user_id, time.time())
+    # Forum posts show the author's email
+    db_service.invalidate_author(user_id)
+
+
+def _fetch_remote_user(token):
+    """Looks the user up via the Supabase Auth API (verifies the token)."""
     headers = {
         "apikey": SUPABASE_ANON_KEY,
         "Authorization": f"Bearer {token}",
     }
 
     try:
-        response = requests.get(
+        response = http_client.get(
             f"{AUTH_BASE_URL}/user",
             headers=headers,
             timeout=5
@@ -51,7 +118,10 @@ def get_user_from_token(auth_header):
 def get_profile():
     """Get the current user's profile information."""
     auth_header = request.headers.get('Authorization')
-    user_data, error, status = get_user_from_token(auth_header)
+    # created_at is not a token claim, so the first read per user (and one
+    # per cache TTL after that) goes to Supabase
+    user_data, error, status = get_user_from_token(
+        auth_header, required_fields=('id', 'email', 'created_at'))
 
     if error:
         return jsonify(error), status
@@ -96,7 +166,7 @@ def update_email():
     try:
         # Update via Admin API endpoint
         admin_url = f"{AUTH_BASE_URL}/admin/users/{user_id}"
-        response = requests.put(
+        response = http_client.put(
             admin_url,
             headers=admin_headers,
             json={"email": new_email},
@@ -112,13 +182,16 @@ def update_email():
                 "Prefer": "return=representation"
             }
 
-            profile_response = requests.patch(
+            profile_response = http_client.patch(
                 f"{DB_BASE_URL}/profiles?id=eq.{user_id}",
                 headers=service_headers,
                 json={"email": new_email},
                 timeout=5
             )
 
+            # The token's email claim is now out of date
+            _invalidate_profile(user_id)
+
             if profile_response.status_code not in [200, 204]:
                 return jsonify({
                     "error": "Email updated in auth but profile sync failed. Please contact support."
@@ -165,7 +238,7 @@ def update_password():
 
     try:
         admin_url = f"{AUTH_BASE_URL}/admin/users/{user_id}"
-        response = requests.put(
+        response = http_client.put(
             admin_url,
             headers=admin_headers,
             json={"password": new_password},
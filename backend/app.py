@@ -1,119 +1,89 @@
-from flask import Flask, jsonify, request, Blueprint
+import importlib
+
+from flask import Flask, jsonify, request
 from flask_cors import CORS
-# Import standard libraries for error checking
-# import os
-# from dotenv import load_dotenv
-# import sys
-
-# --- IMPORT BLUEPRINTS AND SERVICES ---
-# Import the Auth Blueprint (Controller) we just created
-try:
-    # Assuming api/auth.py is structured correctly (see note below)
-    from api.auth import auth_bp
-    AUTH_BP_LOADED = True
-except ImportError as e:
-    AUTH_BP_LOADED = False
-    print(f"Auth Blueprint failed to import. Details: {e}")
-    # Define a dummy Blueprint to prevent app crash
-    auth_bp = Blueprint('auth', __name__)
-
-try:
-    import db_service
-    DB_SERVICE_LOADED = True
-except ImportError as e:
-    DB_SERVICE_LOADED = False
-    print("-" * 60)
-    print(f"DB Service 'db_service.py' failed to import. Details: {e}")
-    print("Check file name and ensure 'supabase' module is installed.")
-    print("-" * 60)
-
-# Import the Plant Service (assuming it's a neighbor for simplicity)
-try:
-    from api.plants import plants_bp
-    PLANTS_BP_LOADED = True
-except ImportError as e:
-    PLANTS_BP_LOADED = False
-    print(f"Plants Blueprint failed to import. Details: {e}")
-    plants_bp = Blueprint('plants', __name__)
-
-try:
-    from api.collections import collections_bp
-    COLLECTIONS_BP_LOADED = True
-except ImportError as e:
-    COLLECTIONS_BP_LOADED = False
-    print(f"Collections Blueprint failed to import. Details: {e}")
-    collections_bp = Blueprint('collections', __name__)
-
-try:
-    from api.ai_planner import ai_bp
-    AI_BP_LOADED = True
-except ImportError as e:
-    AI_BP_LOADED = False
-    print(f"AI Planner Blueprint failed to import. Details: {e}")
-    ai_bp = Blueprint('ai', __name__)
-
-try:
-    from api.forum import forum_bp
-    FORUM_BP_LOADED = True
-except ImportError as e:
-    FORUM_BP_LOADED = False
-    print(f"Forum Blueprint failed to import. Details: {e}")
-    forum_bp = Blueprint('forum', __name__)
-
-try:
-    from api.profile import profile_bp
-    PROFILE_BP_LOADED = True
-except ImportError as e:
-    PROFILE_BP_LOADED = False
-    print(f"Profile Blueprint failed to import. Details: {e}")
-    profile_bp = Blueprint('profile', __name__)
-
-# Initialize Flask App
-app = Flask(__name__)
-# Configure CORS to allow requests from Next.js (port 3000)
-# Note: Using r"/api/*" ensures both /api/v1/plants and /api/v1/auth work
-CORS(app, resources={r"/api/*": {"origins": "http://localhost:3000"}})
-
-# --- BLUEPRINT REGISTRATION (The critical step for the 404 fix) ---
-
-# The plants route is registered here for now
-# keep the plant_details function defined below but register the auth_bp now.
-if AUTH_BP_LOADED:
-    # Registers all routes defined in api/auth.py (e.g., /auth/login)
-    # under the global prefix /api/v1, making the full URL: /api/v1/auth/login
-    app.register_blueprint(auth_bp, url_prefix='/api/v1')
-else:
-    print("Auth Blueprint not loaded. Endpoints unavailable.")
-
-if COLLECTIONS_BP_LOADED:
-    app.register_blueprint(collections_bp, url_prefix='/api/v1')
-else:
-    print("Collections Blueprint not loaded. Endpoints unavailable.")
-
-if PLANTS_BP_LOADED:
-    app.register_blueprint(plants_bp, url_prefix='/api/v1')
-else:
-    print("Plants Blueprint not loaded. Plant endpoints are unavailable.")
-
-if AI_BP_LOADED:
-    app.register_blueprint(ai_bp, url_prefix='/api/v1')
-else:
-    print("AI Planner Blueprint not loaded. AI endpoints are unavailable.")
-
-if FORUM_BP_LOADED:
-    app.register_blueprint(forum_bp, url_prefix='/api/v1')
-else:
-    print("Forum Blueprint not loaded. Forum endpoints are unavailable.")
-
-if PROFILE_BP_LOADED:
-    app.register_blueprint(profile_bp, url_prefix='/api/v1')
-else:
-    print("Profile Blueprint not loaded. Profile endpoints are unavailable.")
-
-@app.route('/api/v1/test-db', methods=['POST'])
+
+import settings
+from bulkhead_service import UpstreamUnavailable
+
+
+# --- BLUEPRINT LOADING ---
+
+def _import_blueprint(name):
+    """
+    Imports the blueprint registered under `name` in settings.BLUEPRINTS.
+    Returns None if the name is unknown or its module fails to import.
+    """
+    if name not in settings.BLUEPRINTS:
+        print(f"Unknown blueprint '{name}' in config. Skipping it.")
+        return None
+
+    module_name, attribute = settings.BLUEPRINTS[name]
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError as e:
+        print(f"{name.capitalize()} Blueprint failed to import. Details: {e}")
+        return None
+    return getattr(module, attribute)
+
+
+# --- APPLICATION FACTORY ---
+
+def create_app(config=None):
+    """
+    Builds the Flask app. Only the blueprints listed in the config are
+    imported; database and HTTP clients are created on first use.
+
+    Args:
+        config: Optional dict overriding settings.load_config() values
+    """
+    app = Flask(__name__)
+    app.config.update(settings.load_config(config))
+    prefix = app.config['API_PREFIX']
+
+    # Configure CORS to allow requests from Next.js (port 3000)
+    # X-Next-Cursor/X-Total-Count carry forum pagination state
+    CORS(app, resources={f"{prefix}/*": {"origins": app.config['CORS_ORIGINS']}},
+         expose_headers=["X-Next-Cursor", "X-Total-Count"])
+
+    loaded = []
+    for name in app.config['BLUEPRINTS']:
+        blueprint = _import_blueprint(name)
+        if blueprint is None:
+            print(f"{name.capitalize()} Blueprint not loaded. "
+                  "Endpoints unavailable.")
+            continue
+        # e.g. api/auth.py /auth/login becomes /api/v1/auth/login
+        app.register_blueprint(blueprint, url_prefix=prefix)
+        loaded.append(name)
+    app.config['LOADED_BLUEPRINTS'] = loaded
+
+    app.register_error_handler(UpstreamUnavailable, upstream_unavailable)
+    app.add_url_rule('/', 'index', index)
+    app.add_url_rule(f'{prefix}/test-db', 'test_db_insert', test_db_insert,
+                     methods=['POST'])
+    return app
+
+
+def upstream_unavailable(error):
+    """
+    Turns a call refused before reaching its upstream (full bulkhead or
+    open circuit) into a fast 503 with Retry-After.
+    """
+    print(f"Rejected {request.method} {request.path}: {error}")
+    response = jsonify({"status": "error", "message": str(error),
+                        "code": error.code, "upstream": error.name})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
 def test_db_insert():
     """Tests the database connection by inserting a hardcoded record."""
-    if not DB_SERVICE_LOADED:
+    try:
+        import db_service
+    except ImportError as e:
+        print(f"DB Service 'db_service.py' failed to import. Details: {e}")
         return jsonify({"status": "error", "message": "Database "
                         "Service failed to load."}), 500
 
@@ -151,7 +121,6 @@ def test_db_insert():
 
 # --- WELCOME PAGE / ROOT HEALTH CHECK ---
 
-@app.route('/')
 def index():
     """A simple health check and welcome endpoint."""
     # List available API endpoints for debugging/documentation
@@ -171,4 +140,4 @@ def index():
 # Run the app
 if __name__ == '__main__':
     # removed degub=True for production safety
-    app.run(port=5000, debug=True)
+    create_app().run(port=5000, debug=True)
@@ -1,11 +1,20 @@
 import requests
+import http_client
 import os
-from dotenv import load_dotenv
+import base64
+import hashlib
+import threading
+import time
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ec
+
+import settings
+from cache_service import TTLCache
 
 # from flask import jsonify
 
 # Load environment variables (necessary for Supabase keys)
-load_dotenv()
+settings.load_environment()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_PUBLIC_KEY")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_KEY")
@@ -14,6 +23,92 @@ SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_KEY")
 AUTH_BASE_URL = f"{SUPABASE_URL}/auth/v1"
 DB_BASE_URL = f"{SUPABASE_URL}/rest/v1"
 
+# --- JWT Verification Setup ---
+JWT_ALGORITHMS = ["ES256"]
+JWT_AUDIENCE = "authenticated"
+
+# Already-verified tokens, keyed by a SHA-256 of the token and kept no
+# longer than the token's own 'exp' claim
+VERIFIED_TOKEN_CACHE = TTLCache(
+    max_entries=int(os.getenv("VERIFIED_TOKEN_CACHE_SIZE", "2048")),
+    ttl_seconds=300,
+    name='verified_tokens'
+)
+
+_jwt_public_key = None
+_jwt_key_lock = threading.Lock()
+
+
+# --- Token Verification Helpers ---
+
+
+def get_jwt_public_key():
+    """
+    Builds the Supabase ES256 public key from SUPABASE_JWT_X/Y once per
+    process and returns the cached key object on later calls.
+    """
+    global _jwt_public_key
+
+    if _jwt_public_key is None:
+        with _jwt_key_lock:
+            if _jwt_public_key is None:
+                x_b64 = os.getenv("SUPABASE_JWT_X")
+                y_b64 = os.getenv("SUPABASE_JWT_Y")
+
+                # Convert base64url -> bytes
+                x_bytes = base64.urlsafe_b64decode(x_b64 + "==")
+                y_bytes = base64.urlsafe_b64decode(y_b64 + "==")
+
+                # Create public key
+                public_numbers = ec.EllipticCurvePublicNumbers(
+                    int.from_bytes(x_bytes, "big"),
+                    int.from_bytes(y_bytes, "big"),
+                    ec.SECP256R1()
+                )
+                _jwt_public_key = public_numbers.public_key()
+
+    return _jwt_public_key
+
+
+def reset_jwt_verification_cache():
+    """Forgets the cached public key and every verified token."""
+    global _jwt_public_key
+
+    with _jwt_key_lock:
+        _jwt_public_key = None
+    VERIFIED_TOKEN_CACHE.clear()
+
+
+def verify_access_token(token: str):
+    """
+    Verifies a Supabase access token and returns its claims.
+    Tokens verified before are served from an LRU cache until they expire,
+    skipping the ES256 signature check. Raises jwt.InvalidTokenError (or a
+    subclass) for bad tokens.
+    """
+    cache_key = hashlib.sha256(token.encode()).hexdigest()
+
+    claims = VERIFIED_TOKEN_CACHE.get(cache_key)
+    if claims is not None:
+        # The cache TTL tracks 'exp', but guard the boundary explicitly
+        if claims.get('exp', 0) > time.time():
+            return claims
+        VERIFIED_TOKEN_CACHE.invalidate(cache_key)
+
+    claims = jwt.decode(
+        token,
+        get_jwt_public_key(),
+        algorithms=JWT_ALGORITHMS,
+        audience=JWT_AUDIENCE
+    )
+
+    # Only tokens with an expiry are cached, and never beyond it
+    expires_in = claims.get('exp', 0) - time.time()
+    if expires_in > 0:
+        VERIFIED_TOKEN_CACHE.set(cache_key, claims, ttl_seconds=expires_in)
+
+    return claims
+
 
 # --- Helper Function for Database Insert ---
 
@@ -34,7 +129,7 @@ def create_user_profile_record(user_id: str, email: str):
     }
 
     try:
-        response = requests.post(
+        response = http_client.post(
             f"{DB_BASE_URL}/profiles",
             headers=headers,
             json=profile_data,
@@ -67,7 +162,7 @@ def sign_up(email, password):
     data = {"email": email, "password": password}
 
     try:
-        response = requests.post(url, headers=headers, json=data, timeout=10)
+        response = http_client.post(url, headers=headers, json=data, timeout=10)
         auth_data = response.json()
 
         if response.status_code == 200 and 'user' in auth_data:
@@ -95,7 +190,7 @@ def sign_in(email, password):
     data = {"email": email, "password": password}
 
     try:
-        response = requests.post(url, headers=headers, json=data, timeout=10)
+        response = http_client.post(url, headers=headers, json=data, timeout=10)
         auth_data = response.json()
 
         return auth_data, response.status_code
@@ -0,0 +1,204 @@
+import math
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import settings
+from metrics_service import LATENCY_BUCKETS_MS, Histogram
+
+# --- Per-upstream concurrency limits ---
+# Each upstream gets its own budget of in-flight calls, so a slow Gemini or
+# a Perenual brownout can only tie up that upstream's share of the request
+# threads. A call over budget fails fast with BulkheadFull (503 +
+# Retry-After) instead of waiting. Limits adapt AIMD-style: they grow by
+# about one per window of calls that finish under the latency target and
+# are cut multiplicatively when calls run slow or fail.
+
+settings.load_environment()
+
+# name -> (max concurrent calls, target latency in ms); both can be set per
+# upstream with BULKHEAD_<NAME>_MAX_CONCURRENCY / BULKHEAD_<NAME>_TARGET_MS
+BULKHEAD_DEFAULTS = {
+    'gemini': (4, 20000),
+    'rapidapi': (8, 2000),
+    'perenual': (8, 2000),
+    'supabase': (16, 1000),
+}
+BULKHEAD_MIN_CONCURRENCY = int(os.getenv("BULKHEAD_MIN_CONCURRENCY", "1"))
+# Factor applied to a limit when calls run slow or fail
+BULKHEAD_DECREASE_FACTOR = float(
+    os.getenv("BULKHEAD_DECREASE_FACTOR", "0.5"))
+# Bounds of the Retry-After sent with a rejection, which otherwise follows
+# the upstream's recent latency
+BULKHEAD_MIN_RETRY_AFTER_SECONDS = 1
+BULKHEAD_MAX_RETRY_AFTER_SECONDS = int(
+    os.getenv("BULKHEAD_MAX_RETRY_AFTER_SECONDS", "30"))
+# Weight of the newest call in the moving latency average
+LATENCY_SMOOTHING = 0.2
+
+
+def _host(url):
+    return urlsplit(url).netloc if url else ''
+
+
+# Outbound hosts served by each upstream; subdomains match too
+UPSTREAM_HOSTS = {
+    'gemini': ['generativelanguage.googleapis.com'],
+    'rapidapi': [_host(os.getenv("RAPIDAPI_BASE_URL")), 'rapidapi.com'],
+    'perenual': ['perenual.com'],
+    'supabase': [_host(os.getenv("SUPABASE_URL"))],
+}
+
+
+class UpstreamUnavailable(Exception):
+    """
+    Base for failing fast instead of calling an upstream. The app answers
+    these with 503, `code` and a Retry-After of `retry_after` seconds.
+    """
+
+    code = 'upstream_unavailable'
+
+    def __init__(self, name, retry_after, message):
+        super().__init__(message)
+        self.name = name
+        self.retry_after = retry_after
+
+
+class BulkheadFull(UpstreamUnavailable):
+    """Raised when an upstream's concurrency budget is used up."""
+
+    code = 'upstream_busy'
+
+    def __init__(self, name, retry_after):
+        super().__init__(
+            name, retry_after,
+            f"Too many requests to {name} in flight. Try again shortly.")
+
+
+class Bulkhead:
+    """
+    Fail-fast concurrency limit for one upstream with an AIMD limit.
+
+    acquire() takes a slot or raises BulkheadFull; every acquire must be
+    paired with release(latency_seconds, overloaded). A call is treated as
+    a congestion signal when it ran longer than `target_latency_ms` or the
+    caller reports it `overloaded` (timeouts, 5xx, 429). The limit is cut
+    at most once per target latency, so one burst of slow calls halves it
+    once rather than collapsing it to the minimum.
+    """
+
+    def __init__(self, name, max_limit, target_latency_ms, min_limit=1,
+                 decrease_factor=0.5):
+        self.name = name
+        self.max_limit = max_limit
+        self.min_limit = min(min_limit, max_limit)
+        self.target_latency_ms = target_latency_ms
+        self.decrease_factor = decrease_factor
+
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.avg_latency_ms = 0.0
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+        self.accepted = 0
+        self.rejected = 0
+        self.overloaded = 0
+        self.increases = 0
+        self.decreases = 0
+
+    def acquire(self):
+        """Takes a slot, or raises BulkheadFull if none is free."""
+        with self._lock:
+            if self.in_flight >= int(self.limit):
+                self.rejected += 1
+                raise BulkheadFull(self.name, self._retry_after())
+            self.in_flight += 1
+            self.accepted += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def release(self, latency_seconds, overloaded=False):
+        """Frees a slot and adapts the limit to how the call went."""
+        latency_ms = latency_seconds * 1000
+        now = time.monotonic()
+        with self._lock:
+            self.in_flight -= 1
+            self.latency_ms.observe(latency_ms)
+            if self.avg_latency_ms:
+                self.avg_latency_ms += LATENCY_SMOOTHING * (
+                    latency_ms - self.avg_latency_ms)
+            else:
+                self.avg_latency_ms = latency_ms
+
+            if overloaded or latency_ms > self.target_latency_ms:
+                self.overloaded += 1
+                if now - self._last_decrease >= self.target_latency_ms / 1000:
+                    self.limit = max(float(self.min_limit),
+                                     self.limit * self.decrease_factor)
+                    self._last_decrease = now
+                    self.decreases += 1
+            elif self.limit < self.max_limit:
+                self.limit = min(float(self.max_limit),
+                                 self.limit + 1 / self.limit)
+                self.increases += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "limit": round(self.limit, 2),
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "target_latency_ms": self.target_latency_ms,
+                "avg_latency_ms": round(self.avg_latency_ms, 2),
+                "accepted": self.accepted,
+                "rejected": self.rejected,
+                "overloaded": self.overloaded,
+                "increases": self.increases,
+                "decreases": self.decreases,
+                "latency_ms": self.latency_ms.snapshot(),
+            }
+
+    def _retry_after(self):
+        # Roughly when the calls in flight are expected to finish
+        seconds = math.ceil(self.avg_latency_ms / 1000)
+        return min(BULKHEAD_MAX_RETRY_AFTER_SECONDS,
+                   max(BULKHEAD_MIN_RETRY_AFTER_SECONDS, seconds))
+
+
+def _build_bulkheads():
+    bulkheads = {}
+    for name, (max_limit, target_ms) in BULKHEAD_DEFAULTS.items():
+        prefix = f"BULKHEAD_{name.upper()}"
+        bulkheads[name] = Bulkhead(
+            name,
+            max_limit=int(os.getenv(f"{prefix}_MAX_CONCURRENCY", max_limit)),
+            target_latency_ms=float(os.getenv(f"{prefix}_TARGET_MS",
+                                              target_ms)),
+            min_limit=BULKHEAD_MIN_CONCURRENCY,
+            decrease_factor=BULKHEAD_DECREASE_FACTOR,
+        )
+    return bulkheads
+
+
+BULKHEADS = _build_bulkheads()
+
+
+def bulkhead_for_host(host):
+    """Returns the bulkhead guarding calls to `host`, or None."""
+    for name, hosts in UPSTREAM_HOSTS.items():
+        for upstream in hosts:
+            if upstream and (host == upstream
+                             or host.endswith('.' + upstream)):
+                return BULKHEADS[name]
+    return None
+
+
+def get_bulkhead_stats():
+    """Returns limit, in-flight, rejection and latency stats per upstream."""
+    return {name: bulkhead.stats() for name, bulkhead in BULKHEADS.items()}
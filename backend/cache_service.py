@@ -0,0 +1,358 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# --- In-process caching helpers shared by the service layer ---
+
+# Sentinel used to tell "not cached" apart from a cached falsy value
+_MISSING = object()
+
+
+def estimate_size(value):
+    """Approximates the memory footprint of a JSON-like value in bytes."""
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return len(repr(value))
+
+
+class TTLCache:
+    """
+    Thread-safe, bounded cache with per-entry expiry and LRU eviction.
+
+    Entries are evicted least-recently-used first whenever the cache holds
+    more than `max_entries` items or more than `max_bytes` (estimated from
+    the JSON size of the cached values). Cached values are shared between
+    callers and must be treated as read-only.
+
+    With `stale_seconds` set, expired entries are kept that much longer
+    (still subject to LRU eviction): get() treats them as misses, but
+    get_stale() returns them, e.g. while the upstream is down.
+    """
+
+    def __init__(self, max_entries=512, ttl_seconds=300, max_bytes=None,
+                 name='cache', stale_seconds=0):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.stale_seconds = stale_seconds
+
+        # key -> (value, expires_at, size_bytes)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_hits = 0
+
+    def get(self, key, default=None):
+        """Returns the cached value for `key`, or `default` on a miss."""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+
+            value, expires_at, _ = entry
+            now = time.monotonic()
+            if expires_at <= now:
+                # Past the stale window too: the entry is no use to anyone
+                if expires_at + self.stale_seconds <= now:
+                    self._remove(key)
+                    self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def get_stale(self, key, default=None):
+        """
+        Returns the value for `key` even if it expired less than
+        `stale_seconds` ago, or `default`. Does not count as a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+
+            value, expires_at, _ = entry
+            now = time.monotonic()
+            if expires_at + self.stale_seconds <= now:
+                self._remove(key)
+                self.expirations += 1
+                return default
+
+            self._entries.move_to_end(key)
+            if expires_at <= now:
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+            return value
+
+    def set(self, key, value, ttl_seconds=None):
+        """Stores `value` under `key`, evicting old entries if needed."""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        size = estimate_size(value)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            # A single value larger than the whole budget is never cached
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+
+            self._entries[key] = (value, time.monotonic() + ttl, size)
+            self._total_bytes += size
+            self._evict_overflow()
+
+    def invalidate(self, key):
+        """Drops `key` from the cache if present."""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        """Drops every entry and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expirations = 0
+            self.stale_hits = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[1] > time.monotonic()
+
+    def stats(self):
+        """Returns a snapshot of the cache size and hit/miss counters."""
+        with self._lock:
+            return {
+                "name": self.name,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "stale_hits": self.stale_hits,
+            }
+
+    # --- Internal helpers (caller must hold the lock) ---
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._total_bytes -= size
+
+    def _evict_overflow(self):
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes is not None
+                and self._total_bytes > self.max_bytes)
+        ):
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+
+class SingleFlightTimeout(TimeoutError):
+    """Raised when a waiter gives up on an in-flight call for its key."""
+
+
+class _InFlightCall:
+    """Result slot shared by the leader and the waiters of one call."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into a single execution.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is still running wait for it and receive the same result
+    or re-raise the same exception. Waiters give up with SingleFlightTimeout
+    after `wait_timeout_seconds` so a hung upstream cannot pin them forever.
+    """
+
+    def __init__(self, wait_timeout_seconds=None, name='single_flight'):
+        self.name = name
+        self.wait_timeout_seconds = wait_timeout_seconds
+
+        self._calls = {}
+        self._lock = threading.Lock()
+
+        self.executions = 0
+        self.collapsed = 0
+        self.errors = 0
+        self.timeouts = 0
+
+    def do(self, key, func):
+        """Runs `func` once per key at a time and shares its outcome."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _InFlightCall()
+                self._calls[key] = call
+                is_leader = True
+                self.executions += 1
+            else:
+                is_leader = False
+                self.collapsed += 1
+
+        if is_leader:
+            try:
+                call.result = func()
+            except Exception as e:
+                call.error = e
+                with self._lock:
+                    self.errors += 1
+            finally:
+                # Remove the slot before waking waiters so later callers
+                # start a fresh call instead of reading a finished one.
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+        elif not call.done.wait(self.wait_timeout_seconds):
+            with self._lock:
+                self.timeouts += 1
+            raise SingleFlightTimeout(
+                f"Timed out waiting for in-flight call: {key!r}")
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self):
+        """Returns execution/collapse counters and the in-flight count."""
+        with self._lock:
+            return {
+                "name": self.name,
+                "in_flight": len(self._calls),
+                "executions": self.executions,
+                "collapsed": self.collapsed,
+                "errors": self.errors,
+                "timeouts": self.timeouts,
+            }
+
+
+class SQLiteTTLStore:
+    """
+    Small persistent key/value store with per-entry expiry, kept in a local
+    SQLite file so it survives restarts and is shared by worker processes.
+
+    Values are stored as JSON. Storage errors are logged and treated as
+    misses so a broken cache file never fails the request that used it.
+    """
+
+    def __init__(self, path, table='kv_cache', ttl_seconds=3600):
+        self.path = path
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self._schema_ready = False
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Returns the stored value for `key`, or `default` if absent."""
+        try:
+            with self._connection() as conn:
+                row = conn.execute(
+                    f"SELECT value, expires_at FROM {self.table} "
+                    "WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"SQLite cache read failed ({self.table}): {e}")
+            return default
+
+        if row is None or row[1] <= time.time():
+            return default
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl_seconds=None):
+        """Stores `value` under `key` until its TTL runs out."""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        try:
+            with self._connection() as conn:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table} "
+                    "(key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), time.time() + ttl)
+                )
+        except sqlite3.Error as e:
+            print(f"SQLite cache write failed ({self.table}): {e}")
+
+    def delete(self, key):
+        """Removes `key` from the store if present."""
+        try:
+            with self._connection() as conn:
+                conn.execute(
+                    f"DELETE FROM {self.table} WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            print(f"SQLite cache delete failed ({self.table}): {e}")
+
+    def purge_expired(self):
+        """Deletes every expired row and returns how many were removed."""
+        try:
+            with self._connection() as conn:
+                cursor = conn.execute(
+                    f"DELETE FROM {self.table} WHERE expires_at <= ?",
+                    (time.time(),)
+                )
+                return cursor.rowcount
+        except sqlite3.Error as e:
+            print(f"SQLite cache purge failed ({self.table}): {e}")
+            return 0
+
+    @contextmanager
+    def _connection(self):
+        # A short-lived connection per operation keeps the store safe to
+        # use from any thread without sharing sqlite3 connection objects.
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            self._ensure_schema(conn)
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _ensure_schema(self, conn):
+        if self._schema_ready:
+            return
+        with self._lock:
+            if not self._schema_ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                    "expires_at REAL NOT NULL)"
+                )
+                conn.commit()
+                self._schema_ready = True
@@ -0,0 +1,132 @@
+import math
+import threading
+import time
+
+from bulkhead_service import UpstreamUnavailable
+
+# --- Circuit breakers for flaky upstreams ---
+# After `failure_threshold` failures in a row a breaker opens and callers
+# skip the upstream for `reset_timeout_seconds`, instead of each waiting
+# out a timeout or an error page. It then goes half-open: one trial call is
+# let through, and its outcome closes the breaker or opens it again.
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpen(UpstreamUnavailable):
+    """Raised by CircuitBreaker.check() while the upstream is skipped."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(
+            name, retry_after,
+            f"{name} is temporarily unavailable. Try again shortly.")
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open breaker for one upstream.
+
+    Callers run check() before the call, then report its outcome with
+    record_success() or record_failure(reason). check() returns True when
+    the caller holds the half-open trial; that caller must call
+    release_trial() once done, whatever the outcome, so a trial that ended
+    without a verdict (cache hit, rejected by a bulkhead, ...) lets the
+    next call try instead. A trial that never returns is given up after
+    `reset_timeout_seconds`.
+    """
+
+    def __init__(self, name, failure_threshold=3, reset_timeout_seconds=60):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.last_failure = None
+        self._opened_at = 0.0
+        self._trial_started = None
+        self._lock = threading.Lock()
+
+        self.opened = 0
+        self.rejected = 0
+        self.successes = 0
+        self.failures = 0
+
+    def check(self):
+        """
+        Raises CircuitOpen unless a call may go to the upstream now.
+        Returns True if this call is the half-open trial.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self.state == CLOSED:
+                return False
+
+            if self.state == OPEN:
+                if now - self._opened_at < self.reset_timeout_seconds:
+                    self.rejected += 1
+                    raise CircuitOpen(self.name, self._retry_after(now))
+                self.state = HALF_OPEN
+                self._trial_started = None
+
+            # Half-open: one trial at a time
+            if (self._trial_started is not None and now - self._trial_started
+                    < self.reset_timeout_seconds):
+                self.rejected += 1
+                raise CircuitOpen(self.name, 1)
+            self._trial_started = now
+            return True
+
+    def release_trial(self):
+        """Ends a half-open trial; without a verdict the next call tries."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._trial_started = None
+
+    def record_success(self):
+        with self._lock:
+            self.successes += 1
+            self.consecutive_failures = 0
+            if self.state != CLOSED:
+                print(f"Circuit '{self.name}' closed: upstream recovered.")
+            self.state = CLOSED
+            self._trial_started = None
+
+    def record_failure(self, reason):
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_failure = reason
+            if self.state == HALF_OPEN or (
+                    self.state == CLOSED and
+                    self.consecutive_failures >= self.failure_threshold):
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+                self._trial_started = None
+                self.opened += 1
+                print(f"Circuit '{self.name}' opened for "
+                      f"{self.reset_timeout_seconds}s after "
+                      f"{self.consecutive_failures} failures: {reason}")
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout_seconds": self.reset_timeout_seconds,
+                "retry_after": (self._retry_after(now)
+                                if self.state == OPEN else 0),
+                "last_failure": self.last_failure,
+                "opened": self.opened,
+                "rejected": self.rejected,
+                "successes": self.successes,
+                "failures": self.failures,
+            }
+
+    def _retry_after(self, now):
+        remaining = self.reset_timeout_seconds - (now - self._opened_at)
+        return max(1, math.ceil(remaining))
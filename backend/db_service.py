@@ -1,31 +1,225 @@
-from supabase import create_client, Client
+import base64
+import hashlib
+import itertools
+import json
 import os
+import re
+import threading
+import time
+
+import settings
+from bulkhead_service import BULKHEADS
+from cache_service import SingleFlight, TTLCache, estimate_size
+from metrics_service import OperationMetrics
+from sqlite_backend import SQLiteClient
 # import uuid
 
 # --- Environment Setup ---
+settings.load_environment()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
 
-# Initialize Supabase client
-if SUPABASE_URL and SUPABASE_SERVICE_KEY:
-    try:
-        supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
-    except Exception as e:
-        print(f"FATAL: Could not initialize Supabase Client: {e}")
-        supabase = None
-else:
+# Storage backend behind every function in this module: 'supabase' (the
+# hosted project) or 'sqlite' (embedded database with the same schema, for
+# local load tests and a fast dev mode; see sqlite_backend.py)
+DB_BACKEND = os.getenv("DB_BACKEND", "supabase").lower()
+SQLITE_DB_PATH = os.getenv(
+    "SQLITE_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                 '.cache', 'gardenwise.sqlite3')
+)
+
+
+def create_storage_client(backend: str = None):
+    """
+    Creates the client for the configured storage backend. Both backends
+    expose the supabase-py query builder interface (table/rpc/execute).
+    Returns None if the backend cannot be initialized.
+    """
+    backend = backend or DB_BACKEND
+
+    if backend == 'sqlite':
+        try:
+            return SQLiteClient(SQLITE_DB_PATH)
+        except Exception as e:
+            print(f"FATAL: Could not open SQLite database "
+                  f"'{SQLITE_DB_PATH}': {e}")
+            return None
+
+    if backend != 'supabase':
+        print(f"FATAL: Unknown DB_BACKEND '{backend}'.")
+        return None
+
+    # Initialize Supabase client
+    if SUPABASE_URL and SUPABASE_SERVICE_KEY:
+        try:
+            # Imported here: the supabase package is slow to import and
+            # unused with the SQLite backend
+            from supabase import create_client
+            return create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+        except Exception as e:
+            print(f"FATAL: Could not initialize Supabase Client: {e}")
+            return None
+
     print("FATAL: Supabase URL or Service Key missing.")
-    supabase = None
+    return None
+
+
+# Named 'supabase' for historical reasons; holds whichever backend client
+# DB_BACKEND selects. Created on the first query (see get_storage_client),
+# so importing this module opens no connections.
+supabase = None
+_storage_client_created = False
+_storage_client_lock = threading.Lock()
+
+
+def get_storage_client():
+    """
+    Returns the storage client, creating it on first use. A client that
+    failed to initialize is not retried; the result stays None.
+    """
+    global supabase, _storage_client_created
+    if supabase is None and not _storage_client_created:
+        with _storage_client_lock:
+            if supabase is None and not _storage_client_created:
+                supabase = create_storage_client()
+                _storage_client_created = True
+    return supabase
+
+# --- Collection lookup cache ---
+# (user_id, collection_name) -> collection id, so repeat saves to the same
+# collection skip the parent lookup when the save_plant_to_collection RPC is
+# not deployed. The cache is per process: entries are dropped on local
+# rename/delete and on a foreign key error from an insert, but a rename by
+# another worker goes unseen until the TTL ends. The RPC resolves the name
+# server-side in the same single round trip, so it is always used instead
+# when available.
+COLLECTION_ID_CACHE = TTLCache(
+    max_entries=4096,
+    ttl_seconds=int(os.getenv("COLLECTION_ID_CACHE_TTL_SECONDS", "300")),
+    name='collection_ids'
+)
+
+# Server-side function that finds/creates the parent collection and inserts
+# the plant in one round trip (see sql/save_plant_to_collection.sql)
+SAVE_PLANT_RPC = 'save_plant_to_collection'
+# PostgREST/Postgres codes meaning the RPC function is not deployed
+_RPC_MISSING_CODES = ('PGRST202', '42883')
+# Postgres foreign key violation (e.g. a cached parent was deleted)
+_FOREIGN_KEY_VIOLATION = '23503'
+
+_save_plant_rpc_available = True
+
+# Aggregate summary of a user's collections (sql/collection_summaries.sql)
+COLLECTION_SUMMARIES_RPC = 'collection_summaries'
+_collection_summaries_rpc_available = True
+
+# --- Forum feed paging ---
+# Feed pages are keyset-paginated on (created_at, id) so going further back
+# is an index seek (see sql/forum_posts_keyset_index.sql)
+FORUM_PAGE_SIZE = int(os.getenv("FORUM_PAGE_SIZE", "50"))
+FORUM_MAX_PAGE_SIZE = int(os.getenv("FORUM_MAX_PAGE_SIZE", "100"))
+FORUM_EXCERPT_LENGTH = int(os.getenv("FORUM_EXCERPT_LENGTH", "280"))
+# Serialized feed pages, keyed by generation + paging params. Every forum
+# write bumps the generation so stale pages are never served again; the
+# short TTL bounds staleness from writes made by other workers.
+FORUM_FEED_CACHE = TTLCache(
+    max_entries=int(os.getenv("FORUM_FEED_CACHE_MAX_ENTRIES", "256")),
+    ttl_seconds=int(os.getenv("FORUM_FEED_CACHE_TTL_SECONDS", "15")),
+    name='forum_feed'
+)
+# Concurrent misses for the same page share one database query
+FORUM_FEED_FILLS = SingleFlight(name='forum_feed')
+_FORUM_FEED_GENERATIONS = itertools.count(1)
+_forum_feed_generation = 0
+
+# user_id -> author display (email) for forum posts and comments, so forum
+# reads select only their own table instead of joining profiles per row
+AUTHOR_CACHE = TTLCache(
+    max_entries=int(os.getenv("AUTHOR_CACHE_MAX_ENTRIES", "10000")),
+    ttl_seconds=int(os.getenv("AUTHOR_CACHE_TTL_SECONDS", "600")),
+    name='forum_authors'
+)
+# Users without a profile row are remembered briefly so they don't trigger
+# a lookup on every page
+AUTHOR_CACHE_MISSING_TTL_SECONDS = 60
+ANONYMOUS_AUTHOR = 'Anonymous User'
+
+# Comment threads: top-level comments are paged; replies are nested up to
+# COMMENT_TREE_DEPTH levels with at most COMMENT_REPLY_PREVIEW per node, and
+# anything beyond that is loaded on demand with ?parent=<comment_id>
+COMMENT_PAGE_SIZE = int(os.getenv("COMMENT_PAGE_SIZE", "50"))
+COMMENT_MAX_PAGE_SIZE = int(os.getenv("COMMENT_MAX_PAGE_SIZE", "200"))
+COMMENT_TREE_DEPTH = int(os.getenv("COMMENT_TREE_DEPTH", "3"))
+COMMENT_REPLY_PREVIEW = int(os.getenv("COMMENT_REPLY_PREVIEW", "10"))
+# Per-parent reply counts and previews for one tree level
+# (sql/comment_reply_previews.sql)
+COMMENT_REPLIES_RPC = 'comment_reply_previews'
+_comment_replies_rpc_available = True
+# Timestamps as PostgREST returns them; anything else in a cursor is rejected
+_CURSOR_TIMESTAMP = re.compile(
+    r'^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(\.\d+)?(Z|[+-]\d{2}(:?\d{2})?)?$')
+
+# --- Query metrics ---
+# Wall time, row count and response size per logical operation
+# (e.g. 'collections.select'), exposed via the metrics endpoint
+DB_METRICS = OperationMetrics(name='db')
+# Queries slower than this are logged with their filters (0 disables)
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "500"))
 
 # --- Helper to handle Supabase API calls and errors ---
 
 
-def _handle_supabase_query(query_func):
-    """Executes a Supabase query and handles standard API errors."""
-    if not supabase:
+def _handle_supabase_query(query_func, operation='unknown', filters=None):
+    """
+    Executes a Supabase query and handles standard API errors.
+
+    Args:
+        query_func: Callable that builds and executes the query
+        operation: Logical name recorded in DB_METRICS, e.g.
+            'collections.select'
+        filters: Filters applied by the query, logged for slow queries
+
+    Raises bulkhead_service.BulkheadFull when too many Supabase queries are
+    already in flight.
+    """
+    if not get_storage_client():
         return {"status": "error", "message": "Database"
                 " client failed to initialize."}
 
+    # The embedded SQLite backend has no upstream to protect
+    bulkhead = BULKHEADS['supabase'] if DB_BACKEND == 'supabase' else None
+    if bulkhead is not None:
+        bulkhead.acquire()
+
+    started = time.perf_counter()
+    result = {"status": "error"}
+    try:
+        result = _execute_supabase_query(query_func)
+    finally:
+        duration_ms = (time.perf_counter() - started) * 1000
+        if bulkhead is not None:
+            # Errors without a Postgres/PostgREST code are transport
+            # failures (timeouts, refused connections), i.e. congestion
+            bulkhead.release(duration_ms / 1000, overloaded=(
+                result['status'] == 'error' and 'code' not in result))
+
+    data = result.get('data')
+    rows = len(data) if isinstance(data, list) else int(data is not None)
+    size_bytes = estimate_size(data) if data is not None else 0
+    DB_METRICS.record(operation, duration_ms, rows=rows,
+                      size_bytes=size_bytes,
+                      error=result['status'] == 'error')
+
+    if DB_SLOW_QUERY_MS and duration_ms >= DB_SLOW_QUERY_MS:
+        print(f"Slow query: {operation} took {duration_ms:.0f} ms "
+              f"(rows={rows}, bytes={size_bytes}, filters={filters or {}})")
+
+    return result
+
+
+def _execute_supabase_query(query_func):
+    """Runs query_func and maps the response/exception to a status dict."""
     try:
         # The query_func argument is the actual lambda function
         response = query_func()
@@ -43,12 +237,33 @@ def _handle_supabase_query(query_func):
         if response.data is None or len(response.data) == 0:
             return {"status": "empty", "message": "No records found."}
 
-        return {"status": "success", "data": response.data}
+        result = {"status": "success", "data": response.data}
+        # Set when the query asked for count='exact'
+        count = getattr(response, 'count', None)
+        if isinstance(count, int):
+            result["count"] = count
+        return result
 
     except Exception as e:
         # Catch network or request exceptions
         print(f"Database Exception: {e}")
-        return {"status": "error", "message": f"Database query failed: {e}"}
+        result = {"status": "error", "message": f"Database query failed: {e}"}
+        # postgrest raises APIError carrying the Postgres/PostgREST code
+        if isinstance(getattr(e, 'code', None), str):
+            result["code"] = e.code
+        return result
+
+def get_db_stats():
+    """Returns per-operation query metrics and database-side cache counters."""
+    return {
+        "operations": DB_METRICS.snapshot(),
+        "slow_query_ms": DB_SLOW_QUERY_MS,
+        "caches": {
+            cache.name: cache.stats()
+            for cache in (COLLECTION_ID_CACHE, FORUM_FEED_CACHE, AUTHOR_CACHE)
+        },
+        "single_flight": FORUM_FEED_FILLS.stats(),
+    }
 
 # --- CRUD Functions ---
 
@@ -71,13 +286,98 @@ def create_empty_collection(user_id, collection_name: str):
                                                     returning='representation'
                                                     ).execute()
 
-    return _handle_supabase_query(query_func)
+    result = _handle_supabase_query(query_func, 'collections.insert',
+                                    {'user_id': user_id, 'collection_name': collection_name})
+
+    if result['status'] == 'success' and result['data'][0].get('id'):
+        COLLECTION_ID_CACHE.set((user_id, collection_name),
+                                result['data'][0]['id'])
+
+    return result
+
+
+def _build_plant_record(collection_id, plant_data):
+    """Builds the collection_plants row for a plant payload."""
+    return {
+        "collection_id": collection_id,
+        "common_name": plant_data.get('common_name', 'Unnamed Plant'),
+        "plant_details_json": plant_data,  # Store the full JSON data
+    }
+
+
+def _insert_collection_plant(collection_id, plant_data):
+    """Inserts a plant under an already known collection ID."""
+    plant_record = _build_plant_record(collection_id, plant_data)
+
+    def query_func():
+        # Insert the record into the collection_plants child table
+        return (
+                supabase
+                .table('collection_plants')
+                .insert(plant_record)
+                .execute()
+        )
+
+    return _handle_supabase_query(query_func, 'collection_plants.insert',
+                                  {'collection_id': collection_id})
 
 
 def save_plant_to_collection(user_id, plant_data, collection_name: str):
     """
     Saves a plant record to the 'collection_plants' table, linking it
     to the correct collection PARENT record.
+
+    A single round trip: the save_plant_to_collection RPC finds or creates
+    the parent by name and inserts the plant server-side, so a collection
+    renamed or deleted by another worker never receives the plant. Without
+    the RPC, a cached collection ID means a plain insert, and otherwise the
+    step-by-step path looks the parent up first.
+    """
+    global _save_plant_rpc_available
+
+    cache_key = (user_id, collection_name)
+
+    # 1. Find-or-create and insert server-side
+    if _save_plant_rpc_available:
+        def rpc_func():
+            return supabase.rpc(SAVE_PLANT_RPC, {
+                "p_user_id": user_id,
+                "p_collection_name": collection_name,
+                "p_common_name": plant_data.get('common_name',
+                                                'Unnamed Plant'),
+                "p_plant_details": plant_data,
+            }).execute()
+
+        result = _handle_supabase_query(rpc_func, f'rpc.{SAVE_PLANT_RPC}',
+                                        {'user_id': user_id, 'collection_name': collection_name})
+
+        if result.get('code') not in _RPC_MISSING_CODES:
+            if result['status'] == 'success':
+                COLLECTION_ID_CACHE.set(
+                    cache_key, result['data'][0]['collection_id'])
+            return result
+
+        print(f"RPC '{SAVE_PLANT_RPC}' not found. "
+              "Falling back to multi-step save.")
+        _save_plant_rpc_available = False
+
+    # 2. No RPC, known collection: a single insert
+    collection_id = COLLECTION_ID_CACHE.get(cache_key)
+    if collection_id is not None:
+        result = _insert_collection_plant(collection_id, plant_data)
+        if result.get('code') != _FOREIGN_KEY_VIOLATION:
+            return result
+        # The cached parent was deleted elsewhere; resolve it again
+        COLLECTION_ID_CACHE.invalidate(cache_key)
+
+    # 3. No RPC: look up / create the parent, then insert
+    return _save_plant_multi_step(user_id, plant_data, collection_name)
+
+
+def _save_plant_multi_step(user_id, plant_data, collection_name: str):
+    """
+    Step-by-step save used when the RPC function is unavailable: find the
+    parent collection, create it if needed, then insert the plant.
     """
 
     # 1. Find the parent collection ID based on user_id and collection_name
@@ -93,7 +393,8 @@ def save_plant_to_collection(user_id, plant_data, collection_name: str):
             execute()
         )
 
-    collection_response = _handle_supabase_query(get_collection_id_func)
+    collection_response = _handle_supabase_query(
+        get_collection_id_func, 'collections.select', {'user_id': user_id, 'collection_name': collection_name})
 
     collection_id = None
 
@@ -122,117 +423,179 @@ def save_plant_to_collection(user_id, plant_data, collection_name: str):
     if not collection_id:
         return collection_response
 
-    # 2. Prepare the child plant record
-    plant_record = {
-        "collection_id": collection_id,
-        "common_name": plant_data.get('common_name', 'Unnamed Plant'),
-        "plant_details_json": plant_data,  # Store the full JSON data
-    }
+    # 2. Insert the child plant record
+    result = _insert_collection_plant(collection_id, plant_data)
+    # Don't cache a parent deleted between the lookup and the insert
+    if result.get('code') != _FOREIGN_KEY_VIOLATION:
+        COLLECTION_ID_CACHE.set((user_id, collection_name), collection_id)
+    return result
 
-    def query_func():
-        # Insert the record into the collection_plants child table
-        return (
-                supabase
-                .table('collection_plants')
-                .insert(plant_record)
-                .execute()
-        )
 
-    return _handle_supabase_query(query_func)
+# Columns of collection_plants that callers may project
+COLLECTION_PLANT_FIELDS = (
+    'id', 'collection_id', 'common_name', 'plant_details_json', 'added_at'
+)
 
 
-def get_user_collections(user_id: str):
+def get_user_collections(user_id: str, fields=None):
     """
-    Retrieves all collection records for a specific user ID.
+    Retrieves all collection records for a specific user ID, with each
+    collection's plants embedded, in a single query.
+
+    Args:
+        user_id: Owner of the collections
+        fields: Optional list of collection_plants columns to return for
+            each plant (see COLLECTION_PLANT_FIELDS). Leaving out
+            'plant_details_json' keeps list views light.
+
+    Returns:
+        {"status": "success", "data": {collection_name: [plants]}}
     """
-    # 1. Get all parent collections owned by the user
-    def get_parents_func():
-        # Targets the 'collections' table
+    if fields:
+        unknown = [f for f in fields if f not in COLLECTION_PLANT_FIELDS]
+        if unknown:
+            return {
+                "status": "error",
+                "message": f"Unknown plant fields: {', '.join(unknown)}",
+                "code": "invalid_fields",
+            }
+        plant_columns = ', '.join(fields)
+    else:
+        plant_columns = '*'
+
+    # Parent collections with their child plants nested via the
+    # collection_plants foreign key (PostgREST resource embedding)
+    def query_func():
         return (
             supabase
             .table('collections')
-            .select('id, collection_name')
+            .select(f'id, collection_name, collection_plants({plant_columns})')
             .eq('user_id', user_id)
             .order('collection_name')
             .execute()
         )
 
-    parents_response = _handle_supabase_query(get_parents_func)
+    response = _handle_supabase_query(query_func, 'collections.select',
+                                      {'user_id': user_id})
 
-    if parents_response['status'] == 'empty':
+    if response['status'] == 'empty':
         return {"status": "empty", "message": "No collections found."}
-    if parents_response['status'] == 'error':
-        return parents_response
+    if response['status'] == 'error':
+        return response
 
     # Defensive check: Ensure data is a list before proceeding
-    parent_collections = parents_response.get('data')
-    if not isinstance(parent_collections, list):
-        print(
-            f"Error: Parent collection data not list: {parent_collections}")
+    collections = response.get('data')
+    if not isinstance(collections, list):
+        print(f"Error: Collection data not list: {collections}")
         return {"status": "error", "message": "Corrupt parent collection."}
 
-    # 2. Get all child plant records related to those parent collections
-    collection_ids = [c.get('id') for c in parent_collections if isinstance(
-        c, dict) and 'id' in c]  # Use .get for safety
+    final_collections = {}
+    for collection in collections:
+        collection_name = collection.get('collection_name')
+        if collection_name:
+            final_collections[collection_name] = (
+                collection.get('collection_plants') or [])
+
+    return {"status": "success", "data": final_collections}
 
-    def get_children_func():
-        # Targets the 'collection_plants' table
+
+# Planning-relevant plant fields, pulled out of plant_details_json by the
+# database (PostgREST JSON path selection) so descriptions and image URLs
+# are never transferred for AI prompts
+PLANNING_PLANT_COLUMNS = (
+    'common_name, '
+    'scientific_name:plant_details_json->>scientific_name, '
+    'light:plant_details_json->care_instructions->>light, '
+    'watering:plant_details_json->care_instructions->>watering, '
+    'ideal_temp:plant_details_json->care_instructions->>ideal_temp'
+)
+
+
+def get_collection_planning_fields(user_id: str, collection_name: str):
+    """
+    Retrieves the plants of one collection with only the fields used for
+    garden planning (names, light, watering, ideal_temp).
+
+    Returns:
+        {"status": "success", "data": [plants]}, or status 'empty' with
+        code 'collection_not_found'
+    """
+    def query_func():
         return (
             supabase
-            .table('collection_plants')
-            .select('*')
-            .in_('collection_id', collection_ids)
-            .order('collection_id')
+            .table('collections')
+            .select(f'id, collection_plants({PLANNING_PLANT_COLUMNS})')
+            .eq('user_id', user_id)
+            .eq('collection_name', collection_name)
+            .order('id', foreign_table='collection_plants')
+            .limit(1)
             .execute()
         )
 
-    children_response = _handle_supabase_query(get_children_func)
+    response = _handle_supabase_query(
+        query_func, 'collections.select',
+        {'user_id': user_id, 'collection_name': collection_name})
 
-    # Check for errors in children response (empty is okay)
-    if children_response['status'] == 'error':
-        if children_response['message'] != 'No records found.':
-            return children_response
-        else:
-            # Convert the 'empty' error back to an empty successful state
-            children_response = {'status': 'success', 'data': []}
+    if response['status'] == 'empty':
+        return {"status": "empty", "message": "Collection not found.",
+                "code": "collection_not_found"}
+    if response['status'] == 'error':
+        return response
 
-    # 3. Join the data into the final structure
-    children_data = children_response.get('data', [])
+    return {"status": "success",
+            "data": response['data'][0].get('collection_plants') or []}
 
-    try:
-        # Create a mapping of collection_id to collection_name
-        collection_name_map = {c['id']: c['collection_name']
-                               for c in parent_collections}
-
-        # Initialize plant map with all parent IDs
-        plant_map = {c['id']: [] for c in parent_collections}
-
-        # Aggregate children data
-        if children_data:
-            for plant in children_data:
-                # Use .get() for safety
-                collection_id = plant.get('collection_id')
-                if collection_id and collection_id in plant_map:
-                    plant_map[collection_id].append(plant)
-
-        # 4. Final grouping and aggregation: Map IDs back to Names
-        final_collections = {}
-        for collection_id, plants_list in plant_map.items():
-            collection_name = collection_name_map.get(collection_id)
-            if collection_name:
-                final_collections[collection_name] = plants_list
-
-        return {"status": "success", "data": final_collections}
 
-    except Exception as e:
-        # FINAL CRASH CATCH: This ensures the server never crashes silently
-        print(f"FATAL DATA AGGREGATION CRASH: {e}")
-        return {
-            "status": "error",
-            "message": (
-                f"Server failed to aggregate collections data: {e}"
-            ),
-        }
+def get_collection_summaries(user_id: str):
+    """
+    Retrieves id, name, plant count and last-modified time for each of the
+    user's collections from one aggregate query, without plant bodies.
+    Falls back to an embedded count (using the collection's created_at as
+    last_modified) if the collection_summaries RPC is not deployed.
+    """
+    global _collection_summaries_rpc_available
+
+    if _collection_summaries_rpc_available:
+        def rpc_func():
+            return supabase.rpc(COLLECTION_SUMMARIES_RPC,
+                                {"p_user_id": user_id}).execute()
+
+        result = _handle_supabase_query(
+            rpc_func, f'rpc.{COLLECTION_SUMMARIES_RPC}', {'user_id': user_id})
+
+        if result.get('code') not in _RPC_MISSING_CODES:
+            return result
+
+        print(f"RPC '{COLLECTION_SUMMARIES_RPC}' not found. "
+              "Falling back to embedded count.")
+        _collection_summaries_rpc_available = False
+
+    def query_func():
+        return (
+            supabase
+            .table('collections')
+            .select('id, collection_name, created_at, collection_plants(count)')
+            .eq('user_id', user_id)
+            .order('collection_name')
+            .execute()
+        )
+
+    result = _handle_supabase_query(query_func, 'collections.select',
+                                    {'user_id': user_id})
+
+    if result['status'] == 'success':
+        summaries = []
+        for collection in result['data']:
+            counts = collection.get('collection_plants') or [{}]
+            summaries.append({
+                "id": collection.get('id'),
+                "collection_name": collection.get('collection_name'),
+                "plant_count": counts[0].get('count', 0),
+                "last_modified": collection.get('created_at'),
+            })
+        result['data'] = summaries
+
+    return result
 
 
 def delete_plant_record(user_id, plant_id: str):
@@ -251,7 +614,8 @@ def delete_plant_record(user_id, plant_id: str):
             .execute()
         )
 
-    return _handle_supabase_query(query_func)
+    return _handle_supabase_query(query_func, 'collection_plants.delete',
+                                  {'id': plant_id})
 
 # --- NEW FUNCTION: Deletes the Collection Container ---
 
@@ -262,6 +626,8 @@ def delete_collection_container(user_id, collection_name: str):
     in the database to delete all linked plant records.
     """
 
+    COLLECTION_ID_CACHE.invalidate((user_id, collection_name))
+
     def query_func():
         # Delete the collection container by user_id and name
         return (
@@ -273,7 +639,8 @@ def delete_collection_container(user_id, collection_name: str):
             .execute()
         )
 
-    return _handle_supabase_query(query_func)
+    return _handle_supabase_query(query_func, 'collections.delete',
+                                  {'user_id': user_id, 'collection_name': collection_name})
 
 
 def rename_collection(user_id: str, old_name: str, new_name: str):
@@ -294,7 +661,9 @@ def rename_collection(user_id: str, old_name: str, new_name: str):
             .execute()
         )
 
-    check_result = _handle_supabase_query(check_new_name_func)
+    check_result = _handle_supabase_query(
+        check_new_name_func, 'collections.select',
+        {'user_id': user_id, 'collection_name': new_name})
 
     # If the new name already exists, return error
     if check_result['status'] == 'success':
@@ -304,6 +673,10 @@ def rename_collection(user_id: str, old_name: str, new_name: str):
             "code": "duplicate_name"
         }
 
+    # Both names will now point elsewhere (or nowhere)
+    COLLECTION_ID_CACHE.invalidate((user_id, old_name))
+    COLLECTION_ID_CACHE.invalidate((user_id, new_name))
+
     # Now perform the rename
     def query_func():
         return (
@@ -315,7 +688,67 @@ def rename_collection(user_id: str, old_name: str, new_name: str):
             .execute()
         )
 
-    return _handle_supabase_query(query_func)
+    return _handle_supabase_query(
+        query_func, 'collections.update',
+        {'user_id': user_id, 'collection_name': old_name})
+
+
+def invalidate_author(user_id: str):
+    """Drops a user's cached author display (e.g. after an email change)."""
+    AUTHOR_CACHE.invalidate(user_id)
+
+
+def _attach_authors(records: list):
+    """
+    Sets 'author_email' on each post/comment from AUTHOR_CACHE, looking up
+    all cache misses with a single profiles query.
+    """
+    authors = {}
+    misses = set()
+    for record in records:
+        user_id = record.get('user_id')
+        if not user_id or user_id in authors or user_id in misses:
+            continue
+        email = AUTHOR_CACHE.get(user_id)
+        if email is None:
+            misses.add(user_id)
+        else:
+            authors[user_id] = email
+
+    if misses:
+        def query_func():
+            return (
+                supabase
+                .table('profiles')
+                .select('id, email')
+                .in_('id', sorted(misses))
+                .execute()
+            )
+
+        response = _handle_supabase_query(query_func, 'profiles.select',
+                                          {'id': f'in ({len(misses)} ids)'})
+
+        # On error, show the fallback for this page but cache nothing
+        if response['status'] != 'error':
+            found = {
+                row['id']: row.get('email')
+                for row in response.get('data') or []
+            }
+            for user_id in misses:
+                email = found.get(user_id)
+                if email:
+                    AUTHOR_CACHE.set(user_id, email)
+                else:
+                    email = ANONYMOUS_AUTHOR
+                    AUTHOR_CACHE.set(
+                        user_id, email,
+                        ttl_seconds=AUTHOR_CACHE_MISSING_TTL_SECONDS)
+                authors[user_id] = email
+
+    for record in records:
+        record['author_email'] = authors.get(record.get('user_id'),
+                                             ANONYMOUS_AUTHOR)
+    return records
 
 
 def create_forum_post(user_id: str, title: str, content: str):
@@ -332,47 +765,197 @@ def create_forum_post(user_id: str, title: str, content: str):
         # Targets the 'forum_posts' table
         return supabase.table('forum_posts').insert(post_record).execute()
         
-    return _handle_supabase_query(query_func)
+    response = _handle_supabase_query(query_func, 'forum_posts.insert',
+                                      {'user_id': user_id})
+    if response['status'] == 'success':
+        invalidate_forum_feed()
+    return response
+
+def encode_feed_cursor(post: dict):
+    """Builds the opaque cursor pointing just past the given post/comment."""
+    raw = json.dumps([post['created_at'], post['id']])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
 
-def get_recent_forum_posts(user_id: str = None):
+
+def decode_feed_cursor(cursor: str):
     """
-    Retrieves the 50 most recent forum posts for the public view.
-    Posts must be joined with profiles to display the user's email/name.
+    Parses a feed cursor back into (created_at, id).
+    Raises ValueError if the cursor is malformed.
     """
-    
-    # --- CRITICAL FIX: Ensure profiles are retrieved for existing posts ---
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, post_id = json.loads(base64.urlsafe_b64decode(padded))
+        # Validates the timestamp before it is placed in a filter string
+        if not _CURSOR_TIMESTAMP.match(str(created_at)):
+            raise ValueError("cursor timestamp is malformed")
+        if isinstance(post_id, bool) or not isinstance(post_id, int):
+            raise ValueError("cursor id must be an integer")
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+    return created_at, post_id
+
+
+def _excerpt(content, length: int):
+    """Truncates post content to roughly 'length' characters."""
+    if not isinstance(content, str) or len(content) <= length:
+        return content, False
+    return content[:length].rstrip() + '…', True
+
+
+def _feed_page_size(limit):
+    return min(max(limit or FORUM_PAGE_SIZE, 1), FORUM_MAX_PAGE_SIZE)
+
+
+def get_recent_forum_posts(user_id: str = None, limit: int = None,
+                           cursor: str = None, excerpt: bool = False):
+    """
+    Retrieves one page of forum posts, newest first, for the public view.
+    Author emails are resolved through AUTHOR_CACHE rather than a join.
+
+    Args:
+        limit: Page size (defaults to FORUM_PAGE_SIZE, capped at
+            FORUM_MAX_PAGE_SIZE)
+        cursor: 'next_cursor' from the previous page; only posts older than
+            it are returned
+        excerpt: Truncate each post's content to FORUM_EXCERPT_LENGTH
+
+    Returns:
+        {"status": "success", "data": [posts], "next_cursor": str | None}
+    """
+    page_size = _feed_page_size(limit)
+
+    if cursor:
+        try:
+            created_at, post_id = decode_feed_cursor(cursor)
+        except ValueError as e:
+            return {"status": "error", "message": str(e),
+                    "code": "invalid_cursor"}
     
     def query_func():
-        # Select post data and profile data (email) via a join (using PostgREST 'select' format)
-        # We join on the 'profiles' table using the foreign key relationship
-        return supabase.table('forum_posts').select('*, profiles(email)').order('created_at', desc=True).limit(50).execute()
+        query = supabase.table('forum_posts').select('*')
+        if cursor:
+            # Row-value comparison (created_at, id) < (cursor) spelled out
+            # for PostgREST
+            query = query.or_(
+                f'created_at.lt."{created_at}",'
+                f'and(created_at.eq."{created_at}",id.lt.{post_id})'
+            )
+        # One extra row tells us whether another page exists
+        return (
+            query
+            .order('created_at', desc=True)
+            .order('id', desc=True)
+            .limit(page_size + 1)
+            .execute()
+        )
         
-    response = _handle_supabase_query(query_func)
+    response = _handle_supabase_query(query_func, 'forum_posts.select',
+                                      {'cursor': cursor, 'limit': page_size})
     
     if response['status'] == 'success':
-        # The response data is a list of dictionaries. We must clean up the joined profiles structure.
-        
-        cleaned_posts = []
-        for post in response['data']:
-            
-            # CRITICAL CLEANUP: Flatten the nested profiles array
-            if 'profiles' in post and isinstance(post['profiles'], list) and len(post['profiles']) > 0:
-                post['author_email'] = post['profiles'][0]['email']
-            elif 'profiles' in post and isinstance(post['profiles'], dict):
-                 # Handle single object return if PostgREST changes
-                post['author_email'] = post['profiles']['email']
-            else:
-                 # Default if profile join fails
-                post['author_email'] = 'Anonymous User'
-                
-            del post['profiles']
-            cleaned_posts.append(post)
-            
-        response['data'] = cleaned_posts
-        return response
+        posts = response['data']
+
+        has_more = len(posts) > page_size
+        posts = _attach_authors(posts[:page_size])
+        response['next_cursor'] = encode_feed_cursor(posts[-1]) if has_more else None
+
+        if excerpt:
+            for post in posts:
+                post['content'], post['content_truncated'] = _excerpt(
+                    post.get('content'), FORUM_EXCERPT_LENGTH)
+
+        response['data'] = posts
         
     return response
 
+
+def invalidate_forum_feed():
+    """Makes every cached feed page stale after a forum write."""
+    global _forum_feed_generation
+    _forum_feed_generation = next(_FORUM_FEED_GENERATIONS)
+
+
+def get_forum_feed_page(limit: int = None, cursor: str = None,
+                        excerpt: bool = False):
+    """
+    Read-through cache in front of get_recent_forum_posts.
+
+    Returns:
+        {"status": "success", "body": serialized JSON list,
+         "etag": str, "last_modified": epoch seconds,
+         "next_cursor": str | None}
+        or the error response from get_recent_forum_posts.
+    """
+    key = (_forum_feed_generation, _feed_page_size(limit), cursor or None,
+           bool(excerpt))
+
+    page = FORUM_FEED_CACHE.get(key)
+    if page is not None:
+        return page
+
+    def load_page():
+        # Another request may have filled the page while we waited
+        cached = FORUM_FEED_CACHE.get(key)
+        if cached is not None:
+            return cached
+
+        response = get_recent_forum_posts(limit=limit, cursor=cursor,
+                                          excerpt=excerpt)
+        if response['status'] == 'error':
+            return response
+
+        body = json.dumps(response.get('data') or [], default=str)
+        page = {
+            "status": "success",
+            "body": body,
+            "etag": hashlib.sha256(body.encode()).hexdigest(),
+            "last_modified": time.time(),
+            "next_cursor": response.get('next_cursor'),
+        }
+        FORUM_FEED_CACHE.set(key, page)
+        return page
+
+    return FORUM_FEED_FILLS.do(key, load_page)
+
+
+def get_forum_post(post_id: int, include_comments: bool = False):
+    """
+    Retrieves a single forum post by id in one query keyed on the primary
+    key.
+
+    With include_comments, the first page of the comment tree (see
+    get_comment_tree) is added as 'comments', with 'comment_count' and
+    'comments_next_cursor' alongside.
+    """
+    def query_func():
+        return (
+            supabase
+            .table('forum_posts')
+            .select('*')
+            .eq('id', post_id)
+            .limit(1)
+            .execute()
+        )
+
+    response = _handle_supabase_query(
+        query_func, 'forum_posts.select',
+        {'id': post_id, 'include_comments': include_comments})
+
+    if response['status'] == 'success':
+        post = response['data'][0]
+        _attach_authors([post])
+        if include_comments:
+            tree = get_comment_tree(post_id)
+            if tree['status'] == 'error':
+                return tree
+            post['comments'] = tree.get('data', [])
+            post['comments_next_cursor'] = tree.get('next_cursor')
+            post['comment_count'] = tree.get('comment_count', 0)
+        response['data'] = post
+
+    return response
+
+
 def create_forum_comment(user_id: str, post_id: str, content: str, parent_comment_id: str = None):
     """
     Creates a new comment or reply to a forum post.
@@ -391,40 +974,207 @@ def create_forum_comment(user_id: str, post_id: str, content: str, parent_commen
     def query_func():
         return supabase.table('forum_comments').insert(comment_record).execute()
     
-    return _handle_supabase_query(query_func)
+    response = _handle_supabase_query(query_func, 'forum_comments.insert',
+                                      {'post_id': post_id})
+    if response['status'] == 'success':
+        invalidate_forum_feed()
+    return response
 
 
-def get_post_comments(post_id: str):
+def _get_reply_previews(parent_ids: list, preview: int):
     """
-    Retrieves all comments for a specific post, including nested replies.
-    Joins with profiles to get user email.
+    Returns {parent_id: (reply_count, first `preview` replies)} for the
+    given comments, reading at most `preview` replies per parent. One
+    comment_reply_previews RPC call covers all parents; without it, each
+    parent gets its own limited query with an exact count.
     """
+    global _comment_replies_rpc_available
+
+    if _comment_replies_rpc_available:
+        def rpc_func():
+            return supabase.rpc(COMMENT_REPLIES_RPC, {
+                "p_parent_ids": parent_ids,
+                "p_preview": preview,
+            }).execute()
+
+        result = _handle_supabase_query(
+            rpc_func, f'rpc.{COMMENT_REPLIES_RPC}',
+            {'parent_ids': f'in ({len(parent_ids)} ids)', 'preview': preview})
+
+        if result.get('code') not in _RPC_MISSING_CODES:
+            if result['status'] == 'error':
+                return result
+            return {"status": "success", "data": {
+                row['parent_comment_id']: (row['reply_count'],
+                                           row.get('replies') or [])
+                for row in result.get('data', [])}}
+
+        print(f"RPC '{COMMENT_REPLIES_RPC}' not found. "
+              "Falling back to a query per comment.")
+        _comment_replies_rpc_available = False
+
+    previews = {}
+    for parent_id in parent_ids:
+        def query_func():
+            return (
+                supabase
+                .table('forum_comments')
+                .select('*' if preview else 'id', count='exact')
+                .eq('parent_comment_id', parent_id)
+                .order('created_at', desc=False)
+                .order('id', desc=False)
+                .limit(max(preview, 1))
+                .execute()
+            )
+
+        result = _handle_supabase_query(
+            query_func, 'forum_comments.select',
+            {'parent_comment_id': parent_id, 'limit': max(preview, 1)})
+        if result['status'] == 'error':
+            return result
+        if result['status'] == 'success':
+            previews[parent_id] = (result.get('count', len(result['data'])),
+                                   result['data'][:preview])
+
+    return {"status": "success", "data": previews}
+
+
+def _attach_comment_replies(comments: list):
+    """
+    Loads the reply previews under a page of comments, one level at a time
+    down to COMMENT_TREE_DEPTH, and returns every comment loaded. Each node
+    gets 'replies', 'reply_count' (direct replies) and 'has_more_replies'
+    when some replies were left out.
+    """
+    loaded = list(comments)
+    nodes = comments
+    level = 1
+    while nodes:
+        # Below the deepest shown level only the reply counts are needed
+        preview = COMMENT_REPLY_PREVIEW if level < COMMENT_TREE_DEPTH else 0
+        response = _get_reply_previews([node['id'] for node in nodes],
+                                       preview)
+        if response['status'] == 'error':
+            return response
+
+        next_nodes = []
+        for node in nodes:
+            reply_count, shown = response['data'].get(node['id'], (0, []))
+            node['reply_count'] = reply_count
+            node['replies'] = shown
+            node['has_more_replies'] = reply_count > len(shown)
+            next_nodes.extend(shown)
+
+        loaded.extend(next_nodes)
+        nodes = next_nodes
+        level += 1
+
+    return {"status": "success", "data": loaded}
+
+
+def get_comment_tree(post_id: str, parent_id=None, limit: int = None,
+                     cursor: str = None):
+    """
+    Retrieves one page of a post's comment tree (or of the replies under
+    parent_id). The page is a keyset query on its own level and replies are
+    loaded level by level for that page only, so expanding a subtree never
+    reads the rest of the thread.
+
+    Returns:
+        {"status": "success", "data": [nodes], "next_cursor": str | None,
+         "comment_count": int}
+    """
+    page_size = min(max(limit or COMMENT_PAGE_SIZE, 1), COMMENT_MAX_PAGE_SIZE)
+
+    if cursor:
+        try:
+            created_at, after_id = decode_feed_cursor(cursor)
+        except ValueError as e:
+            return {"status": "error", "message": str(e),
+                    "code": "invalid_cursor"}
+
     def query_func():
+        query = (
+            supabase
+            .table('forum_comments')
+            .select('*')
+            .eq('post_id', post_id)
+        )
+        if parent_id is None:
+            query = query.is_('parent_comment_id', 'null')
+        else:
+            query = query.eq('parent_comment_id', parent_id)
+        if cursor:
+            # Comments run oldest first, so the next page is after the cursor
+            query = query.or_(
+                f'created_at.gt."{created_at}",'
+                f'and(created_at.eq."{created_at}",id.gt.{after_id})')
+        return (
+            query
+            .order('created_at', desc=False)
+            .order('id', desc=False)
+            .limit(page_size + 1)
+            .execute()
+        )
+
+    response = _handle_supabase_query(
+        query_func, 'forum_comments.select',
+        {'post_id': post_id, 'parent_comment_id': parent_id,
+         'cursor': cursor, 'limit': page_size + 1})
+    if response['status'] == 'error':
+        return response
+
+    rows = response.get('data', [])
+    if not rows and parent_id is not None:
+        def parent_query_func():
+            return (
+                supabase
+                .table('forum_comments')
+                .select('id')
+                .eq('post_id', post_id)
+                .eq('id', parent_id)
+                .limit(1)
+                .execute()
+            )
+
+        parent = _handle_supabase_query(
+            parent_query_func, 'forum_comments.select',
+            {'post_id': post_id, 'id': parent_id})
+        if parent['status'] == 'error':
+            return parent
+        if parent['status'] == 'empty':
+            return {"status": "error", "message": "Comment not found.",
+                    "code": "parent_not_found"}
+    elif not rows and not cursor:
+        # No top-level comments means no comments at all
+        return response
+
+    page = rows[:page_size]
+    next_cursor = encode_feed_cursor(page[-1]) if len(rows) > page_size else None
+
+    loaded = _attach_comment_replies(page)
+    if loaded['status'] == 'error':
+        return loaded
+    _attach_authors(loaded['data'])
+
+    def count_query_func():
         return (
             supabase
             .table('forum_comments')
-            .select('*, profiles(email)')
+            .select('id', count='exact')
             .eq('post_id', post_id)
-            .order('created_at', desc=False)  # Oldest first for threading
+            .limit(1)
             .execute()
         )
-    
-    response = _handle_supabase_query(query_func)
-    
-    if response['status'] == 'success':
-        # Clean up the nested profiles structure
-        cleaned_comments = []
-        for comment in response['data']:
-            if 'profiles' in comment and isinstance(comment['profiles'], list) and len(comment['profiles']) > 0:
-                comment['author_email'] = comment['profiles'][0]['email']
-            elif 'profiles' in comment and isinstance(comment['profiles'], dict):
-                comment['author_email'] = comment['profiles']['email']
-            else:
-                comment['author_email'] = 'Anonymous User'
-            
-            del comment['profiles']
-            cleaned_comments.append(comment)
-        
-        response['data'] = cleaned_comments
-    
-    return response
\ No newline at end of file
+
+    total = _handle_supabase_query(count_query_func, 'forum_comments.count',
+                                   {'post_id': post_id})
+    if total['status'] == 'error':
+        return total
+
+    return {
+        "status": "success",
+        "data": page,
+        "next_cursor": next_cursor,
+        "comment_count": total.get('count', 0),
+    }
@@ -1,8 +1,11 @@
-from app import app as flask_app  # Import your Flask app instance
+from app import create_app
 
 
 def diagnose_routes():
     """Prints all URL routes registered in the Flask application."""
+    # Only route registration is inspected; no clients are created
+    flask_app = create_app()
+
     print("-" * 50)
     print("FLASK ROUTE DIAGNOSTIC")
     print("-" * 50)
@@ -0,0 +1,252 @@
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from bulkhead_service import bulkhead_for_host
+
+# --- Shared outbound HTTP client ---
+# Every call to RapidAPI, Perenual, Gemini and Supabase goes through one
+# requests.Session so TCP/TLS connections are kept alive and reused per host.
+# Calls to those upstreams also hold a slot in the upstream's bulkhead
+# (see bulkhead_service.py) for their whole duration, retries included.
+
+# Number of distinct hosts to keep connection pools for
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+# Keep-alive connections kept open per host (size to the WSGI thread count)
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+
+# Retries apply to idempotent methods only, with jittered backoff
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+HTTP_BACKOFF_BASE_SECONDS = float(
+    os.getenv("HTTP_BACKOFF_BASE_SECONDS", "0.2"))
+HTTP_BACKOFF_MAX_SECONDS = float(
+    os.getenv("HTTP_BACKOFF_MAX_SECONDS", "2.0"))
+
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+RETRY_STATUS_CODES = frozenset([429, 502, 503, 504])
+
+
+class _HostStats:
+    """Latency and error counters for one upstream host."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def snapshot(self):
+        average = self.total_latency / self.requests if self.requests else 0.0
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "avg_latency_ms": round(average * 1000, 2),
+            "max_latency_ms": round(self.max_latency * 1000, 2),
+        }
+
+
+_host_stats = {}
+_stats_lock = threading.Lock()
+
+# Per-thread deadline (a time.monotonic() value) set with deadline()
+_local = threading.local()
+
+
+def _build_session():
+    """Creates the shared session with pooled adapters for http/https."""
+    session = requests.Session()
+    # None of our upstreams rely on cookies. Rejecting them keeps the shared
+    # session free of per-request state, so it is safe across WSGI threads.
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        max_retries=0,  # Retries are handled below so they can be counted
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+_session = _build_session()
+
+
+def _record(host, latency, error=False, retried=False):
+    with _stats_lock:
+        stats = _host_stats.setdefault(host, _HostStats())
+        stats.requests += 1
+        stats.total_latency += latency
+        stats.max_latency = max(stats.max_latency, latency)
+        if error:
+            stats.errors += 1
+        if retried:
+            stats.retries += 1
+
+
+def _backoff_delay(attempt, response=None):
+    """Full-jitter exponential backoff, honouring a short Retry-After."""
+    if response is not None:
+        retry_after = response.headers.get('Retry-After', '')
+        if retry_after.isdigit():
+            return min(float(retry_after), HTTP_BACKOFF_MAX_SECONDS)
+
+    ceiling = min(HTTP_BACKOFF_MAX_SECONDS,
+                  HTTP_BACKOFF_BASE_SECONDS * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+
+@contextmanager
+def deadline(at):
+    """
+    Bounds every request this thread sends inside the block by `at`, a
+    time.monotonic() value: timeouts are cut to the time left, no retry
+    starts after it, and a request made once it has passed raises
+    requests.exceptions.Timeout without being sent. Nested deadlines keep
+    the earlier one.
+    """
+    previous = getattr(_local, 'deadline', None)
+    _local.deadline = at if previous is None else min(previous, at)
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+def _remaining():
+    """Seconds left before this thread's deadline, or None if unbounded."""
+    at = getattr(_local, 'deadline', None)
+    return None if at is None else at - time.monotonic()
+
+
+def _cap_timeout(timeout, remaining):
+    if isinstance(timeout, tuple):
+        return tuple(_cap_timeout(part, remaining) for part in timeout)
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+def request(method, url, retry=None, bulkhead=True, **kwargs):
+    """
+    Sends an HTTP request through the shared, pooled session.
+
+    Idempotent methods are retried on connection errors and on 429/502/503/
+    504 responses; pass `retry=True/False` to override. Behaves like
+    `requests.request`: returns the final response, or raises the final
+    `requests.exceptions.RequestException`.
+
+    Raises bulkhead_service.BulkheadFull without sending anything when the
+    upstream's concurrency budget is used up. Pass `bulkhead=False` when
+    the caller already holds a slot (e.g. for a streamed response).
+
+    Inside a deadline() block the call is bounded by that deadline.
+    """
+    method = method.upper()
+    host = urlsplit(url).netloc
+    if retry is None:
+        retry = method in IDEMPOTENT_METHODS
+
+    guard = bulkhead_for_host(host) if bulkhead else None
+    if guard is None:
+        return _send(method, url, host, retry, **kwargs)
+
+    guard.acquire()
+    started = time.monotonic()
+    overloaded = True
+    try:
+        response = _send(method, url, host, retry, **kwargs)
+        overloaded = (response.status_code >= 500
+                      or response.status_code in RETRY_STATUS_CODES)
+        return response
+    finally:
+        guard.release(time.monotonic() - started, overloaded=overloaded)
+
+
+def _time_left_for(delay):
+    """True if a retry after `delay` seconds still starts before the deadline."""
+    remaining = _remaining()
+    return remaining is None or remaining > delay
+
+
+def _send(method, url, host, retry, **kwargs):
+    max_attempts = 1 + (HTTP_MAX_RETRIES if retry else 0)
+
+    for attempt in range(max_attempts):
+        remaining = _remaining()
+        if remaining is not None:
+            if remaining <= 0:
+                raise requests.exceptions.Timeout(
+                    f"Deadline passed before {method} {host}")
+            kwargs['timeout'] = _cap_timeout(kwargs.get('timeout'), remaining)
+        is_last = attempt == max_attempts - 1
+        started = time.monotonic()
+
+        try:
+            response = _session.request(method, url, **kwargs)
+        except requests.exceptions.ConnectionError:
+            # Connection failures (incl. connect timeouts) are transient and
+            # safe to retry for idempotent calls.
+            delay = _backoff_delay(attempt)
+            should_retry = not is_last and _time_left_for(delay)
+            _record(host, time.monotonic() - started,
+                    error=True, retried=should_retry)
+            if not should_retry:
+                raise
+            time.sleep(delay)
+            continue
+        except requests.exceptions.RequestException:
+            _record(host, time.monotonic() - started, error=True)
+            raise
+
+        delay = _backoff_delay(attempt, response)
+        should_retry = (
+            response.status_code in RETRY_STATUS_CODES and not is_last
+            and _time_left_for(delay))
+        _record(host, time.monotonic() - started,
+                error=response.status_code >= 500, retried=should_retry)
+
+        if not should_retry:
+            return response
+
+        response.close()
+        time.sleep(delay)
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+def put(url, **kwargs):
+    return request('PUT', url, **kwargs)
+
+
+def patch(url, **kwargs):
+    return request('PATCH', url, **kwargs)
+
+
+def delete(url, **kwargs):
+    return request('DELETE', url, **kwargs)
+
+
+def get_http_stats():
+    """Returns per-host request, error, retry and latency counters."""
+    with _stats_lock:
+        return {host: stats.snapshot() for host, stats in _host_stats.items()}
+
+
+def reset_http_stats():
+    """Clears the per-host counters."""
+    with _stats_lock:
+        _host_stats.clear()
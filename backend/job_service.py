@@ -0,0 +1,357 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from metrics_service import OperationMetrics
+
+# --- Persistent background jobs ---
+
+# Jobs in these states count towards the queue and per-user limits
+ACTIVE_STATES = ('queued', 'running')
+
+
+class JobRejected(Exception):
+    """Raised by JobQueue.submit when the queue or a user's cap is full."""
+
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+def _isoformat(timestamp):
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+class JobQueue:
+    """
+    Background job queue run by a bounded thread pool, with every job kept
+    as a row in a local SQLite file.
+
+    `handler(payload)` does the work and returns (result dict, HTTP status),
+    like the service functions it wraps; a status of 400 or more marks the
+    job failed. Jobs left queued, or running longer than `lease_seconds`
+    (their worker died), are picked up again when a process starts the
+    queue. Each job is claimed with a conditional UPDATE, so processes
+    sharing the file never run the same job twice.
+
+    The pool is created the first time the queue is used (submit, get or
+    stats), so importing a module that defines a queue starts no threads.
+    From then on every use also sweeps the store for leftover jobs, at
+    most once per `recover_interval_seconds`.
+    """
+
+    def __init__(self, path, handler, table='jobs', max_workers=2,
+                 max_queue_depth=100, max_active_per_user=2,
+                 lease_seconds=120, retention_seconds=60 * 60 * 24,
+                 name='jobs', recover_interval_seconds=30):
+        self.path = path
+        self.handler = handler
+        self.table = table
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self.max_active_per_user = max_active_per_user
+        self.lease_seconds = lease_seconds
+        self.retention_seconds = retention_seconds
+        self.name = name
+        self.recover_interval_seconds = recover_interval_seconds
+
+        # Wait (queued -> running) and run time histograms
+        self.timings = OperationMetrics(name=name)
+
+        self._executor = None
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self._closed = False
+        self._next_recovery = 0.0
+
+        self.submitted = 0
+        self.rejected = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.recovered = 0
+
+    def submit(self, user_id, payload):
+        """
+        Stores a new job and schedules it. Returns the job (see get()).
+        Raises JobRejected ('queue_full' or 'user_limit') when a cap is hit.
+        """
+        self._start()
+
+        job_id = uuid.uuid4().hex
+        with self._transaction() as conn:
+            active = conn.execute(
+                f"SELECT COUNT(*) FROM {self.table} "
+                "WHERE user_id = ? AND state IN (?, ?)",
+                (user_id,) + ACTIVE_STATES
+            ).fetchone()[0]
+            if active >= self.max_active_per_user:
+                self._count_rejection()
+                raise JobRejected(
+                    f"At most {self.max_active_per_user} jobs can be pending "
+                    "per user. Wait for one to finish.", 'user_limit')
+
+            queued = conn.execute(
+                f"SELECT COUNT(*) FROM {self.table} WHERE state = 'queued'"
+            ).fetchone()[0]
+            if queued >= self.max_queue_depth:
+                self._count_rejection()
+                raise JobRejected("The job queue is full. Try again shortly.",
+                                  'queue_full')
+
+            conn.execute(
+                f"INSERT INTO {self.table} (id, user_id, state, payload, "
+                "created_at) VALUES (?, ?, 'queued', ?, ?)",
+                (job_id, user_id, json.dumps(payload), time.time())
+            )
+
+        with self._lock:
+            self.submitted += 1
+        self._schedule(job_id)
+        return self.get(job_id)
+
+    def get(self, job_id):
+        """Returns the job as a dict, or None if it does not exist."""
+        self._start()
+        with self._connection() as conn:
+            row = conn.execute(
+                f"SELECT id, user_id, state, result, result_code, "
+                f"created_at, started_at, finished_at FROM {self.table} "
+                "WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            job = {
+                "id": row[0],
+                "user_id": row[1],
+                "state": row[2],
+                "result": json.loads(row[3]) if row[3] else None,
+                "result_code": row[4],
+                "created_at": _isoformat(row[5]),
+                "started_at": _isoformat(row[6]),
+                "finished_at": _isoformat(row[7]),
+            }
+            if job["state"] == 'queued':
+                job["queue_position"] = conn.execute(
+                    f"SELECT COUNT(*) FROM {self.table} "
+                    "WHERE state = 'queued' AND created_at <= ?", (row[5],)
+                ).fetchone()[0]
+        return job
+
+    def wait(self, job_id, timeout=None):
+        """Blocks until a job scheduled by this process finishes."""
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            future.result(timeout)
+        return self.get(job_id)
+
+    def stats(self):
+        """Returns queue depth, outcome counters and wait/run histograms."""
+        queued = running = 0
+        # Depth is read from the shared file so it covers every worker
+        # process; a queue that was never used has no file yet
+        if os.path.exists(self.path):
+            self._start()
+            try:
+                with self._connection() as conn:
+                    counts = dict(conn.execute(
+                        f"SELECT state, COUNT(*) FROM {self.table} "
+                        "WHERE state IN (?, ?) GROUP BY state", ACTIVE_STATES
+                    ).fetchall())
+                queued = counts.get('queued', 0)
+                running = counts.get('running', 0)
+            except sqlite3.Error as e:
+                print(f"Job queue stats failed ({self.table}): {e}")
+
+        with self._lock:
+            return {
+                "name": self.name,
+                "workers": self.max_workers,
+                "queue_depth": queued,
+                "running": running,
+                "in_process": len(self._futures),
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+                "recovered": self.recovered,
+                "timings": self.timings.snapshot(),
+            }
+
+    def shutdown(self, wait=True):
+        """Stops the worker pool; queued jobs stay in the store."""
+        with self._lock:
+            self._closed = True
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    # --- Internal helpers ---
+
+    def _start(self):
+        """Creates the pool if needed and runs a due recovery sweep."""
+        with self._lock:
+            if self._closed:
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix=self.name
+                )
+
+            # Also catches jobs abandoned by other processes since the
+            # last sweep, not only those left over from our own start
+            now = time.monotonic()
+            if now < self._next_recovery:
+                return
+            self._next_recovery = now + self.recover_interval_seconds
+
+        for job_id in self._recover():
+            self._schedule(job_id)
+
+    def _recover(self):
+        """Requeues abandoned jobs, prunes old ones, returns queued ids."""
+        now = time.time()
+        with self._transaction() as conn:
+            recovered = conn.execute(
+                f"UPDATE {self.table} SET state = 'queued', "
+                "started_at = NULL WHERE state = 'running' "
+                "AND started_at < ?", (now - self.lease_seconds,)
+            ).rowcount
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE state NOT IN (?, ?) "
+                "AND finished_at < ?",
+                ACTIVE_STATES + (now - self.retention_seconds,)
+            )
+            job_ids = [row[0] for row in conn.execute(
+                f"SELECT id FROM {self.table} WHERE state = 'queued' "
+                "ORDER BY created_at"
+            )]
+
+        if recovered:
+            print(f"Job queue '{self.name}': requeued {recovered} "
+                  "interrupted jobs.")
+        with self._lock:
+            self.recovered += recovered
+        return job_ids
+
+    def _schedule(self, job_id):
+        with self._lock:
+            if self._executor is None or job_id in self._futures:
+                return
+            future = self._executor.submit(self._run, job_id)
+            self._futures[job_id] = future
+        future.add_done_callback(lambda _: self._forget(job_id))
+
+    def _forget(self, job_id):
+        with self._lock:
+            self._futures.pop(job_id, None)
+
+    def _run(self, job_id):
+        started = time.time()
+        with self._transaction() as conn:
+            claimed = conn.execute(
+                f"UPDATE {self.table} SET state = 'running', started_at = ? "
+                "WHERE id = ? AND state = 'queued'", (started, job_id)
+            ).rowcount
+            row = conn.execute(
+                f"SELECT payload, created_at FROM {self.table} WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+
+        # Another process (or an earlier schedule) got there first
+        if not claimed or row is None:
+            return
+
+        self.timings.record('wait', (started - row[1]) * 1000)
+
+        try:
+            result, result_code = self.handler(json.loads(row[0]))
+        except Exception as e:
+            print(f"Job {job_id} in '{self.name}' raised: {e}")
+            result = {"status": "error",
+                      "message": "The job failed unexpectedly."}
+            result_code = 500
+
+        state = 'succeeded' if result_code < 400 else 'failed'
+        finished = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                f"UPDATE {self.table} SET state = ?, result = ?, "
+                "result_code = ?, finished_at = ? WHERE id = ?",
+                (state, json.dumps(result), result_code, finished, job_id)
+            )
+
+        self.timings.record('run', (finished - started) * 1000,
+                            error=state == 'failed')
+        with self._lock:
+            if state == 'succeeded':
+                self.succeeded += 1
+            else:
+                self.failed += 1
+
+    def _count_rejection(self):
+        with self._lock:
+            self.rejected += 1
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so the limit checks
+        # and the insert in submit() are atomic across processes
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    @contextmanager
+    def _connection(self):
+        # A short-lived connection per operation, as in SQLiteTTLStore
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        try:
+            self._ensure_schema(conn)
+            yield conn
+        finally:
+            conn.close()
+
+    def _ensure_schema(self, conn):
+        if self._schema_ready:
+            return
+        with self._lock:
+            if not self._schema_ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                    "id TEXT PRIMARY KEY, user_id TEXT NOT NULL, "
+                    "state TEXT NOT NULL, payload TEXT NOT NULL, "
+                    "result TEXT, result_code INTEGER, "
+                    "created_at REAL NOT NULL, started_at REAL, "
+                    "finished_at REAL)"
+                )
+                conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {self.table}_state_idx "
+                    f"ON {self.table} (state, created_at)"
+                )
+                conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {self.table}_user_idx "
+                    f"ON {self.table} (user_id, state)"
+                )
+                self._schema_ready = True
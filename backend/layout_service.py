@@ -0,0 +1,257 @@
+import math
+import os
+import string
+import time
+
+import numpy as np
+
+# --- Local garden layout engine ---
+# Places plants on a grid over the bed by spacing, height and sun needs. All
+# candidate positions for a plant are scored at once with NumPy window sums,
+# so a full layout takes milliseconds instead of an LLM round trip.
+
+# Grid resolution; every footprint is a whole number of cells
+LAYOUT_CELL_INCHES = float(os.getenv("LAYOUT_CELL_INCHES", "6"))
+# Limits that keep a single request in the millisecond range
+LAYOUT_MAX_CELLS = int(os.getenv("LAYOUT_MAX_CELLS", "10000"))
+LAYOUT_MAX_PLANTS = int(os.getenv("LAYOUT_MAX_PLANTS", "200"))
+
+# Daily direct-sun hours each sun need is happy with, as [low, high]
+SUN_REQUIREMENTS = {
+    'full': (6.0, 24.0),
+    'partial': (3.0, 6.0),
+    'shade': (0.0, 3.0),
+}
+# Hours assumed for a bed described by a single sun label
+SUN_LABEL_HOURS = {'full': 8.0, 'partial': 4.5, 'shade': 2.0}
+
+DEFAULT_SPACING_INCHES = 12.0
+DEFAULT_HEIGHT_INCHES = 12.0
+
+# Score weights: a missed sun hour costs more than any placement preference
+SUN_WEIGHT = 10.0
+HEIGHT_WEIGHT = 2.0
+PACKING_WEIGHT = 0.1
+
+# Map symbols, one per distinct plant name
+_SYMBOLS = string.ascii_uppercase + string.ascii_lowercase + string.digits
+
+
+def _number(value, field, minimum=0.0):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{field}' must be a number.")
+    if not math.isfinite(number) or number <= minimum:
+        raise ValueError(f"'{field}' must be greater than {minimum:g}.")
+    return number
+
+
+def _sun_label(value, field):
+    label = str(value or 'full').strip().lower()
+    if label not in SUN_REQUIREMENTS:
+        raise ValueError(
+            f"'{field}' must be one of: {', '.join(SUN_REQUIREMENTS)}.")
+    return label
+
+
+def _parse_plants(plants):
+    """Validates the plant list and expands quantities into instances."""
+    if not isinstance(plants, list) or not plants:
+        raise ValueError("'plants' must be a non-empty list.")
+
+    instances = []
+    names = set()
+    total = 0
+    for index, plant in enumerate(plants):
+        if not isinstance(plant, dict) or not plant.get('name'):
+            raise ValueError(f"plants[{index}] needs a 'name'.")
+
+        quantity = plant.get('quantity', 1)
+        # bool is an int subclass; "quantity": true is not a count
+        if (not isinstance(quantity, int) or isinstance(quantity, bool)
+                or quantity < 1):
+            raise ValueError(
+                f"plants[{index}].quantity must be a positive integer.")
+
+        # Checked before expanding, so a huge quantity costs nothing
+        total += quantity
+        if total > LAYOUT_MAX_PLANTS:
+            raise ValueError(
+                f"At most {LAYOUT_MAX_PLANTS} plants can be laid out at once.")
+
+        name = str(plant['name'])
+        names.add(name)
+        # Each distinct name needs its own one-character map symbol
+        if len(names) > len(_SYMBOLS):
+            raise ValueError(
+                f"At most {len(_SYMBOLS)} different plants can be laid out "
+                "at once.")
+
+        instance = {
+            "name": name,
+            "spacing_in": _number(
+                plant.get('spacing_in', DEFAULT_SPACING_INCHES),
+                f"plants[{index}].spacing_in"),
+            "height_in": _number(
+                plant.get('height_in', DEFAULT_HEIGHT_INCHES),
+                f"plants[{index}].height_in"),
+            "sun": _sun_label(plant.get('sun'), f"plants[{index}].sun"),
+        }
+        instances.extend(dict(instance) for _ in range(quantity))
+
+    return instances
+
+
+def _sun_grid(sun_map, rows, cols):
+    """
+    Returns the sun hours of every cell. `sun_map` is a sun label for the
+    whole bed or a 2D list of hours (north edge first) that is stretched
+    over the grid.
+    """
+    if sun_map is None or isinstance(sun_map, str):
+        hours = SUN_LABEL_HOURS[_sun_label(sun_map, 'sun_map')]
+        return np.full((rows, cols), hours)
+
+    try:
+        source = np.asarray(sun_map, dtype=float)
+    except (TypeError, ValueError):
+        raise ValueError("'sun_map' must be a sun label or a 2D list of "
+                         "sun hours.")
+    if source.ndim != 2 or source.size == 0:
+        raise ValueError("'sun_map' must be a 2D list of sun hours.")
+    if not np.all(np.isfinite(source)) or source.min() < 0:
+        raise ValueError("'sun_map' hours must be non-negative numbers.")
+
+    # Nearest-neighbour resample onto the cell grid
+    row_index = np.arange(rows) * source.shape[0] // rows
+    col_index = np.arange(cols) * source.shape[1] // cols
+    return source[np.ix_(row_index, col_index)]
+
+
+def _window_sums(grid, size):
+    """Sums of every size x size window, via a 2D prefix sum."""
+    prefix = np.pad(grid, ((1, 0), (1, 0))).cumsum(axis=0).cumsum(axis=1)
+    return (prefix[size:, size:] - prefix[:-size, size:]
+            - prefix[size:, :-size] + prefix[:-size, :-size])
+
+
+def _render_map(owner, symbols):
+    rows = []
+    for row in owner:
+        rows.append(''.join(symbols[i] if i >= 0 else '.' for i in row))
+    return rows
+
+
+def compute_layout(bed, plants, sun_map=None):
+    """
+    Lays out plants in a rectangular bed.
+
+    Args:
+        bed: {"width_ft": ..., "length_ft": ...}; rows run along the length
+            from the north edge (row 0), so tall plants go north where they
+            shade nothing
+        plants: [{"name", "quantity", "spacing_in", "height_in", "sun"}]
+            with sun one of 'full', 'partial', 'shade'
+        sun_map: Optional sun label or 2D list of daily sun hours
+
+    Returns a status dict. On success 'layout' holds the placements
+    (positions in inches from the north-west corner), plants that did not
+    fit, bed utilization and a text map of the grid.
+    """
+    started = time.perf_counter()
+    try:
+        if not isinstance(bed, dict):
+            raise ValueError("'bed' must be an object with width_ft and "
+                             "length_ft.")
+        width_in = _number(bed.get('width_ft'), 'bed.width_ft') * 12
+        length_in = _number(bed.get('length_ft'), 'bed.length_ft') * 12
+
+        cell = LAYOUT_CELL_INCHES
+        rows = max(1, int(length_in // cell))
+        cols = max(1, int(width_in // cell))
+        if rows * cols > LAYOUT_MAX_CELLS:
+            raise ValueError(
+                f"The bed is too large for a {cell:g}-inch grid "
+                f"({rows * cols} cells, limit {LAYOUT_MAX_CELLS}).")
+
+        instances = _parse_plants(plants)
+        sun = _sun_grid(sun_map, rows, cols)
+    except ValueError as e:
+        return {"status": "error", "message": str(e),
+                "code": "invalid_layout_input"}
+
+    names = list(dict.fromkeys(p["name"] for p in instances))
+    symbols = dict(zip(names, _SYMBOLS))
+    tallest = max(p["height_in"] for p in instances)
+
+    # Tallest first (they claim the north rows), then widest first so
+    # large footprints are not squeezed out by small ones
+    order = sorted(range(len(instances)), key=lambda i: (
+        -instances[i]["height_in"], -instances[i]["spacing_in"]))
+
+    occupied = np.zeros((rows, cols))
+    owner = np.full((rows, cols), -1)
+    placements = []
+    unplaced = []
+
+    for index in order:
+        plant = instances[index]
+        size = max(1, math.ceil(plant["spacing_in"] / cell))
+        if size > rows or size > cols:
+            unplaced.append({"name": plant["name"],
+                             "reason": "wider than the bed"})
+            continue
+
+        free = _window_sums(occupied, size) == 0
+        if not free.any():
+            unplaced.append({"name": plant["name"],
+                             "reason": "no free space left"})
+            continue
+
+        # Rounded so float noise in the prefix sums can't miss a threshold
+        mean_sun = np.round(_window_sums(sun, size) / (size * size), 6)
+        low, high = SUN_REQUIREMENTS[plant["sun"]]
+        sun_penalty = (np.maximum(low - mean_sun, 0)
+                       + np.maximum(mean_sun - high, 0))
+
+        # Row fraction 0 is the north edge; taller plants aim further north
+        candidate_rows, candidate_cols = free.shape
+        row_fraction = (np.arange(candidate_rows)
+                        / max(1, candidate_rows - 1))[:, None]
+        col_fraction = (np.arange(candidate_cols)
+                        / max(1, candidate_cols - 1))[None, :]
+        target_row = 1 - plant["height_in"] / tallest
+
+        score = (SUN_WEIGHT * sun_penalty
+                 + HEIGHT_WEIGHT * np.abs(row_fraction - target_row)
+                 + PACKING_WEIGHT * (row_fraction + col_fraction))
+        score[~free] = np.inf
+
+        row, col = (int(i) for i in
+                    np.unravel_index(np.argmin(score), score.shape))
+        occupied[row:row + size, col:col + size] = 1
+        owner[row:row + size, col:col + size] = names.index(plant["name"])
+
+        placements.append({
+            "name": plant["name"],
+            "x_in": round(col * cell, 1),
+            "y_in": round(row * cell, 1),
+            "size_in": round(size * cell, 1),
+            "height_in": plant["height_in"],
+            "sun": plant["sun"],
+            "sun_hours": round(float(mean_sun[row, col]), 1),
+            "sun_ok": bool(sun_penalty[row, col] == 0),
+        })
+
+    placements.sort(key=lambda p: (p["y_in"], p["x_in"]))
+    return {"status": "success", "layout": {
+        "bed": {"width_in": width_in, "length_in": length_in,
+                "rows": rows, "cols": cols, "cell_in": cell},
+        "placements": placements,
+        "unplaced": unplaced,
+        "utilization": round(float(occupied.mean()), 3),
+        "legend": {symbols[name]: name for name in names},
+        "map": _render_map(owner, [symbols[name] for name in names]),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }}
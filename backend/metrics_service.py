@@ -0,0 +1,117 @@
+import threading
+
+# --- In-process metrics shared by the service layer ---
+
+# Upper bounds of the histogram buckets; values above the last bound fall
+# into an open-ended overflow bucket
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+ROW_COUNT_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000)
+SIZE_BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram with count, sum and max.
+
+    Not locked on its own; OperationMetrics guards every histogram it owns.
+    Percentiles are estimated as the upper bound of the bucket holding the
+    requested rank (or the observed max for the overflow bucket).
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, fraction):
+        if self.count == 0:
+            return 0
+        rank = fraction * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                if i < len(self.buckets):
+                    return min(self.buckets[i], self.max)
+                return self.max
+        return self.max
+
+    def snapshot(self):
+        labels = [f"le_{bound}" for bound in self.buckets] + ["overflow"]
+        return {
+            "count": self.count,
+            "sum": round(self.total, 2),
+            "avg": round(self.total / self.count, 2) if self.count else 0,
+            "max": round(self.max, 2),
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class _OperationStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.rows = Histogram(ROW_COUNT_BUCKETS)
+        self.size_bytes = Histogram(SIZE_BUCKETS_BYTES)
+
+
+class OperationMetrics:
+    """
+    Thread-safe per-operation call counters with latency, row count and
+    response size histograms (e.g. one entry per 'table.verb').
+    """
+
+    def __init__(self, name='operations'):
+        self.name = name
+        self._operations = {}
+        self._lock = threading.Lock()
+
+    def record(self, operation, duration_ms, rows=0, size_bytes=0,
+               error=False):
+        """Adds one call of `operation` to its histograms."""
+        with self._lock:
+            stats = self._operations.get(operation)
+            if stats is None:
+                stats = self._operations[operation] = _OperationStats()
+            stats.calls += 1
+            if error:
+                stats.errors += 1
+            stats.latency_ms.observe(duration_ms)
+            stats.rows.observe(rows)
+            stats.size_bytes.observe(size_bytes)
+
+    def snapshot(self):
+        """Returns per-operation calls, errors and histogram snapshots."""
+        with self._lock:
+            return {
+                operation: {
+                    "calls": stats.calls,
+                    "errors": stats.errors,
+                    "latency_ms": stats.latency_ms.snapshot(),
+                    "rows": stats.rows.snapshot(),
+                    "size_bytes": stats.size_bytes.snapshot(),
+                }
+                for operation, stats in sorted(self._operations.items())
+            }
+
+    def reset(self):
+        """Drops all recorded operations."""
+        with self._lock:
+            self._operations.clear()
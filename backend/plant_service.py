@@ -1,26 +1,25 @@
 import requests
+import http_client
 import os
-# import time
-from dotenv import load_dotenv
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+import settings
+from bulkhead_service import UpstreamUnavailable
+from cache_service import SingleFlight, SQLiteTTLStore, TTLCache
+from circuit_breaker import CircuitBreaker, CircuitOpen
 
 # --- CONFIGURATION & ENVIRONMENT VARIABLE CHECK ---
 
 # Get the directory where this script is located
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-DOTENV_PATH = os.path.join(SCRIPT_DIR, '.env')
-
-# Explicitly check for the presence of the .env file for diagnostic purposes
-if not os.path.exists(DOTENV_PATH):
-    print("-" * 70)
-    print("WARNING: .env file not found in the backend directory.")
-    print(f"Expected path: {DOTENV_PATH}")
-    print("Ensure .env file exists in the 'backend/' directory.")
-    print("-" * 70)
 
-# Load environment variables from the .env file in the same directory as this script
-load_dotenv(DOTENV_PATH)
+# Reads backend/.env once per process
+settings.load_environment()
 
-# Define and validate required configuration variables
+# Define the required configuration variables. They are validated when a
+# RapidAPI search runs, so importing this module never fails.
 RAPIDAPI_KEY = os.getenv("RAPID_API_KEY")
 # e.g., "house-plants2.p.rapidapi.com"
 RAPIDAPI_HOST = os.getenv("RAPID_API_HOST")
@@ -31,39 +30,140 @@ RAPIDAPI_BASE_URL = os.getenv("RAPIDAPI_BASE_URL")
 PLANT_API_KEY = os.getenv("PLANT_API_KEY")
 PERENUAL_BASE_URL = "https://perenual.com/api"
 
-# CRITICAL CHECK: Ensure all required variables are present
-if not RAPIDAPI_KEY or not RAPIDAPI_HOST or not RAPIDAPI_BASE_URL:
-    missing_vars = []
-    if not RAPIDAPI_KEY:
-        missing_vars.append("RAPID_API_KEY")
-    if not RAPIDAPI_HOST:
-        missing_vars.append("RAPID_API_HOST")
-    if not RAPIDAPI_BASE_URL:
-        missing_vars.append("RAPIDAPI_BASE_URL")
-
-    # Raise a runtime error to stop the application and clearly state the error
-    raise ValueError(
-        f"Missing RapidAPI environment variables: {', '.join(missing_vars)}. "
-        "Check backend/.env file for typos or ensure the file is present."
-    )
-
 if not PLANT_API_KEY:
     print("-" * 70)
     print("WARNING: PLANT_API_KEY not found in environment variables.")
     print("Other plant searches will not work.")
     print("-" * 70)
 
-# --- CACHING SETUP (Disabled for direct testing) ---
-PLANT_CACHE = {}
+# --- CACHING SETUP ---
+# Normalized plant records keyed by (normalized name, plant type)
 CACHE_DURATION_SECONDS = 60 * 60 * 24 * 7
+PLANT_CACHE_MAX_ENTRIES = int(os.getenv("PLANT_CACHE_MAX_ENTRIES", "1000"))
+# Rough memory cap for the cached plant records (JSON size in bytes)
+PLANT_CACHE_MAX_BYTES = int(
+    os.getenv("PLANT_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+# How long expired records are kept for when their provider is down
+PLANT_CACHE_STALE_SECONDS = int(
+    os.getenv("PLANT_CACHE_STALE_SECONDS", str(60 * 60 * 24 * 30)))
+
+PLANT_CACHE = TTLCache(
+    max_entries=PLANT_CACHE_MAX_ENTRIES,
+    ttl_seconds=CACHE_DURATION_SECONDS,
+    max_bytes=PLANT_CACHE_MAX_BYTES,
+    name='plant_details',
+    stale_seconds=PLANT_CACHE_STALE_SECONDS
+)
+
+
+# Perenual name -> species ID index. IDs are stable, so the mapping lives in
+# a local SQLite file with a longer TTL than the cached details payload.
+PERENUAL_SPECIES_ID_TTL_SECONDS = int(
+    os.getenv("PERENUAL_SPECIES_ID_TTL_SECONDS", str(60 * 60 * 24 * 90)))
+PERENUAL_INDEX_PATH = os.getenv(
+    "PERENUAL_INDEX_PATH",
+    os.path.join(SCRIPT_DIR, '.cache', 'perenual_species.sqlite3')
+)
+PERENUAL_SPECIES_INDEX = SQLiteTTLStore(
+    PERENUAL_INDEX_PATH,
+    table='perenual_species_ids',
+    ttl_seconds=PERENUAL_SPECIES_ID_TTL_SECONDS
+)
+
+# Concurrent identical searches share one upstream call. Waiters give up a
+# little after the longest provider path (two 10s Perenual calls).
+PLANT_FETCH_WAIT_TIMEOUT_SECONDS = 25
+PLANT_FETCHES = SingleFlight(
+    wait_timeout_seconds=PLANT_FETCH_WAIT_TIMEOUT_SECONDS,
+    name='plant_fetches'
+)
+
+
+# --- PROVIDER FAN-OUT (type=any) ---
+# Which provider serves each plant type; reported back to the client
+PLANT_PROVIDERS = {
+    'indoor': 'rapidapi',
+    'other': 'perenual',
+}
+
+# --- PROVIDER CIRCUIT BREAKERS ---
+# A provider that keeps failing (network errors, 5xx/429/401/403, an HTML
+# error page instead of JSON) is skipped for a while. Searches for it are
+# then answered from expired cache entries, marked "stale": true, or fail
+# fast with 503 when nothing is cached.
+PLANT_CIRCUIT_FAILURE_THRESHOLD = int(
+    os.getenv("PLANT_CIRCUIT_FAILURE_THRESHOLD", "3"))
+PLANT_CIRCUIT_RESET_SECONDS = int(
+    os.getenv("PLANT_CIRCUIT_RESET_SECONDS", "60"))
+PLANT_CIRCUITS = {
+    provider: CircuitBreaker(
+        provider,
+        failure_threshold=PLANT_CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout_seconds=PLANT_CIRCUIT_RESET_SECONDS
+    )
+    for provider in PLANT_PROVIDERS.values()
+}
+# HTTP statuses that mean the provider (or our key) is broken, as opposed
+# to a plain miss
+_PROVIDER_FAILURE_STATUSES = (401, 403, 429)
+# Shared deadline for both providers when searching with type=any. Provider
+# calls run under it (see http_client.deadline), so a search abandoned at
+# the deadline frees its worker soon after instead of holding it for a full
+# HTTP timeout.
+PLANT_ANY_DEADLINE_SECONDS = float(
+    os.getenv("PLANT_ANY_DEADLINE_SECONDS", "12"))
+PLANT_FANOUT_POOL = ThreadPoolExecutor(
+    max_workers=int(os.getenv("PLANT_FANOUT_WORKERS", "8")),
+    thread_name_prefix='plant-fanout'
+)
+
+# Placeholder values a merged record may fill in from the other provider
+_PLACEHOLDER_VALUES = (
+    None, '', 'N/A', 'Unknown', '/default_image.jpg',
+    'No detailed description available.',
+)
+
+
+class PlantProviderError(Exception):
+    """A provider answered with something other than its JSON API."""
+
+
+def _record_http_error(provider, error):
+    """Counts an HTTP error against the provider's circuit if it is one."""
+    status = error.response.status_code
+    if status >= 500 or status in _PROVIDER_FAILURE_STATUSES:
+        PLANT_CIRCUITS[provider].record_failure(f"HTTP {status}")
+
+
+def normalize_plant_name(plant_name):
+    """Lower-cases and collapses whitespace so cache keys are stable."""
+    return ' '.join((plant_name or '').lower().split())
+
+
+def missing_rapidapi_config():
+    """Returns the names of the RapidAPI variables that are not set."""
+    required = (
+        ("RAPID_API_KEY", RAPIDAPI_KEY),
+        ("RAPID_API_HOST", RAPIDAPI_HOST),
+        ("RAPIDAPI_BASE_URL", RAPIDAPI_BASE_URL),
+    )
+    return [name for name, value in required if not value]
 
 
 def fetch_and_cache_plant_details(plant_name):
     """
     Handles API call to RapidAPI, error handling, and data normalization.
+    Caching happens one level up in fetch_plant_by_type.
     """
 
-    # 1. We skip cache logic for now
+    missing_vars = missing_rapidapi_config()
+    if missing_vars:
+        print(
+            f"ERROR: Missing RapidAPI environment variables: "
+            f"{', '.join(missing_vars)}. "
+            "Check backend/.env file for typos or ensure the file is present."
+        )
+        return None
 
     print(f"Calling RapidAPI directly for plant: {plant_name}...")
 
@@ -77,7 +177,7 @@ def fetch_and_cache_plant_details(plant_name):
 
     # --- API CALL EXECUTION ---
     try:
-        response = requests.get(
+        response = http_client.get(
             RAPIDAPI_BASE_URL,
             headers=headers,
             params=querystring,
@@ -86,7 +186,11 @@ def fetch_and_cache_plant_details(plant_name):
 
         response.raise_for_status()
 
-        rapidapi_data = response.json()
+        try:
+            rapidapi_data = response.json()
+        except ValueError:
+            raise PlantProviderError("RapidAPI returned a non-JSON response")
+        PLANT_CIRCUITS['rapidapi'].record_success()
 
         # --- DATA NORMALIZATION / TRANSFORMATION ---
 
@@ -152,85 +256,144 @@ def fetch_and_cache_plant_details(plant_name):
             f"HTTP ERROR from RapidAPI: Status {e.response.status_code}. "
             f"Details: {e.response.text}"
         )
+        _record_http_error('rapidapi', e)
+        return None
+
+    except PlantProviderError as e:
+        print(f"ERROR: {e}")
+        PLANT_CIRCUITS['rapidapi'].record_failure(str(e))
         return None
 
     except requests.exceptions.RequestException as e:
         # Catches network errors
         print(f"NETWORK ERROR connecting to RapidAPI: {e}")
+        PLANT_CIRCUITS['rapidapi'].record_failure(type(e).__name__)
         return None
 
+    except UpstreamUnavailable:
+        # Too many RapidAPI calls in flight; the route answers 503
+        raise
+
     except Exception as e:
         # Catches JSONDecodeError or other unexpected internal errors
         print(f"INTERNAL ERROR during data processing: {e}")
         return None
 
 
-def fetch_perenual_plant_details(plant_name):
+def _search_perenual_species_id(plant_name):
     """
-    Handles API call to Perenual API for outdoor/other plants.
+    Looks up the Perenual species ID for a plant name via species-list.
+    Returns the ID of the first match, or None. Raises PlantProviderError
+    if Perenual answers with an HTML page.
     """
-    print(f"Calling Perenual API for plant: {plant_name}...")
+    # Search for plants by name (API v2)
+    search_url = f"{PERENUAL_BASE_URL}/v2/species-list"
+    params = {
+        "key": PLANT_API_KEY,
+        "q": plant_name
+    }
 
-    try:
-        # Search for plants by name (API v2)
-        search_url = f"{PERENUAL_BASE_URL}/v2/species-list"
-        params = {
-            "key": PLANT_API_KEY,
-            "q": plant_name
-        }
+    response = http_client.get(
+        search_url,
+        params=params,
+        timeout=10
+    )
 
-        response = requests.get(
-            search_url,
-            params=params,
-            timeout=10
-        )
+    response.raise_for_status()
 
-        response.raise_for_status()
+    # Check if response is HTML instead of JSON (indicates API error)
+    content_type = response.headers.get('Content-Type', '')
+    if 'text/html' in content_type or response.text.strip().startswith('<!DOCTYPE'):
+        print(f"ERROR: Perenual API returned HTML instead of JSON. This usually indicates:")
+        print(f"  - Invalid API key")
+        print(f"  - API endpoint changed")
+        print(f"  - Rate limit exceeded")
+        print(f"  Response preview: {response.text[:200]}")
+        raise PlantProviderError("Perenual returned HTML instead of JSON")
 
-        # Check if response is HTML instead of JSON (indicates API error)
-        content_type = response.headers.get('Content-Type', '')
-        if 'text/html' in content_type or response.text.strip().startswith('<!DOCTYPE'):
-            print(f"ERROR: Perenual API returned HTML instead of JSON. This usually indicates:")
-            print(f"  - Invalid API key")
-            print(f"  - API endpoint changed")
-            print(f"  - Rate limit exceeded")
-            print(f"  Response preview: {response.text[:200]}")
-            return None
+    perenual_data = response.json()
+    PLANT_CIRCUITS['perenual'].record_success()
 
-        perenual_data = response.json()
+    # Get the first result from the search
+    if not perenual_data.get('data') or len(perenual_data['data']) == 0:
+        print(f"ERROR: No plant results found for {plant_name} in Perenual")
+        return None
 
-        # Get the first result from the search
-        if not perenual_data.get('data') or len(perenual_data['data']) == 0:
-            print(f"ERROR: No plant results found for {plant_name} in Perenual")
-            return None
+    # Get the first plant
+    first_plant = perenual_data['data'][0]
+    plant_id = first_plant.get('id')
 
-        # Get the first plant
-        first_plant = perenual_data['data'][0]
-        plant_id = first_plant.get('id')
+    if not plant_id:
+        print(f"ERROR: No plant ID found in Perenual response")
+        return None
 
-        if not plant_id:
-            print(f"ERROR: No plant ID found in Perenual response")
-            return None
+    return plant_id
 
-        # Fetch full plant details (API v2)
-        details_url = f"{PERENUAL_BASE_URL}/v2/species/details/{plant_id}"
-        details_params = {"key": PLANT_API_KEY}
 
-        details_response = requests.get(
-            details_url,
-            params=details_params,
-            timeout=10
-        )
+def _fetch_perenual_species_details(plant_id):
+    """
+    Fetches the raw species details payload for a Perenual species ID.
+    Returns None if the species is unknown; raises PlantProviderError if
+    the API returned HTML.
+    """
+    # Fetch full plant details (API v2)
+    details_url = f"{PERENUAL_BASE_URL}/v2/species/details/{plant_id}"
+    details_params = {"key": PLANT_API_KEY}
+
+    details_response = http_client.get(
+        details_url,
+        params=details_params,
+        timeout=10
+    )
 
-        details_response.raise_for_status()
+    # A stale species ID from the index is not an error, just a miss
+    if details_response.status_code == 404:
+        print(f"Perenual species {plant_id} no longer exists")
+        return None
 
-        # Check if response is HTML instead of JSON
-        content_type = details_response.headers.get('Content-Type', '')
-        if 'text/html' in content_type or details_response.text.strip().startswith('<!DOCTYPE'):
-            print(f"ERROR: Perenual API details endpoint returned HTML instead of JSON")
-            return None
+    details_response.raise_for_status()
+
+    # Check if response is HTML instead of JSON
+    content_type = details_response.headers.get('Content-Type', '')
+    if 'text/html' in content_type or details_response.text.strip().startswith('<!DOCTYPE'):
+        print(f"ERROR: Perenual API details endpoint returned HTML instead of JSON")
+        raise PlantProviderError("Perenual details returned HTML instead of JSON")
+
+    details = details_response.json()
+    PLANT_CIRCUITS['perenual'].record_success()
+    return details
 
-        plant_details = details_response.json()
+
+def fetch_perenual_plant_details(plant_name):
+    """
+    Handles API call to Perenual API for outdoor/other plants.
+    Names searched before resolve their species ID from the local index,
+    so repeat searches only need the details call.
+    """
+    print(f"Calling Perenual API for plant: {plant_name}...")
+
+    index_key = normalize_plant_name(plant_name)
+
+    try:
+        plant_details = None
+        plant_id = PERENUAL_SPECIES_INDEX.get(index_key)
+
+        if plant_id:
+            plant_details = _fetch_perenual_species_details(plant_id)
+            if plant_details is None:
+                # The stored mapping went bad; fall back to a fresh search
+                PERENUAL_SPECIES_INDEX.delete(index_key)
+
+        if plant_details is None:
+            plant_id = _search_perenual_species_id(plant_name)
+            if not plant_id:
+                return None
+
+            plant_details = _fetch_perenual_species_details(plant_id)
+            if plant_details is None:
+                return None
+
+            PERENUAL_SPECIES_INDEX.set(index_key, plant_id)
 
         # Extract and normalize the data
         common_name = plant_details.get('common_name') or plant_name.capitalize()
@@ -293,12 +456,21 @@ def fetch_perenual_plant_details(plant_name):
             f"HTTP ERROR from Perenual API: Status {e.response.status_code}. "
             f"Details: {e.response.text}"
         )
+        _record_http_error('perenual', e)
+        return None
+
+    except PlantProviderError as e:
+        PLANT_CIRCUITS['perenual'].record_failure(str(e))
         return None
 
     except requests.exceptions.RequestException as e:
         print(f"NETWORK ERROR connecting to Perenual API: {e}")
+        PLANT_CIRCUITS['perenual'].record_failure(type(e).__name__)
         return None
 
+    except UpstreamUnavailable:
+        raise
+
     except Exception as e:
         print(f"INTERNAL ERROR during Perenual data processing: {e}")
         return None
@@ -314,9 +486,181 @@ def fetch_plant_by_type(plant_name, plant_type='indoor'):
         plant_type: Either 'indoor' or 'other' to determine which API to use
 
     Returns:
-        Normalized plant data dictionary or None
+        Normalized plant data dictionary or None. While the provider's
+        circuit is open an expired cached record is returned with
+        "stale": true; without one CircuitOpen is raised.
     """
-    if plant_type == 'indoor':
-        return fetch_and_cache_plant_details(plant_name)
-    else:
-        return fetch_perenual_plant_details(plant_name)
+    cache_key = (normalize_plant_name(plant_name), plant_type)
+
+    cached = PLANT_CACHE.get(cache_key)
+    if cached is not None:
+        print(f"Plant cache hit for: {plant_name} ({plant_type})")
+        return cached
+
+    provider = PLANT_PROVIDERS.get(plant_type, 'perenual')
+    circuit = PLANT_CIRCUITS[provider]
+    try:
+        trial = circuit.check()
+    except CircuitOpen:
+        stale = PLANT_CACHE.get_stale(cache_key)
+        if stale is None:
+            raise
+        print(f"Serving stale plant record for: {plant_name} "
+              f"({provider} circuit open)")
+        return dict(stale, stale=True)
+
+    def fetch_and_store():
+        # Another flight may have filled the cache since our check above
+        cached = PLANT_CACHE.get(cache_key)
+        if cached is not None:
+            return cached
+
+        if plant_type == 'indoor':
+            result = fetch_and_cache_plant_details(plant_name)
+        else:
+            result = fetch_perenual_plant_details(plant_name)
+
+        # Only successful lookups are cached so failures are retried
+        if result:
+            PLANT_CACHE.set(cache_key, result)
+
+        return result
+
+    # Identical concurrent searches wait for a single upstream call
+    try:
+        return PLANT_FETCHES.do(cache_key, fetch_and_store)
+    finally:
+        if trial:
+            # The fetch may end without a verdict (cache fill, bulkhead,
+            # plain miss); don't keep every other search waiting on it
+            circuit.release_trial()
+
+
+def _fetch_plant_until(deadline_at, plant_name, plant_type):
+    """Runs fetch_plant_by_type with its HTTP calls bounded by `deadline_at`."""
+    with http_client.deadline(deadline_at):
+        return fetch_plant_by_type(plant_name, plant_type)
+
+
+def _merge_plant_records(primary, secondary):
+    """
+    Returns a copy of `primary` with placeholder fields (including care
+    instructions) filled in from `secondary`.
+    """
+    merged = dict(primary)
+    for key, value in secondary.items():
+        if key == 'care_instructions':
+            continue
+        if merged.get(key) in _PLACEHOLDER_VALUES:
+            merged[key] = value
+
+    care = dict(primary.get('care_instructions') or {})
+    for key, value in (secondary.get('care_instructions') or {}).items():
+        if care.get(key) in _PLACEHOLDER_VALUES:
+            care[key] = value
+    merged['care_instructions'] = care
+
+    return merged
+
+
+def fetch_plant_any_type(plant_name, prefer=None,
+                         deadline_seconds=PLANT_ANY_DEADLINE_SECONDS):
+    """
+    Searches RapidAPI and Perenual in parallel under one shared deadline.
+
+    The first good result wins, unless `prefer` names a plant type, in which
+    case that provider is waited for (within the deadline) before falling
+    back to the other. If both providers have answered by then, the records
+    are merged. The returned record carries `plant_type` and `provider` so
+    the caller knows who answered.
+
+    Provider calls still queued when the search returns are cancelled, and
+    HTTP timeouts are cut to the time left before the deadline.
+
+    Returns:
+        Normalized plant data dictionary or None. Raises the first
+        UpstreamUnavailable (full bulkhead, open circuit) if no provider
+        answered and at least one was skipped that way.
+    """
+    order = ['indoor', 'other']
+    if prefer == 'other':
+        order.reverse()
+
+    deadline_at = time.monotonic() + deadline_seconds
+    futures = {
+        PLANT_FANOUT_POOL.submit(_fetch_plant_until, deadline_at, plant_name,
+                                 plant_type):
+        plant_type
+        for plant_type in order
+    }
+    results = {}
+    rejected = []
+
+    try:
+        for future in as_completed(futures, timeout=deadline_seconds):
+            plant_type = futures[future]
+            try:
+                results[plant_type] = future.result()
+            except UpstreamUnavailable as e:
+                rejected.append(e)
+                results[plant_type] = None
+            except Exception as e:
+                print(f"Plant fan-out error ({plant_type}): {e}")
+                results[plant_type] = None
+
+            if prefer and order[0] not in results:
+                # Keep waiting for the preferred provider
+                continue
+            if any(results.values()):
+                break
+    except FuturesTimeoutError:
+        print(
+            f"Plant fan-out for '{plant_name}' hit the "
+            f"{deadline_seconds}s deadline; "
+            f"answered: {sorted(results) or 'none'}"
+        )
+
+    # Pick up a provider that finished while we were deciding
+    for future, plant_type in futures.items():
+        if plant_type not in results and future.done():
+            try:
+                results[plant_type] = future.result()
+            except UpstreamUnavailable as e:
+                rejected.append(e)
+                results[plant_type] = None
+            except Exception:
+                results[plant_type] = None
+
+    # Nobody waits for the rest; a call still queued behind a busy pool
+    # must not take a worker later
+    for future in futures:
+        future.cancel()
+
+    answered = [t for t in order if results.get(t)]
+    if not answered:
+        if rejected:
+            raise rejected[0]
+        return None
+
+    primary_type = answered[0]
+    record = dict(results[primary_type])
+    providers = [PLANT_PROVIDERS[primary_type]]
+
+    if len(answered) > 1:
+        secondary_type = answered[1]
+        record = _merge_plant_records(record, results[secondary_type])
+        providers.append(PLANT_PROVIDERS[secondary_type])
+
+    record['plant_type'] = primary_type
+    record['provider'] = '+'.join(providers)
+    return record
+
+
+def get_plant_lookup_stats():
+    """Returns cache, circuit and request-coalescing counters for plant lookups."""
+    return {
+        "cache": PLANT_CACHE.stats(),
+        "circuits": {name: circuit.stats()
+                     for name, circuit in PLANT_CIRCUITS.items()},
+        "single_flight": PLANT_FETCHES.stats(),
+    }
@@ -0,0 +1,76 @@
+import os
+import threading
+
+from dotenv import load_dotenv
+
+# --- Process-wide configuration ---
+# backend/.env is read once per process, before any service module reads its
+# settings with os.getenv. Service modules call load_environment() at import
+# so they also work standalone (scripts, tests); repeat calls are no-ops.
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DOTENV_PATH = os.path.join(BACKEND_DIR, '.env')
+
+# Blueprints create_app() can register: name -> (module, attribute).
+# Modules are only imported for the names enabled in the config.
+BLUEPRINTS = {
+    'auth': ('api.auth', 'auth_bp'),
+    'collections': ('api.collections', 'collections_bp'),
+    'plants': ('api.plants', 'plants_bp'),
+    'ai': ('api.ai_planner', 'ai_bp'),
+    'forum': ('api.forum', 'forum_bp'),
+    'profile': ('api.profile', 'profile_bp'),
+    'metrics': ('api.metrics', 'metrics_bp'),
+}
+
+_environment_loaded = False
+_environment_lock = threading.Lock()
+
+
+def load_environment():
+    """Loads backend/.env into os.environ the first time it is called."""
+    global _environment_loaded
+    if _environment_loaded:
+        return
+
+    with _environment_lock:
+        if _environment_loaded:
+            return
+
+        # Explicitly check for the .env file for diagnostic purposes
+        if not os.path.exists(DOTENV_PATH):
+            print("-" * 70)
+            print("WARNING: .env file not found in the backend directory.")
+            print(f"Expected path: {DOTENV_PATH}")
+            print("Ensure .env file exists in the 'backend/' directory.")
+            print("-" * 70)
+
+        # Variables already set in the environment take precedence
+        load_dotenv(DOTENV_PATH)
+        _environment_loaded = True
+
+
+def _split_list(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def load_config(overrides=None):
+    """
+    Returns the Flask app settings read from the environment.
+
+    Args:
+        overrides: Optional dict replacing individual settings, e.g.
+            {"BLUEPRINTS": ["forum"]} for an app with only the forum routes
+    """
+    load_environment()
+
+    config = {
+        "API_PREFIX": os.getenv("API_PREFIX", "/api/v1"),
+        "CORS_ORIGINS": _split_list(
+            os.getenv("CORS_ORIGINS", "http://localhost:3000")),
+        # Comma-separated names from BLUEPRINTS; defaults to all of them
+        "BLUEPRINTS": _split_list(
+            os.getenv("ENABLED_BLUEPRINTS", ','.join(BLUEPRINTS))),
+    }
+    config.update(overrides or {})
+    return config
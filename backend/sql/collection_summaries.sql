@@ -0,0 +1,29 @@
+-- Lightweight per-collection summary for the collection picker.
+-- Returns one row per collection owned by the user with its plant count
+-- and the time it last changed, without any plant bodies.
+--
+-- Called from db_service.get_collection_summaries via
+--   supabase.rpc('collection_summaries', {'p_user_id': ...})
+
+create or replace function public.collection_summaries(p_user_id uuid)
+returns table (
+    id integer,
+    collection_name text,
+    plant_count bigint,
+    last_modified timestamptz
+)
+language sql
+stable
+as $$
+    select
+        c.id,
+        c.collection_name,
+        count(p.id) as plant_count,
+        -- greatest() ignores NULLs, so empty collections use created_at
+        greatest(c.created_at, max(p.added_at)) as last_modified
+    from public.collections c
+    left join public.collection_plants p on p.collection_id = c.id
+    where c.user_id = p_user_id
+    group by c.id, c.collection_name, c.created_at
+    order by c.collection_name;
+$$;
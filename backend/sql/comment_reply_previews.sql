@@ -0,0 +1,42 @@
+-- Reply previews for one level of a forum comment tree.
+-- Returns one row per parent that has replies: its direct reply count and
+-- its first p_preview replies (oldest first) as JSON, so a busy thread
+-- never sends more than p_preview replies per comment.
+--
+-- Called from db_service.get_comment_tree via
+--   supabase.rpc('comment_reply_previews',
+--                {'p_parent_ids': [...], 'p_preview': ...})
+
+create index if not exists forum_comments_parent_created_at_id_idx
+    on public.forum_comments (parent_comment_id, created_at, id);
+
+create or replace function public.comment_reply_previews(
+    p_parent_ids bigint[],
+    p_preview integer
+)
+returns table (
+    parent_comment_id bigint,
+    reply_count bigint,
+    replies jsonb
+)
+language sql
+stable
+as $$
+    select
+        r.parent_comment_id,
+        count(*) as reply_count,
+        coalesce(
+            jsonb_agg(to_jsonb(r) - 'reply_rank'
+                      order by r.created_at, r.id)
+                filter (where r.reply_rank <= p_preview),
+            '[]'::jsonb) as replies
+    from (
+        select
+            c.*,
+            row_number() over (partition by c.parent_comment_id
+                               order by c.created_at, c.id) as reply_rank
+        from public.forum_comments c
+        where c.parent_comment_id = any(p_parent_ids)
+    ) r
+    group by r.parent_comment_id;
+$$;
@@ -0,0 +1,7 @@
+-- Composite index backing the keyset-paginated forum feed.
+-- get_recent_forum_posts orders by (created_at desc, id desc) and pages with
+--   created_at < :ts or (created_at = :ts and id < :id)
+-- so each page is an index range scan instead of an offset scan.
+
+create index if not exists forum_posts_created_at_id_idx
+    on public.forum_posts (created_at desc, id desc);
@@ -0,0 +1,41 @@
+-- Saves a plant into a user's collection in a single round trip.
+-- Finds the parent collection by (user_id, collection_name), creates it if
+-- it does not exist yet, then inserts the plant and returns the new row.
+--
+-- Called from db_service.save_plant_to_collection via
+--   supabase.rpc('save_plant_to_collection', {...})
+-- Relies on the unique (user_id, collection_name) constraint on collections.
+
+create or replace function public.save_plant_to_collection(
+    p_user_id uuid,
+    p_collection_name text,
+    p_common_name text,
+    p_plant_details jsonb
+)
+returns setof public.collection_plants
+language plpgsql
+as $$
+declare
+    v_collection_id integer;
+begin
+    select id into v_collection_id
+    from public.collections
+    where user_id = p_user_id and collection_name = p_collection_name
+    limit 1;
+
+    if v_collection_id is null then
+        insert into public.collections (user_id, collection_name, status)
+        values (p_user_id, p_collection_name, 'Active')
+        -- A concurrent save may have created it first
+        on conflict (user_id, collection_name)
+            do update set collection_name = excluded.collection_name
+        returning id into v_collection_id;
+    end if;
+
+    return query
+        insert into public.collection_plants
+            (collection_id, common_name, plant_details_json)
+        values (v_collection_id, p_common_name, p_plant_details)
+        returning *;
+end;
+$$;
@@ -0,0 +1,682 @@
+import itertools
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import nullcontext
+from datetime import datetime, timezone
+
+# --- Embedded SQLite storage backend ---
+# SQLiteClient implements the part of the supabase-py client interface that
+# db_service relies on:
+#   client.table(name).select/insert/update/delete(...)
+#         .eq/.in_/.or_(...).order(...).limit(...).execute()
+#   client.rpc(name, params).execute()
+# on top of a local SQLite database with the same schema as the Supabase
+# project, so the service layer can run without a live project (local load
+# tests, fast dev mode). Responses carry `.data` (and `.count`) like
+# postgrest's APIResponse, and failures raise SQLiteAPIError with the
+# Postgres error code the Supabase backend would report.
+
+SCHEMA = """
+create table if not exists profiles (
+    id text primary key,
+    email text,
+    created_at text not null
+);
+
+create table if not exists collections (
+    id integer primary key autoincrement,
+    user_id text not null,
+    collection_name text not null,
+    status text,
+    created_at text not null,
+    unique (user_id, collection_name)
+);
+
+create table if not exists collection_plants (
+    id integer primary key autoincrement,
+    collection_id integer not null
+        references collections (id) on delete cascade,
+    common_name text,
+    plant_details_json text,
+    added_at text not null
+);
+create index if not exists collection_plants_collection_id_idx
+    on collection_plants (collection_id);
+
+create table if not exists forum_posts (
+    id integer primary key autoincrement,
+    user_id text,
+    title text,
+    content text,
+    created_at text not null
+);
+create index if not exists forum_posts_created_at_id_idx
+    on forum_posts (created_at desc, id desc);
+
+create table if not exists forum_comments (
+    id integer primary key autoincrement,
+    post_id integer not null references forum_posts (id) on delete cascade,
+    user_id text,
+    content text,
+    parent_comment_id integer
+        references forum_comments (id) on delete cascade,
+    created_at text not null
+);
+create index if not exists forum_comments_post_id_idx
+    on forum_comments (post_id, created_at, id);
+create index if not exists forum_comments_parent_created_at_id_idx
+    on forum_comments (parent_comment_id, created_at, id);
+"""
+
+# Column stamped with the current time on insert, per table
+CREATED_AT_COLUMNS = {
+    'profiles': 'created_at',
+    'collections': 'created_at',
+    'collection_plants': 'added_at',
+    'forum_posts': 'created_at',
+    'forum_comments': 'created_at',
+}
+
+# Columns stored as JSON text (jsonb in Postgres)
+JSON_COLUMNS = {
+    'collection_plants': ('plant_details_json',),
+}
+
+# Embeddable resources: (table, embedded table) ->
+#   (embedded table column, table column, to_many)
+RELATIONSHIPS = {
+    ('collections', 'collection_plants'): ('collection_id', 'id', True),
+    ('forum_posts', 'forum_comments'): ('post_id', 'id', True),
+    ('forum_posts', 'profiles'): ('id', 'user_id', False),
+    ('forum_comments', 'profiles'): ('id', 'user_id', False),
+}
+
+# PostgREST filter operators supported inside or_() expressions
+_FILTER_OPERATORS = {
+    'eq': '=', 'neq': '!=', 'lt': '<', 'lte': '<=', 'gt': '>', 'gte': '>=',
+}
+
+_memory_databases = itertools.count(1)
+
+
+class SQLiteAPIError(Exception):
+    """Mirrors postgrest's APIError: a message plus a Postgres error code."""
+
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+class SQLiteResponse:
+    """Query result shaped like postgrest's APIResponse."""
+
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _now():
+    # Same shape PostgREST returns for timestamptz, so string comparison
+    # orders timestamps correctly
+    return datetime.now(timezone.utc).isoformat(timespec='microseconds')
+
+
+def _split_top_level(text):
+    """Splits on commas that are not inside parentheses or quotes."""
+    parts, depth, quoted, current = [], 0, False, ''
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        if char == ',' and depth == 0 and not quoted:
+            parts.append(current.strip())
+            current = ''
+        else:
+            current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+def _parse_columns(spec):
+    """
+    Parses a PostgREST select string into (plain columns, embeds).
+    e.g. 'id, collection_plants(id, common_name)' ->
+         (['id'], [('collection_plants', 'id, common_name')])
+    """
+    columns, embeds = [], []
+    for item in _split_top_level(spec or '*'):
+        if '(' in item and item.endswith(')'):
+            name, inner = item.split('(', 1)
+            embeds.append((name.strip(), inner[:-1]))
+        else:
+            columns.append(item)
+    return columns, embeds
+
+
+def _parse_column(item):
+    """
+    Parses one selected column into (output key, column, JSON path).
+    Supports PostgREST aliases and JSON paths, e.g.
+    'light:plant_details_json->care_instructions->>light' ->
+    ('light', 'plant_details_json', [('->', 'care_instructions'),
+                                     ('->>', 'light')])
+    """
+    alias = None
+    head = item.split('->', 1)[0]
+    if ':' in head:
+        alias, item = (part.strip() for part in item.split(':', 1))
+
+    pieces = re.split(r'(->>?)', item)
+    column = pieces[0].strip()
+    path = [(pieces[i], pieces[i + 1].strip())
+            for i in range(1, len(pieces) - 1, 2)]
+    key = alias or (path[-1][1] if path else column)
+    return key, column, path
+
+
+def _json_path(value, path):
+    """Follows a JSON path like PostgREST; '->>' as last step yields text."""
+    for _, key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    if path and path[-1][0] == '->>' and value is not None \
+            and not isinstance(value, str):
+        return json.dumps(value)
+    return value
+
+
+def _unquote(value):
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1].replace('\\"', '"')
+    return value
+
+
+class SQLiteClient:
+    """
+    supabase-py compatible client backed by SQLite.
+
+    A file path gives one connection per thread (WAL mode, so readers don't
+    block each other). ':memory:' gives a private in-memory database shared
+    by all threads through a single locked connection.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._columns = {}
+
+        if path == ':memory:':
+            self._target = (f"file:gardenwise-{next(_memory_databases)}"
+                            "?mode=memory&cache=shared")
+            self._uri = True
+            self._shared = self._open()
+            self._lock = threading.Lock()
+        else:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._target = path
+            self._uri = False
+            self._shared = None
+            self._lock = None
+
+        # Creates the schema and caches every table's columns up front
+        self._connection()
+
+    # --- Client interface used by db_service ---
+
+    def table(self, name):
+        return _QueryBuilder(self, name)
+
+    def rpc(self, name, params=None):
+        return _RpcCall(self, name, params or {})
+
+    # --- Connection handling ---
+
+    def _open(self):
+        conn = sqlite3.connect(self._target, uri=self._uri, timeout=5,
+                               check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("pragma foreign_keys = on")
+        if not self._uri:
+            conn.execute("pragma journal_mode = wal")
+        with self._schema_lock:
+            if not self._schema_ready:
+                conn.executescript(SCHEMA)
+                tables = conn.execute(
+                    "select name from sqlite_master where type = 'table'"
+                ).fetchall()
+                for table in tables:
+                    info = conn.execute(
+                        "select name from pragma_table_info(?)",
+                        (table['name'],)).fetchall()
+                    self._columns[table['name']] = tuple(
+                        row['name'] for row in info)
+                self._schema_ready = True
+        return conn
+
+    def _connection(self):
+        if self._shared is not None:
+            return self._shared
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+        return conn
+
+    def run(self, func):
+        """Runs func(conn) in a transaction, mapping SQLite errors."""
+        conn = self._connection()
+        try:
+            with self._lock or nullcontext():
+                with conn:
+                    return func(conn)
+        except sqlite3.IntegrityError as e:
+            message = str(e)
+            if 'UNIQUE' in message:
+                code = '23505'
+            elif 'FOREIGN KEY' in message:
+                code = '23503'
+            elif 'NOT NULL' in message:
+                code = '23502'
+            else:
+                code = '23000'
+            raise SQLiteAPIError(message, code) from e
+
+    def columns(self, table):
+        """Returns the column names of `table` (validates identifiers)."""
+        if table not in self._columns:
+            raise SQLiteAPIError(f'relation "{table}" does not exist',
+                                 '42P01')
+        return self._columns[table]
+
+    def check_column(self, table, column):
+        if column not in self.columns(table):
+            raise SQLiteAPIError(
+                f'column {table}.{column} does not exist', '42703')
+        return f'"{column}"'
+
+    def decode_row(self, table, row):
+        record = dict(row)
+        for column in JSON_COLUMNS.get(table, ()):
+            if isinstance(record.get(column), str):
+                record[column] = json.loads(record[column])
+        return record
+
+
+def _encode_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+class _QueryBuilder:
+    """Accumulates a single table query and runs it on execute()."""
+
+    def __init__(self, client, table):
+        self._client = client
+        self._table = table
+        self._action = 'select'
+        self._columns = '*'
+        self._values = None
+        self._count = None
+        self._total = None
+        self._where = []
+        self._params = []
+        self._orders = []
+        self._limit = None
+        self._foreign_orders = {}
+        self._foreign_limits = {}
+
+    # --- Actions ---
+
+    def select(self, columns='*', count=None):
+        self._action, self._columns, self._count = 'select', columns, count
+        return self
+
+    def insert(self, values, count=None, returning='representation',
+               upsert=False):
+        self._action, self._values, self._count = 'insert', values, count
+        return self
+
+    def update(self, values, count=None):
+        self._action, self._values, self._count = 'update', values, count
+        return self
+
+    def delete(self, count=None):
+        self._action, self._count = 'delete', count
+        return self
+
+    # --- Filters and modifiers ---
+
+    def _filter(self, column, operator, value):
+        column_sql = self._client.check_column(self._table, column)
+        self._where.append(f"{column_sql} {operator} ?")
+        self._params.append(_encode_value(value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, '=', value)
+
+    def neq(self, column, value):
+        return self._filter(column, '!=', value)
+
+    def lt(self, column, value):
+        return self._filter(column, '<', value)
+
+    def gt(self, column, value):
+        return self._filter(column, '>', value)
+
+    def is_(self, column, value):
+        column_sql = self._client.check_column(self._table, column)
+        if value not in ('null', None):
+            raise SQLiteAPIError(f'unsupported is value "{value}"', 'PGRST100')
+        self._where.append(f"{column_sql} is null")
+        return self
+
+    def in_(self, column, values):
+        column_sql = self._client.check_column(self._table, column)
+        values = list(values)
+        if not values:
+            self._where.append("0")
+        else:
+            placeholders = ', '.join('?' for _ in values)
+            self._where.append(f"{column_sql} in ({placeholders})")
+            self._params.extend(_encode_value(v) for v in values)
+        return self
+
+    def or_(self, filters, reference_table=None):
+        sql, params = self._parse_logic('or', filters)
+        self._where.append(sql)
+        self._params.extend(params)
+        return self
+
+    def order(self, column, *, desc=False, nullsfirst=None,
+              foreign_table=None):
+        direction = 'desc' if desc else 'asc'
+        if foreign_table:
+            self._foreign_orders.setdefault(foreign_table, []).append(
+                (column, direction))
+        else:
+            column_sql = self._client.check_column(self._table, column)
+            self._orders.append(f"{column_sql} {direction}")
+        return self
+
+    def limit(self, size, *, foreign_table=None):
+        if foreign_table:
+            self._foreign_limits[foreign_table] = size
+        else:
+            self._limit = size
+        return self
+
+    # --- or_() expression parsing ---
+
+    def _parse_logic(self, joiner, expression):
+        """Turns 'a.lt.1,and(b.eq."x",c.gt.2)' into SQL + parameters."""
+        clauses, params = [], []
+        for part in _split_top_level(expression):
+            for nested in ('and', 'or'):
+                if part.startswith(f'{nested}(') and part.endswith(')'):
+                    sql, nested_params = self._parse_logic(
+                        nested, part[len(nested) + 1:-1])
+                    break
+            else:
+                column, operator, value = part.split('.', 2)
+                column_sql = self._client.check_column(self._table, column)
+                if operator == 'is':
+                    keyword = {'null': 'null', 'true': '1', 'false': '0'}
+                    sql = f"{column_sql} is {keyword[value.lower()]}"
+                    nested_params = []
+                elif operator in _FILTER_OPERATORS:
+                    sql = f"{column_sql} {_FILTER_OPERATORS[operator]} ?"
+                    nested_params = [_unquote(value)]
+                else:
+                    raise SQLiteAPIError(
+                        f'unsupported filter operator "{operator}"',
+                        'PGRST100')
+            clauses.append(sql)
+            params.extend(nested_params)
+        return '(' + f' {joiner} '.join(clauses) + ')', params
+
+    # --- Execution ---
+
+    def _where_sql(self):
+        return (' where ' + ' and '.join(self._where)) if self._where else ''
+
+    def execute(self):
+        data = self._client.run(getattr(self, f'_execute_{self._action}'))
+        count = None
+        if self._count:
+            count = self._total if self._total is not None else len(data)
+        return SQLiteResponse(data, count)
+
+    def _execute_select(self, conn):
+        sql = f'select * from "{self._table}"{self._where_sql()}'
+        if self._orders:
+            sql += ' order by ' + ', '.join(self._orders)
+        params = list(self._params)
+        if self._count and self._limit is not None:
+            # Like PostgREST, count the filtered rows, not the page
+            self._total = conn.execute(
+                f'select count(*) from "{self._table}"{self._where_sql()}',
+                self._params).fetchone()[0]
+        if self._limit is not None:
+            sql += ' limit ?'
+            params.append(self._limit)
+
+        rows = [self._client.decode_row(self._table, row)
+                for row in conn.execute(sql, params)]
+        return self._shape(conn, self._table, rows, self._columns)
+
+    def _shape(self, conn, table, rows, spec):
+        """Projects rows to the selected columns and attaches embeds."""
+        columns, embeds = _parse_columns(spec)
+        for name, inner in embeds:
+            self._embed(conn, table, rows, name, inner)
+
+        if '*' in columns:
+            return rows
+        specs = [_parse_column(column) for column in columns]
+        for _, column, _ in specs:
+            self._client.check_column(table, column)
+
+        shaped = []
+        for row in rows:
+            record = {key: _json_path(row.get(column), path)
+                      for key, column, path in specs}
+            record.update((name, row[name]) for name, _ in embeds)
+            shaped.append(record)
+        return shaped
+
+    def _embed(self, conn, table, rows, name, inner):
+        relationship = RELATIONSHIPS.get((table, name))
+        if relationship is None:
+            raise SQLiteAPIError(
+                f"Could not find a relationship between '{table}' and "
+                f"'{name}'", 'PGRST200')
+        child_column, parent_column, to_many = relationship
+
+        keys = sorted({row[parent_column] for row in rows
+                       if row.get(parent_column) is not None})
+        children = []
+        if keys:
+            placeholders = ', '.join('?' for _ in keys)
+            sql = (f'select * from "{name}" '
+                   f'where "{child_column}" in ({placeholders})')
+            orders = self._foreign_orders.get(name, [])
+            if orders:
+                sql += ' order by ' + ', '.join(
+                    f'{self._client.check_column(name, column)} {direction}'
+                    for column, direction in orders)
+            children = [self._client.decode_row(name, row)
+                        for row in conn.execute(sql, keys)]
+
+        grouped = {}
+        for child in children:
+            grouped.setdefault(child[child_column], []).append(child)
+
+        limit = self._foreign_limits.get(name)
+        for row in rows:
+            related = grouped.get(row.get(parent_column), [])
+            if limit is not None:
+                related = related[:limit]
+            if inner.strip() == 'count':
+                row[name] = [{"count": len(related)}]
+            elif to_many:
+                row[name] = self._shape(conn, name, related, inner)
+            else:
+                shaped = self._shape(conn, name, related[:1], inner)
+                row[name] = shaped[0] if shaped else None
+
+    def _prepare_record(self, record, stamp=True):
+        record = dict(record)
+        created_at = CREATED_AT_COLUMNS.get(self._table)
+        if stamp and created_at and not record.get(created_at):
+            record[created_at] = _now()
+        columns = [self._client.check_column(self._table, c) for c in record]
+        values = [_encode_value(v) for v in record.values()]
+        return columns, values
+
+    def _execute_insert(self, conn):
+        records = self._values
+        if isinstance(records, dict):
+            records = [records]
+
+        inserted = []
+        for record in records:
+            columns, values = self._prepare_record(record)
+            placeholders = ', '.join('?' for _ in values)
+            row = conn.execute(
+                f'insert into "{self._table}" ({", ".join(columns)}) '
+                f'values ({placeholders}) returning *', values).fetchone()
+            inserted.append(self._client.decode_row(self._table, row))
+        return inserted
+
+    def _execute_update(self, conn):
+        columns, values = self._prepare_record(self._values, stamp=False)
+        assignments = ', '.join(f'{column} = ?' for column in columns)
+        rows = conn.execute(
+            f'update "{self._table}" set {assignments}'
+            f'{self._where_sql()} returning *',
+            values + self._params).fetchall()
+        return [self._client.decode_row(self._table, row) for row in rows]
+
+    def _execute_delete(self, conn):
+        rows = conn.execute(
+            f'delete from "{self._table}"{self._where_sql()} returning *',
+            self._params).fetchall()
+        return [self._client.decode_row(self._table, row) for row in rows]
+
+
+class _RpcCall:
+    """A call to one of the server-side functions in backend/sql/."""
+
+    def __init__(self, client, name, params):
+        self._client = client
+        self._name = name
+        self._params = params
+
+    def execute(self):
+        function = _RPC_FUNCTIONS.get(self._name)
+        if function is None:
+            raise SQLiteAPIError(
+                f"Could not find the function public.{self._name}",
+                'PGRST202')
+        data = self._client.run(lambda conn: function(self._client, conn,
+                                                      self._params))
+        return SQLiteResponse(data)
+
+
+def _rpc_save_plant_to_collection(client, conn, params):
+    """SQLite port of sql/save_plant_to_collection.sql."""
+    row = conn.execute(
+        "select id from collections where user_id = ? and collection_name = ?"
+        " limit 1",
+        (params['p_user_id'], params['p_collection_name'])).fetchone()
+
+    if row is None:
+        row = conn.execute(
+            "insert into collections"
+            " (user_id, collection_name, status, created_at)"
+            " values (?, ?, 'Active', ?)"
+            " on conflict (user_id, collection_name)"
+            " do update set collection_name = excluded.collection_name"
+            " returning id",
+            (params['p_user_id'], params['p_collection_name'], _now())
+        ).fetchone()
+
+    plant = conn.execute(
+        "insert into collection_plants"
+        " (collection_id, common_name, plant_details_json, added_at)"
+        " values (?, ?, ?, ?) returning *",
+        (row['id'], params.get('p_common_name'),
+         _encode_value(params.get('p_plant_details')), _now())).fetchone()
+    return [client.decode_row('collection_plants', plant)]
+
+
+def _rpc_collection_summaries(client, conn, params):
+    """SQLite port of sql/collection_summaries.sql."""
+    rows = conn.execute(
+        "select c.id, c.collection_name, count(p.id) as plant_count,"
+        " max(c.created_at, coalesce(max(p.added_at), c.created_at))"
+        "   as last_modified"
+        " from collections c"
+        " left join collection_plants p on p.collection_id = c.id"
+        " where c.user_id = ?"
+        " group by c.id, c.collection_name, c.created_at"
+        " order by c.collection_name",
+        (params['p_user_id'],)).fetchall()
+    return [dict(row) for row in rows]
+
+
+def _rpc_comment_reply_previews(client, conn, params):
+    """SQLite port of sql/comment_reply_previews.sql."""
+    parent_ids = list(params['p_parent_ids'])
+    if not parent_ids:
+        return []
+    preview = params['p_preview']
+
+    # Every parent keeps at least its first row, which carries the count
+    placeholders = ', '.join('?' for _ in parent_ids)
+    rows = conn.execute(
+        "select * from ("
+        " select c.*,"
+        "  row_number() over (partition by c.parent_comment_id"
+        "   order by c.created_at, c.id) as reply_rank,"
+        "  count(*) over (partition by c.parent_comment_id) as reply_count"
+        " from forum_comments c"
+        f" where c.parent_comment_id in ({placeholders})"
+        ") where reply_rank <= max(?, 1)"
+        " order by parent_comment_id, reply_rank",
+        parent_ids + [preview]).fetchall()
+
+    previews = {}
+    for row in rows:
+        reply = client.decode_row('forum_comments', row)
+        rank = reply.pop('reply_rank')
+        count = reply.pop('reply_count')
+        entry = previews.setdefault(reply['parent_comment_id'], {
+            "parent_comment_id": reply['parent_comment_id'],
+            "reply_count": count,
+            "replies": [],
+        })
+        if rank <= preview:
+            entry["replies"].append(reply)
+    return list(previews.values())
+
+
+_RPC_FUNCTIONS = {
+    'save_plant_to_collection': _rpc_save_plant_to_collection,
+    'collection_summaries': _rpc_collection_summaries,
+    'comment_reply_previews': _rpc_comment_reply_previews,
+}
@@ -1,8 +1,8 @@
 """
 Pytest configuration and fixtures for plant_service tests.
 
-This sets up environment variables before any modules are imported,
-preventing import-time errors from missing API keys in the .env file.
+This sets up environment variables before any modules are imported, so
+the services read test API keys instead of the ones in the .env file.
 """
 
 import os
@@ -13,7 +13,7 @@ import pytest
 def setup_test_env():
     """
     Set up mock environment variables before any tests run.
-    This prevents plant_service.py from raising errors during import.
+    plant_service.py reads these when it is imported.
     """
     # Set mock values for RapidAPI
     os.environ['RAPID_API_KEY'] = 'test_rapid_api_key_12345'
@@ -0,0 +1,202 @@
+"""
+Unit tests for api/ai_planner.py routes
+
+Tests request handling for the AI planner endpoints with the AI service
+mocked out.
+"""
+
+import pytest
+from unittest.mock import patch
+import sys
+import os
+
+# Add backend directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+
+from api.ai_planner import ai_bp
+
+
+AUTH = {"Authorization": "Bearer test-token"}
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(ai_bp, url_prefix='/api/v1')
+    with patch('api.collections.auth_service.verify_access_token',
+               return_value={"sub": "user-123"}):
+        yield app.test_client()
+
+
+class TestStreamPlanRoute:
+    """Test POST /ai/plan/stream"""
+
+    @patch('api.ai_planner.stream_garden_plan')
+    def test_relays_events_as_sse(self, mock_stream, client):
+        """Test that service events are framed as Server-Sent Events"""
+        mock_stream.return_value = (event for event in [
+            ('chunk', {"text": "1. Basil"}),
+            ('done', {"status": "success", "plan": "1. Basil", "cached": False}),
+        ])
+
+        response = client.post('/api/v1/ai/plan/stream', headers=AUTH,
+                               json={"user_input": "Plan my garden"})
+
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+        assert response.headers["Cache-Control"] == "no-cache"
+        assert response.get_data(as_text=True) == (
+            'event: chunk\ndata: {"text": "1. Basil"}\n\n'
+            'event: done\ndata: {"status": "success", "plan": "1. Basil", "cached": false}\n\n'
+        )
+        mock_stream.assert_called_once_with("Plan my garden")
+
+    @patch('api.ai_planner.stream_garden_plan')
+    def test_missing_input(self, mock_stream, client):
+        """Test that a request without user_input is rejected up front"""
+        response = client.post('/api/v1/ai/plan/stream', headers=AUTH, json={})
+
+        assert response.status_code == 400
+        mock_stream.assert_not_called()
+
+    def test_requires_token(self, client):
+        """Test that the stream is protected"""
+        response = client.post('/api/v1/ai/plan/stream',
+                               json={"user_input": "Plan my garden"})
+
+        assert response.status_code == 401
+
+    @patch('api.ai_planner.stream_garden_plan')
+    def test_disconnect_closes_service_stream(self, mock_stream, client):
+        """Test that closing the response closes the service generator"""
+        closed = []
+
+        def events():
+            try:
+                yield 'chunk', {"text": "1. Basil"}
+                yield 'chunk', {"text": " more"}
+            finally:
+                closed.append(True)
+
+        mock_stream.return_value = events()
+
+        response = client.post('/api/v1/ai/plan/stream', headers=AUTH,
+                               json={"user_input": "Plan my garden"},
+                               buffered=False)
+        next(response.response)
+        response.close()
+
+        assert closed == [True]
+
+
+class TestPlanJobRoutes:
+    """Test POST /ai/plan/jobs and GET /ai/plan/jobs/<id>"""
+
+    @patch('api.ai_planner.submit_plan_job')
+    def test_submit_returns_202_with_location(self, mock_submit, client):
+        """Test that a queued job is acknowledged at once"""
+        mock_submit.return_value = ({"status": "success", "job": {"id": "abc", "state": "queued"}}, 202)
+
+        response = client.post('/api/v1/ai/plan/jobs', headers=AUTH,
+                               json={"user_input": "Plan my garden"})
+
+        assert response.status_code == 202
+        assert response.headers["Location"].endswith('/api/v1/ai/plan/jobs/abc')
+        mock_submit.assert_called_once_with("user-123", "Plan my garden")
+
+    @patch('api.ai_planner.submit_plan_job')
+    def test_rejection_sets_retry_after(self, mock_submit, client):
+        """Test that a full queue tells the client when to retry"""
+        mock_submit.return_value = ({"status": "error", "message": "full", "code": "queue_full"}, 503)
+
+        response = client.post('/api/v1/ai/plan/jobs', headers=AUTH,
+                               json={"user_input": "Plan my garden"})
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "10"
+
+    @patch('api.ai_planner.submit_plan_job')
+    def test_submit_missing_input(self, mock_submit, client):
+        """Test that a job without user_input is rejected"""
+        response = client.post('/api/v1/ai/plan/jobs', headers=AUTH, json={})
+
+        assert response.status_code == 400
+        mock_submit.assert_not_called()
+
+    @patch('api.ai_planner.get_plan_job')
+    def test_get_job(self, mock_get, client):
+        """Test that job lookups are scoped to the caller"""
+        mock_get.return_value = ({"status": "success", "job": {"id": "abc", "state": "running"}}, 200)
+
+        response = client.get('/api/v1/ai/plan/jobs/abc', headers=AUTH)
+
+        assert response.status_code == 200
+        assert response.get_json()["job"]["state"] == "running"
+        mock_get.assert_called_once_with("user-123", "abc")
+
+
+class TestLayoutRoute:
+    """Test POST /ai/layout"""
+
+    @patch('api.ai_planner.plan_garden_layout')
+    def test_passes_layout_request(self, mock_layout, client):
+        """Test that the body is handed to the layout service"""
+        mock_layout.return_value = ({"status": "success", "layout": {}, "source": "layout"}, 200)
+        body = {"bed": {"width_ft": 4, "length_ft": 4}, "plants": [{"name": "Basil"}],
+                "sun_map": "partial", "narrative": True}
+
+        response = client.post('/api/v1/ai/layout', headers=AUTH, json=body)
+
+        assert response.status_code == 200
+        mock_layout.assert_called_once_with(body["bed"], body["plants"],
+                                            sun_map="partial", narrative=True)
+
+
+class TestPlanFromCollectionRoute:
+    """Test POST /ai/plan/from-collection/<collection_name>"""
+
+    @patch('api.ai_planner.generate_collection_plan')
+    @patch('api.ai_planner.db_service.get_collection_planning_fields')
+    def test_plans_from_user_collection(self, mock_fields, mock_plan, client):
+        """Test that the caller's collection feeds the plan"""
+        mock_fields.return_value = {"status": "success", "data": [{"common_name": "Basil"}]}
+        mock_plan.return_value = ({"status": "success", "plan": "Plant basil",
+                                   "prompt": {"estimated_tokens": 30}}, 200)
+
+        response = client.post('/api/v1/ai/plan/from-collection/Herb%20Garden', headers=AUTH,
+                               json={"user_input": "Balcony"})
+
+        assert response.status_code == 200
+        assert response.get_json()["prompt"]["estimated_tokens"] == 30
+        mock_fields.assert_called_once_with("user-123", "Herb Garden")
+        mock_plan.assert_called_once_with("Herb Garden", [{"common_name": "Basil"}], "Balcony")
+
+    @patch('api.ai_planner.generate_collection_plan')
+    @patch('api.ai_planner.db_service.get_collection_planning_fields')
+    def test_unknown_collection_is_404(self, mock_fields, mock_plan, client):
+        """Test that a missing collection never reaches Gemini"""
+        mock_fields.return_value = {"status": "empty", "message": "Collection not found.",
+                                    "code": "collection_not_found"}
+
+        response = client.post('/api/v1/ai/plan/from-collection/Nope', headers=AUTH)
+
+        assert response.status_code == 404
+        mock_plan.assert_not_called()
+
+
+class TestPlanRouteBusy:
+    """Test POST /ai/plan when Gemini's bulkhead is full"""
+
+    @patch('api.ai_planner.generate_garden_plan')
+    def test_retry_after_header(self, mock_plan, client):
+        """Test that a 503 from the service carries Retry-After"""
+        mock_plan.return_value = ({"status": "error", "message": "Busy",
+                                   "code": "upstream_busy", "retry_after": 7}, 503)
+
+        response = client.post('/api/v1/ai/plan', headers=AUTH,
+                               json={"user_input": "Plan my garden"})
+
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '7'
@@ -7,13 +7,39 @@ Uses mocking to avoid requiring actual API key.
 
 import pytest
 from unittest.mock import Mock, patch
+import json
 import sys
 import os
+import threading
 
 # Add backend directory to path for imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import ai_service
+from bulkhead_service import Bulkhead, BulkheadFull
+
+
+@pytest.fixture(autouse=True)
+def plan_cache(tmp_path):
+    """Start every test with an empty plan cache and a throwaway disk store"""
+    store = ai_service.SQLiteTTLStore(
+        str(tmp_path / "ai_plans.sqlite3"),
+        table='ai_plans',
+        ttl_seconds=60
+    )
+    ai_service.AI_PLAN_CACHE.clear()
+    with patch('ai_service.AI_PLAN_STORE', store):
+        yield store
+    ai_service.AI_PLAN_CACHE.clear()
+
+
+def _plan_response(text):
+    mock_response = Mock()
+    mock_response.status_code = 200
+    mock_response.json.return_value = {
+        "candidates": [{"content": {"parts": [{"text": text}]}}]
+    }
+    return mock_response
 
 
 class TestGeminiAPIConfiguration:
@@ -35,7 +61,7 @@ class TestGenerateGardenPlan:
     """Test garden plan generation"""
 
     @patch('ai_service.GEMINI_API_KEY', 'test-api-key')
-    @patch('ai_service.requests.post')
+    @patch('ai_service.http_client.post')
     def test_generate_garden_plan_success(self, mock_post):
         """Test successful garden plan generation"""
         # Mock successful API response
@@ -76,7 +102,7 @@ class TestGenerateGardenPlan:
         assert "API key is missing" in result["message"]
 
     @patch('ai_service.GEMINI_API_KEY', 'test-api-key')
-    @patch('ai_service.requests.post')
+    @patch('ai_service.http_client.post')
     def test_generate_garden_plan_empty_response(self, mock_post):
         """Test handling when API returns empty response"""
         mock_response = Mock()
@@ -99,7 +125,7 @@ class TestGenerateGardenPlan:
         assert result["status"] == "error"
 
     @patch('ai_service.GEMINI_API_KEY', 'test-api-key')
-    @patch('ai_service.requests.post')
+    @patch('ai_service.http_client.post')
     def test_generate_garden_plan_http_error(self, mock_post):
         """Test handling of HTTP errors (401, 429, 500, etc.)"""
         import requests
@@ -116,7 +142,7 @@ class TestGenerateGardenPlan:
         assert "Network error" in result["message"]
 
     @patch('ai_service.GEMINI_API_KEY', 'test-api-key')
-    @patch('ai_service.requests.post')
+    @patch('ai_service.http_client.post')
     def test_generate_garden_plan_network_timeout(self, mock_post):
         """Test handling of network timeout"""
         mock_post.side_effect = Exception("Connection timeout")
@@ -128,7 +154,20 @@ class TestGenerateGardenPlan:
         assert result["status"] == "error"
 
     @patch('ai_service.GEMINI_API_KEY', 'test-api-key')
-    @patch('ai_service.requests.post')
+    @patch('ai_service.http_client.post')
+    def test_generate_garden_plan_gemini_busy(self, mock_post):
+        """Test that a full Gemini bulkhead gives a 503 that is not cached"""
+        mock_post.side_effect = BulkheadFull('gemini', retry_after=7)
+
+        result, status_code = ai_service.generate_garden_plan("Plan my garden")
+
+        assert status_code == 503
+        assert result["code"] == "upstream_busy"
+        assert result["retry_after"] == 7
+        assert ai_service.get_cached_plan(ai_service.plan_cache_key("Plan my garden")) is None
+
+    @patch('ai_service.GEMINI_API_KEY', 'test-api-key')
+    @patch('ai_service.http_client.post')
     def test_generate_garden_plan_malformed_response(self, mock_post):
         """Test handling of malformed API response"""
         mock_response = Mock()
@@ -144,7 +183,7 @@ class TestGenerateGardenPlan:
         assert "unexpected error" in result["message"].lower()
 
     @patch('ai_service.GEMINI_API_KEY', 'test-api-key')
-    @patch('ai_service.requests.post')
+    @patch('ai_service.http_client.post')
     def test_generate_garden_plan_request_payload(self, mock_post):
         """Test that request payload is properly formatted"""
         mock_response = Mock()
@@ -175,7 +214,7 @@ class TestGenerateGardenPlan:
         assert payload["systemInstruction"]["parts"][0]["text"] == ai_service.SYSTEM_PROMPT
 
     @patch('ai_service.GEMINI_API_KEY', 'test-api-key')
-    @patch('ai_service.requests.post')
+    @patch('ai_service.http_client.post')
     def test_generate_garden_plan_with_complex_input(self, mock_post):
         """Test garden planning with detailed user requirements"""
         mock_response = Mock()
@@ -224,3 +263,367 @@ class TestSystemPrompt:
         """Test that system prompt establishes professional context"""
         prompt = ai_service.SYSTEM_PROMPT.lower()
         assert "garden" in prompt and "planner" in prompt
+
+
+class TestPlanCache:
+    """Test caching of generated plans"""
+
+    @patch('ai_service.GEMINI_API_KEY', 'test-api-key')
+    @patch('ai_service.http_client.post')
+    def test_repeat_prompt_served_from_cache(self, mock_post):
+        """Test that a resubmitted prompt skips Gemini and reports a hit"""
+        mock_post.return_value = _plan_response("Plant basil")
+
+        first, _ = ai_service.generate_garden_plan("Plan my  garden")
+        second, status = ai_service.generate_garden_plan("  plan MY garden ")
+
+        assert first["cached"] is False
+        assert status == 200
+        assert second == {"status": "success", "plan": "Plant basil", "cached": True}
+        assert mock_post.call_count == 1
+
+    @patch('ai_service.GEMINI_API_KEY', 'test-api-key')
+    @patch('ai_service.http_client.post')
+    def test_errors_not_cached(self, mock_post):
+        """Test that failed generations are retried"""
+        mock_post.side_effect = [Exception("Connection timeout"), _plan_response("Plant basil")]
+
+        first, _ = ai_service.generate_garden_plan("Plan my garden")
+        second, _ = ai_service.generate_garden_plan("Plan my garden")
+
+        assert first["status"] == "error"
+        assert second["cached"] is False
+        assert mock_post.call_count == 2
+
+    @patch('ai_service.GEMINI_API_KEY', 'test-api-key')
+    @patch('ai_service.http_client.post')
+    def test_disk_store_survives_memory_loss(self, mock_post, plan_cache):
+        """Test that plans persisted on disk are served after a restart"""
+        mock_post.return_value = _plan_response("Plant basil")
+        ai_service.generate_garden_plan("Plan my garden")
+
+        ai_service.AI_PLAN_CACHE.clear()
+        result, _ = ai_service.generate_garden_plan("Plan my garden")
+
+        assert result["cached"] is True
+        assert mock_post.call_count == 1
+        assert plan_cache.get(ai_service.plan_cache_key("Plan my garden")) == "Plant basil"
+
+    @patch('ai_service.AI_PLAN_STORE', None)
+    @patch('ai_service.GEMINI_API_KEY', 'test-api-key')
+    @patch('ai_service.http_client.post')
+    def test_memory_only_without_store(self, mock_post):
+        """Test that the cache works with the disk layer disabled"""
+        mock_post.return_value = _plan_response("Plant basil")
+
+        ai_service.generate_garden_plan("Plan my garden")
+        result, _ = ai_service.generate_garden_plan("Plan my garden")
+
+        assert result["cached"] is True
+
+    def test_key_depends_on_model_and_system_prompt(self):
+        """Test that changing the model or system prompt changes the key"""
+        key = ai_service.plan_cache_key("Plan my garden")
+
+        with patch('ai_service.GEMINI_MODEL', 'gemini-other'):
+            assert ai_service.plan_cache_key("Plan my garden") != key
+        with patch('ai_service.SYSTEM_PROMPT', 'Be brief.'):
+            assert ai_service.plan_cache_key("Plan my garden") != key
+        assert ai_service.plan_cache_key("PLAN my garden") == key
+
+
+def _stream_response(*texts):
+    mock_response = Mock()
+    mock_response.status_code = 200
+    lines = []
+    for text in texts:
+        chunk = {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+        lines.extend([f"data: {json.dumps(chunk)}", ""])
+    mock_response.iter_lines.return_value = iter(lines)
+    return mock_response
+
+
+class TestStreamGardenPlan:
+    """Test the streaming plan generator"""
+
+    @patch('ai_service.GEMINI_API_KEY', 'test-api-key')
+    @patch('ai_service.http_client.post')
+    def test_stream_holds_gemini_slot(self, mock_post):
+        """Test that the Gemini slot is held until the stream ends"""
+        bulkhead = Bulkhead('gemini', max_limit=2, target_latency_ms=60000)
+        mock_post.return_value = _stream_response("1. Basil")
+
+        with patch.dict(ai_service.BULKHEADS, {'gemini': bulkhead}):
+            stream = ai_service.stream_garden_plan("Plan my garden")
+            next(stream)
+            in_flight = bulkhead.stats()["in_flight"]
+            list(stream)
+
+        assert in_flight == 1
+        assert bulkhead.stats()["in_flight"] == 0
+        assert mock_post.call_args[1]['bulkhead'] is False
+
+    @patch('ai_service.GEMINI_API_KEY', 'test-api-key')
+    @patch('ai_service.http_client.post')
+    def test_stream_rejected_when_gemini_busy(self, mock_post):
+        """Test that a full Gemini bulkhead ends the stream with an error event"""
+        bulkhead = Bulkhead('gemini', max_limit=1, target_latency_ms=60000)
+        bulkhead.acquire()
+
+        with patch.dict(ai_service.BULKHEADS, {'gemini': bulkhead}):
+            events = list(ai_service.stream_garden_plan("Plan my garden"))
+
+        assert events[0][0] == 'error'
+        assert events[0][1]["code"] == "upstream_busy"
+        mock_post.assert_not_called()
+
+    @patch('ai_service.GEMINI_API_KEY', 'test-api-key')
+    @patch('ai_service.http_client.post')
+    def test_chunks_then_full_plan(self, mock_post):
+        """Test that chunks are relayed and the full plan is assembled and cached"""
+        mock_post.return_value = _stream_response("1. Basil", " near tomatoes")
+
+        events = list(ai_service.stream_garden_plan("Plan my garden"))
+
+        assert events == [
+            ('chunk', {"text": "1. Basil"}),
+            ('chunk', {"text": " near tomatoes"}),
+            ('done', {"status": "success", "plan": "1. Basil near tomatoes", "cached": False}),
+        ]
+        assert mock_post.call_args[1]['stream'] is True
+        assert "alt=sse" in mock_post.call_args[0][0]
+        assert ai_service.get_cached_plan(
+            ai_service.plan_cache_key("Plan my garden")) == "1. Basil near tomatoes"
+        mock_post.return_value.close.assert_called_once()
+
+    @patch('ai_service.GEMINI_API_KEY', 'test-api-key')
+    @patch('ai_service.http_client.post')
+    def test_cached_plan_sent_as_one_chunk(self, mock_post):
+        """Test that a cached plan skips Gemini"""
+        ai_service.store_plan(ai_service.plan_cache_key("Plan my garden"), "Plant basil")
+
+        events = list(ai_service.stream_garden_plan("plan my garden"))
+
+        assert events[0] == ('chunk', {"text": "Plant basil"})
+        assert events[-1][1]["cached"] is True
+        mock_post.assert_not_called()
+
+    @patch('ai_service.GEMINI_API_KEY', 'test-api-key')
+    @patch('ai_service.http_client.post')
+    def test_client_disconnect_closes_upstream(self, mock_post):
+        """Test that closing the stream early closes Gemini's response and caches nothing"""
+        mock_post.return_value = _stream_response("1. Basil", " near tomatoes")
+
+        stream = ai_service.stream_garden_plan("Plan my garden")
+        next(stream)
+        stream.close()
+
+        mock_post.return_value.close.assert_called_once()
+        assert ai_service.get_cached_plan(ai_service.plan_cache_key("Plan my garden")) is None
+
+    @patch('ai_service.GEMINI_API_KEY', 'test-api-key')
+    @patch('ai_service.http_client.post')
+    def test_upstream_error_event(self, mock_post):
+        """Test that an HTTP error ends the stream with an error event"""
+        import requests
+        mock_post.return_value.raise_for_status.side_effect = requests.exceptions.HTTPError("HTTP 429")
+
+        events = list(ai_service.stream_garden_plan("Plan my garden"))
+
+        assert events == [('error', events[0][1])]
+        assert "Network error" in events[0][1]["message"]
+
+    @patch('ai_service.GEMINI_API_KEY', 'test-api-key')
+    @patch('ai_service.http_client.post')
+    def test_empty_stream_is_error(self, mock_post):
+        """Test that a stream without text is reported as an error"""
+        mock_post.return_value = _stream_response()
+
+        events = list(ai_service.stream_garden_plan("Plan my garden"))
+
+        assert events[-1][0] == 'error'
+
+
+@pytest.fixture
+def plan_jobs(tmp_path):
+    """A plan job queue on a throwaway SQLite file"""
+    queue = ai_service.JobQueue(
+        str(tmp_path / "ai_jobs.sqlite3"),
+        handler=lambda payload: ai_service.generate_garden_plan(payload["user_input"]),
+        table='ai_plan_jobs',
+        max_workers=1,
+        max_active_per_user=1,
+        name='ai_plan_jobs'
+    )
+    with patch('ai_service.AI_PLAN_JOBS', queue):
+        yield queue
+    queue.shutdown()
+
+
+class TestPlanJobs:
+    """Test background plan generation"""
+
+    @patch('ai_service.GEMINI_API_KEY', 'test-api-key')
+    @patch('ai_service.http_client.post')
+    def test_job_produces_plan(self, mock_post, plan_jobs):
+        """Test that a queued job runs generate_garden_plan and keeps the result"""
+        mock_post.return_value = _plan_response("Plant basil")
+
+        response, status = ai_service.submit_plan_job("user-123", "Plan my garden")
+        plan_jobs.wait(response["job"]["id"], timeout=5)
+        result, result_status = ai_service.get_plan_job("user-123", response["job"]["id"])
+
+        assert status == 202
+        assert "user_id" not in response["job"]
+        assert result_status == 200
+        assert result["job"]["state"] == "succeeded"
+        assert result["job"]["result"]["plan"] == "Plant basil"
+
+    def test_other_users_job_not_found(self, plan_jobs):
+        """Test that users can only read their own jobs"""
+        with patch('ai_service.generate_garden_plan', return_value=({"status": "success"}, 200)):
+            response, _ = ai_service.submit_plan_job("user-123", "Plan my garden")
+            plan_jobs.wait(response["job"]["id"], timeout=5)
+
+        result, status = ai_service.get_plan_job("user-456", response["job"]["id"])
+
+        assert status == 404
+        assert result["status"] == "error"
+
+    def test_user_cap_returns_429(self, plan_jobs):
+        """Test that a user over the pending-job cap is rejected"""
+        release = threading.Event()
+
+        def slow_plan(user_input):
+            release.wait(5)
+            return {"status": "success", "plan": "Plant basil"}, 200
+
+        with patch('ai_service.generate_garden_plan', side_effect=slow_plan):
+            ai_service.submit_plan_job("user-123", "Plan my garden")
+            result, status = ai_service.submit_plan_job("user-123", "Plan my patio")
+            release.set()
+
+        assert status == 429
+        assert result["code"] == "user_limit"
+
+    def test_stats_include_queue(self, plan_jobs):
+        """Test that queue metrics are part of the AI stats"""
+        stats = ai_service.get_ai_plan_stats()
+
+        assert stats["jobs"]["name"] == "ai_plan_jobs"
+        assert stats["jobs"]["queue_depth"] == 0
+
+
+class TestPlanGardenLayout:
+    """Test the local layout fast path and its use of Gemini"""
+
+    BED = {"width_ft": 4, "length_ft": 4}
+    PLANTS = [{"name": "Basil", "quantity": 2, "spacing_in": 12}]
+
+    @patch('ai_service.generate_garden_plan')
+    def test_layout_without_gemini(self, mock_generate):
+        """Test that a plain layout request never calls Gemini"""
+        result, status = ai_service.plan_garden_layout(self.BED, self.PLANTS)
+
+        assert status == 200
+        assert result["source"] == "layout"
+        assert len(result["layout"]["placements"]) == 2
+        mock_generate.assert_not_called()
+
+    @patch('ai_service.generate_garden_plan')
+    def test_narrative_explains_computed_layout(self, mock_generate):
+        """Test that Gemini is asked to explain, not redo, the layout"""
+        mock_generate.return_value = ({"status": "success", "plan": "Basil goes north."}, 200)
+
+        result, _ = ai_service.plan_garden_layout(self.BED, self.PLANTS, narrative=True)
+
+        assert result["source"] == "layout+gemini"
+        assert result["narrative"] == "Basil goes north."
+        prompt = mock_generate.call_args[0][0]
+        assert "do not move" in prompt
+        assert "- Basil: x=0, y=0" in prompt
+
+    @patch('ai_service.generate_garden_plan')
+    def test_narrative_failure_keeps_layout(self, mock_generate):
+        """Test that a Gemini error still returns the layout"""
+        mock_generate.return_value = ({"status": "error", "message": "Network error"}, 500)
+
+        result, status = ai_service.plan_garden_layout(self.BED, self.PLANTS, narrative=True)
+
+        assert status == 200
+        assert result["source"] == "layout"
+        assert result["narrative_error"] == "Network error"
+
+    @patch('ai_service.generate_garden_plan')
+    def test_gemini_fallback_when_nothing_fits(self, mock_generate):
+        """Test that Gemini plans the bed when no plant could be placed"""
+        mock_generate.return_value = ({"status": "success", "plan": "Use a bigger bed."}, 200)
+
+        result, _ = ai_service.plan_garden_layout(self.BED, [{"name": "Pumpkin", "spacing_in": 72}])
+
+        assert result["source"] == "gemini"
+        assert "Pumpkin" in mock_generate.call_args[0][0]
+
+    def test_invalid_layout_is_400(self):
+        """Test that invalid layout input is a client error"""
+        result, status = ai_service.plan_garden_layout(None, self.PLANTS)
+
+        assert status == 400
+        assert result["code"] == "invalid_layout_input"
+
+
+class TestCollectionPrompt:
+    """Test the compact prompt built from a saved collection"""
+
+    BASIL = {"common_name": "Basil", "scientific_name": "Ocimum basilicum",
+             "light": "Full sun", "watering": "Moderate", "ideal_temp": "Min: 10°C, Max: 30°C"}
+
+    def test_compact_lines_with_counts(self):
+        """Test that duplicates fold into a count and placeholders are dropped"""
+        fern = {"common_name": "Fern", "light": '["part shade", "full shade"]',
+                "watering": "Unknown", "ideal_temp": "Varies by species - check local climate compatibility"}
+
+        prompt, stats = ai_service.build_collection_prompt("Herbs", [self.BASIL, self.BASIL, fern])
+
+        assert "Basil (Ocimum basilicum) | Full sun | Moderate | Min: 10°C, Max: 30°C x2" in prompt
+        assert "Fern | part shade, full shade | - | -" in prompt
+        assert stats["plants_included"] == 3
+        assert stats["plants_omitted"] == 0
+        assert stats["characters"] == len(prompt)
+        assert stats["estimated_tokens"] == ai_service.estimate_tokens(prompt)
+
+    def test_budget_limits_plants(self):
+        """Test that plants beyond the token budget are summarized"""
+        plants = [dict(self.BASIL, common_name=f"Basil {i}") for i in range(50)]
+
+        prompt, stats = ai_service.build_collection_prompt("Herbs", plants, token_budget=200)
+
+        assert stats["estimated_tokens"] <= 200 + 10
+        assert stats["plants_omitted"] > 0
+        assert stats["plants_included"] + stats["plants_omitted"] == 50
+        assert prompt.endswith(f"...and {stats['plants_omitted']} more plants not listed.")
+
+    def test_long_notes_truncated(self):
+        """Test that the user's notes cannot take the whole budget"""
+        prompt, _ = ai_service.build_collection_prompt(
+            "Herbs", [self.BASIL], user_input="sunny " * 500, token_budget=150)
+
+        assert "Basil" in prompt
+        assert ai_service.estimate_tokens(prompt) <= 150
+
+    @patch('ai_service.generate_garden_plan')
+    def test_plan_reports_prompt_size(self, mock_generate):
+        """Test that the plan response carries the prompt stats"""
+        mock_generate.return_value = ({"status": "success", "plan": "Plant basil"}, 200)
+
+        result, status = ai_service.generate_collection_plan("Herbs", [self.BASIL])
+
+        assert status == 200
+        assert result["prompt"]["plants_included"] == 1
+        assert mock_generate.call_args[0][0].startswith("Plan a garden using the plants from my collection 'Herbs'.")
+
+    def test_empty_collection(self):
+        """Test that a collection without plants is rejected"""
+        result, status = ai_service.generate_collection_plan("Herbs", [])
+
+        assert status == 400
@@ -0,0 +1,100 @@
+"""
+Unit tests for app.py
+
+Tests that the application factory registers only the configured
+blueprints.
+"""
+
+from unittest.mock import patch
+import sys
+import os
+
+# Add backend directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from bulkhead_service import BulkheadFull
+from circuit_breaker import CircuitOpen
+
+
+def _rules(app):
+    return {rule.rule for rule in app.url_map.iter_rules()}
+
+
+class TestCreateApp:
+    """Test config-driven blueprint registration"""
+
+    def test_all_blueprints_by_default(self):
+        """Test that every known blueprint is registered by default"""
+        app = create_app()
+
+        assert app.config['LOADED_BLUEPRINTS'] == [
+            'auth', 'collections', 'plants', 'ai', 'forum', 'profile',
+            'metrics']
+        assert '/api/v1/forum/posts' in _rules(app)
+        assert '/api/v1/plants' in _rules(app)
+
+    def test_only_configured_blueprints(self):
+        """Test that a blueprint subset leaves the other routes out"""
+        app = create_app({"BLUEPRINTS": ["forum"]})
+
+        rules = _rules(app)
+        assert '/api/v1/forum/posts' in rules
+        assert '/api/v1/plants' not in rules
+        assert app.config['LOADED_BLUEPRINTS'] == ['forum']
+
+    def test_unknown_blueprint_skipped(self):
+        """Test that an unknown name is reported rather than fatal"""
+        app = create_app({"BLUEPRINTS": ["forum", "garden"]})
+
+        assert app.config['LOADED_BLUEPRINTS'] == ['forum']
+
+    def test_failed_import_skipped(self):
+        """Test that a blueprint whose module fails to import is skipped"""
+        with patch('app.importlib.import_module',
+                   side_effect=ImportError("missing dependency")):
+            app = create_app({"BLUEPRINTS": ["ai"]})
+
+        assert app.config['LOADED_BLUEPRINTS'] == []
+
+    def test_api_prefix_from_config(self):
+        """Test that the URL prefix comes from the config"""
+        app = create_app({"BLUEPRINTS": ["forum"], "API_PREFIX": "/api/v2"})
+
+        assert '/api/v2/forum/posts' in _rules(app)
+
+    def test_index_route(self):
+        """Test the root health check"""
+        response = create_app({"BLUEPRINTS": []}).test_client().get('/')
+
+        assert response.status_code == 200
+        assert response.get_json()["status"] == "ok"
+
+
+class TestUpstreamBusy:
+    """Test the 503 answer for a full upstream bulkhead"""
+
+    @patch('api.plants.fetch_plant_by_type')
+    def test_bulkhead_full_returns_503(self, mock_fetch):
+        """Test that a rejected upstream call becomes 503 with Retry-After"""
+        mock_fetch.side_effect = BulkheadFull('perenual', retry_after=3)
+        client = create_app({"BLUEPRINTS": ["plants"]}).test_client()
+
+        response = client.get('/api/v1/plants?name=Oak&type=other')
+
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '3'
+        assert response.get_json()["code"] == "upstream_busy"
+        assert response.get_json()["upstream"] == "perenual"
+
+    @patch('api.plants.fetch_plant_by_type')
+    def test_open_circuit_returns_503(self, mock_fetch):
+        """Test that a skipped provider is reported as unavailable"""
+        mock_fetch.side_effect = CircuitOpen('perenual', retry_after=42)
+        client = create_app({"BLUEPRINTS": ["plants"]}).test_client()
+
+        response = client.get('/api/v1/plants?name=Oak&type=other')
+
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '42'
+        assert response.get_json()["code"] == "upstream_unavailable"
@@ -0,0 +1,158 @@
+"""
+Unit tests for the token verification helpers in auth_service.py
+
+Tests the cached ES256 public key and the verified-token LRU used by
+token_required. Uses a throwaway EC key pair instead of Supabase's.
+"""
+
+import pytest
+from unittest.mock import patch
+import sys
+import os
+import base64
+import time
+
+# Add backend directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ec
+from flask import Flask, jsonify, request
+
+import auth_service
+from api.collections import token_required
+
+
+def _b64url(number):
+    return base64.urlsafe_b64encode(number.to_bytes(32, "big")).decode().rstrip("=")
+
+
+@pytest.fixture
+def signing_key(monkeypatch):
+    """Generates an EC key pair and exposes its public half via env vars"""
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    numbers = private_key.public_key().public_numbers()
+    monkeypatch.setenv("SUPABASE_JWT_X", _b64url(numbers.x))
+    monkeypatch.setenv("SUPABASE_JWT_Y", _b64url(numbers.y))
+
+    auth_service.reset_jwt_verification_cache()
+    yield private_key
+    auth_service.reset_jwt_verification_cache()
+
+
+def _make_token(private_key, expires_in=3600, **claims):
+    payload = {
+        "sub": "user-123",
+        "aud": "authenticated",
+        "exp": int(time.time()) + expires_in,
+        **claims,
+    }
+    return jwt.encode(payload, private_key, algorithm="ES256")
+
+
+class TestJwtPublicKey:
+    """Test that the public key is built once per process"""
+
+    def test_key_is_built_once(self, signing_key):
+        """Test that repeated calls reuse the same key object"""
+        with patch('auth_service.ec.EllipticCurvePublicNumbers',
+                   wraps=ec.EllipticCurvePublicNumbers) as mock_numbers:
+            first = auth_service.get_jwt_public_key()
+            second = auth_service.get_jwt_public_key()
+
+        assert first is second
+        assert mock_numbers.call_count == 1
+
+
+class TestVerifyAccessToken:
+    """Test token verification and the verified-token cache"""
+
+    def test_valid_token_returns_claims(self, signing_key):
+        """Test that a correctly signed token is accepted"""
+        claims = auth_service.verify_access_token(_make_token(signing_key))
+
+        assert claims["sub"] == "user-123"
+
+    def test_repeat_verification_served_from_cache(self, signing_key):
+        """Test that the signature is only checked once per token"""
+        token = _make_token(signing_key)
+
+        with patch('auth_service.jwt.decode', wraps=jwt.decode) as mock_decode:
+            auth_service.verify_access_token(token)
+            auth_service.verify_access_token(token)
+
+        assert mock_decode.call_count == 1
+        assert auth_service.VERIFIED_TOKEN_CACHE.stats()["hits"] == 1
+
+    def test_cache_keyed_by_token_hash(self, signing_key):
+        """Test that raw tokens are never used as cache keys"""
+        token = _make_token(signing_key)
+        auth_service.verify_access_token(token)
+
+        assert token not in auth_service.VERIFIED_TOKEN_CACHE
+
+    def test_cached_claims_dropped_after_exp(self, signing_key):
+        """Test that a cached token is re-verified once it has expired"""
+        token = _make_token(signing_key, expires_in=60)
+        auth_service.verify_access_token(token)
+
+        later = time.time() + 120
+        with patch('auth_service.time.time', return_value=later), \
+                patch('auth_service.jwt.decode',
+                      side_effect=jwt.ExpiredSignatureError) as mock_decode:
+            with pytest.raises(jwt.ExpiredSignatureError):
+                auth_service.verify_access_token(token)
+
+        mock_decode.assert_called_once()
+
+    def test_wrong_key_rejected(self, signing_key):
+        """Test that a token signed by another key is rejected"""
+        other_key = ec.generate_private_key(ec.SECP256R1())
+
+        with pytest.raises(jwt.InvalidSignatureError):
+            auth_service.verify_access_token(_make_token(other_key))
+
+    def test_wrong_audience_rejected(self, signing_key):
+        """Test that tokens for another audience are rejected"""
+        token = _make_token(signing_key, aud="anon")
+
+        with pytest.raises(jwt.InvalidAudienceError):
+            auth_service.verify_access_token(token)
+
+
+class TestTokenRequiredDecorator:
+    """Test the token_required decorator used by protected routes"""
+
+    @pytest.fixture
+    def client(self):
+        app = Flask(__name__)
+
+        @app.route('/protected')
+        @token_required
+        def protected():
+            return jsonify({"user_id": request.user_id})
+
+        return app.test_client()
+
+    def test_valid_token_sets_user_id(self, client, signing_key):
+        """Test that the user ID from 'sub' reaches the route"""
+        token = _make_token(signing_key)
+
+        response = client.get('/protected',
+                              headers={"Authorization": f"Bearer {token}"})
+
+        assert response.status_code == 200
+        assert response.get_json()["user_id"] == "user-123"
+
+    def test_expired_token_returns_401(self, client, signing_key):
+        """Test that an expired token is rejected with 401"""
+        token = _make_token(signing_key, expires_in=-10)
+
+        response = client.get('/protected',
+                              headers={"Authorization": f"Bearer {token}"})
+
+        assert response.status_code == 401
+
+    def test_missing_header_returns_401(self, client):
+        """Test that requests without a bearer token are rejected"""
+        assert client.get('/protected').status_code == 401
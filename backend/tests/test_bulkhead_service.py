@@ -0,0 +1,151 @@
+"""
+Unit tests for bulkhead_service.py
+
+Tests the per-upstream concurrency limits: fail-fast rejection, the AIMD
+limit and host mapping.
+"""
+
+import pytest
+from unittest.mock import patch
+import sys
+import os
+
+# Add backend directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import bulkhead_service
+from bulkhead_service import Bulkhead, BulkheadFull
+
+
+class TestBulkheadLimits:
+    """Test slot accounting and fail-fast rejection"""
+
+    def test_rejects_when_full(self):
+        """Test that a call over the limit fails immediately"""
+        bulkhead = Bulkhead('perenual', max_limit=2, target_latency_ms=1000)
+        bulkhead.acquire()
+        bulkhead.acquire()
+
+        with pytest.raises(BulkheadFull) as excinfo:
+            bulkhead.acquire()
+
+        assert excinfo.value.name == 'perenual'
+        assert excinfo.value.retry_after >= 1
+        stats = bulkhead.stats()
+        assert stats["in_flight"] == 2
+        assert stats["accepted"] == 2
+        assert stats["rejected"] == 1
+
+    def test_release_frees_slot(self):
+        """Test that a released slot can be taken again"""
+        bulkhead = Bulkhead('perenual', max_limit=1, target_latency_ms=1000)
+        bulkhead.acquire()
+        bulkhead.release(0.05)
+
+        bulkhead.acquire()
+
+        assert bulkhead.stats()["in_flight"] == 1
+
+    def test_retry_after_follows_latency(self):
+        """Test that Retry-After tracks recent latency within bounds"""
+        bulkhead = Bulkhead('gemini', max_limit=1, target_latency_ms=60000)
+        bulkhead.acquire()
+        bulkhead.release(4.2)
+        bulkhead.acquire()
+
+        with pytest.raises(BulkheadFull) as excinfo:
+            bulkhead.acquire()
+
+        assert excinfo.value.retry_after == 5
+
+
+class TestAdaptiveLimit:
+    """Test the additive-increase, multiplicative-decrease limit"""
+
+    def test_slow_call_halves_limit(self):
+        """Test that a call over the latency target cuts the limit"""
+        bulkhead = Bulkhead('rapidapi', max_limit=8, target_latency_ms=100)
+        bulkhead.acquire()
+        bulkhead.release(0.5)
+
+        assert bulkhead.stats()["limit"] == 4
+        assert bulkhead.stats()["decreases"] == 1
+
+    def test_one_cut_per_window(self):
+        """Test that a burst of failures cuts the limit only once"""
+        bulkhead = Bulkhead('rapidapi', max_limit=8, target_latency_ms=1000)
+        for _ in range(3):
+            bulkhead.acquire()
+        for _ in range(3):
+            bulkhead.release(0.01, overloaded=True)
+
+        stats = bulkhead.stats()
+        assert stats["limit"] == 4
+        assert stats["overloaded"] == 3
+
+    def test_limit_never_below_minimum(self):
+        """Test that repeated cuts stop at the minimum"""
+        bulkhead = Bulkhead('rapidapi', max_limit=8, target_latency_ms=0,
+                            min_limit=2)
+        for _ in range(5):
+            bulkhead.acquire()
+            bulkhead.release(0.01, overloaded=True)
+
+        assert bulkhead.stats()["limit"] == 2
+
+    def test_fast_calls_grow_limit_back(self):
+        """Test that calls under the target raise the limit up to the max"""
+        bulkhead = Bulkhead('rapidapi', max_limit=4, target_latency_ms=1000)
+        bulkhead.limit = 2.0
+
+        for _ in range(20):
+            bulkhead.acquire()
+            bulkhead.release(0.01)
+
+        stats = bulkhead.stats()
+        assert stats["limit"] == 4
+        assert stats["increases"] > 0
+
+    def test_reduced_limit_rejects_sooner(self):
+        """Test that a cut limit admits fewer concurrent calls"""
+        bulkhead = Bulkhead('rapidapi', max_limit=4, target_latency_ms=1000)
+        bulkhead.limit = 1.5
+        bulkhead.acquire()
+
+        with pytest.raises(BulkheadFull):
+            bulkhead.acquire()
+
+
+class TestUpstreamMapping:
+    """Test which bulkhead guards an outbound host"""
+
+    def test_known_hosts(self):
+        """Test that each upstream host maps to its bulkhead"""
+        bulkheads = bulkhead_service.BULKHEADS
+
+        assert bulkhead_service.bulkhead_for_host(
+            'generativelanguage.googleapis.com') is bulkheads['gemini']
+        assert bulkhead_service.bulkhead_for_host(
+            'perenual.com') is bulkheads['perenual']
+        assert bulkhead_service.bulkhead_for_host(
+            'house-plants2.p.rapidapi.com') is bulkheads['rapidapi']
+
+    def test_unknown_host(self):
+        """Test that other hosts are not limited"""
+        assert bulkhead_service.bulkhead_for_host('example.com') is None
+        assert bulkhead_service.bulkhead_for_host('notperenual.com') is None
+
+    def test_supabase_host_from_url(self):
+        """Test that the Supabase project host maps to its bulkhead"""
+        with patch.dict(bulkhead_service.UPSTREAM_HOSTS,
+                        {'supabase': ['abc.supabase.co']}):
+            bulkhead = bulkhead_service.bulkhead_for_host('abc.supabase.co')
+
+        assert bulkhead is bulkhead_service.BULKHEADS['supabase']
+
+    def test_stats_cover_every_upstream(self):
+        """Test that stats report every configured bulkhead"""
+        stats = bulkhead_service.get_bulkhead_stats()
+
+        assert set(stats) == {'gemini', 'rapidapi', 'perenual', 'supabase'}
+        assert stats['gemini']["max_limit"] == bulkhead_service.BULKHEADS['gemini'].max_limit
@@ -0,0 +1,304 @@
+"""
+Unit tests for cache_service.py
+
+Tests the bounded TTL + LRU cache used by the service layer.
+"""
+
+import pytest
+from unittest.mock import patch
+import sys
+import os
+import threading
+
+# Add backend directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cache_service
+from cache_service import (
+    SingleFlight, SingleFlightTimeout, SQLiteTTLStore, TTLCache
+)
+
+
+class TestTTLCacheBasics:
+    """Test get/set behaviour and hit/miss counters"""
+
+    def test_get_missing_key_counts_miss(self):
+        """Test that a missing key returns the default and counts a miss"""
+        cache = TTLCache(max_entries=2, ttl_seconds=60)
+
+        assert cache.get("missing") is None
+        assert cache.get("missing", "fallback") == "fallback"
+        assert cache.stats()["misses"] == 2
+
+    def test_set_then_get_counts_hit(self):
+        """Test that a stored value is returned and counted as a hit"""
+        cache = TTLCache(max_entries=2, ttl_seconds=60)
+        cache.set("fern", {"common_name": "Fern"})
+
+        assert cache.get("fern") == {"common_name": "Fern"}
+        assert cache.stats()["hits"] == 1
+
+    def test_invalidate_removes_entry(self):
+        """Test that invalidate drops a single key"""
+        cache = TTLCache(max_entries=2, ttl_seconds=60)
+        cache.set("fern", 1)
+        cache.invalidate("fern")
+
+        assert "fern" not in cache
+        assert len(cache) == 0
+
+
+class TestTTLCacheExpiry:
+    """Test time-based expiry"""
+
+    def test_entry_expires_after_ttl(self):
+        """Test that entries are treated as misses once their TTL passes"""
+        cache = TTLCache(max_entries=2, ttl_seconds=10)
+
+        with patch('cache_service.time.monotonic', return_value=100.0):
+            cache.set("fern", 1)
+
+        with patch('cache_service.time.monotonic', return_value=105.0):
+            assert cache.get("fern") == 1
+
+        with patch('cache_service.time.monotonic', return_value=111.0):
+            assert cache.get("fern") is None
+
+        stats = cache.stats()
+        assert stats["expirations"] == 1
+        assert stats["entries"] == 0
+
+    def test_stale_entries_kept_for_stale_reads(self):
+        """Test that expired entries stay readable through get_stale"""
+        cache = TTLCache(max_entries=2, ttl_seconds=10, stale_seconds=60)
+
+        with patch('cache_service.time.monotonic', return_value=100.0):
+            cache.set("fern", 1)
+
+        with patch('cache_service.time.monotonic', return_value=120.0):
+            assert cache.get("fern") is None
+            assert "fern" not in cache
+            assert cache.get_stale("fern") == 1
+
+        with patch('cache_service.time.monotonic', return_value=171.0):
+            assert cache.get_stale("fern") is None
+
+        stats = cache.stats()
+        assert stats["stale_hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["expirations"] == 1
+        assert stats["entries"] == 0
+
+    def test_get_stale_returns_fresh_entries(self):
+        """Test that get_stale counts a fresh entry as a normal hit"""
+        cache = TTLCache(max_entries=2, ttl_seconds=10, stale_seconds=60)
+        cache.set("fern", 1)
+
+        assert cache.get_stale("fern") == 1
+        assert cache.get_stale("moss", "default") == "default"
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["stale_hits"] == 0
+
+    def test_per_entry_ttl_override(self):
+        """Test that set() accepts a TTL that overrides the default"""
+        cache = TTLCache(max_entries=2, ttl_seconds=1000)
+
+        with patch('cache_service.time.monotonic', return_value=0.0):
+            cache.set("short", 1, ttl_seconds=5)
+
+        with patch('cache_service.time.monotonic', return_value=6.0):
+            assert cache.get("short") is None
+
+
+class TestTTLCacheEviction:
+    """Test LRU eviction by entry count and by size"""
+
+    def test_evicts_least_recently_used(self):
+        """Test that the least recently used key is evicted first"""
+        cache = TTLCache(max_entries=2, ttl_seconds=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")  # 'b' is now the least recently used
+        cache.set("c", 3)
+
+        assert "a" in cache
+        assert "b" not in cache
+        assert "c" in cache
+        assert cache.stats()["evictions"] == 1
+
+    def test_evicts_when_over_byte_budget(self):
+        """Test that the memory cap evicts old entries"""
+        cache = TTLCache(max_entries=100, ttl_seconds=60, max_bytes=20)
+        cache.set("a", "x" * 10)
+        cache.set("b", "y" * 10)
+
+        assert "a" not in cache
+        assert "b" in cache
+        assert cache.stats()["bytes"] <= 20
+
+    def test_oversized_value_not_cached(self):
+        """Test that a value larger than the whole budget is skipped"""
+        cache = TTLCache(max_entries=100, ttl_seconds=60, max_bytes=5)
+        cache.set("big", "z" * 50)
+
+        assert "big" not in cache
+
+    def test_clear_resets_counters(self):
+        """Test that clear empties the cache and resets stats"""
+        cache = TTLCache(max_entries=1, ttl_seconds=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("b")
+        cache.clear()
+
+        stats = cache.stats()
+        assert stats["entries"] == 0
+        assert stats["hits"] == 0
+        assert stats["evictions"] == 0
+        assert stats["bytes"] == 0
+
+
+def test_estimate_size_handles_unserializable_values():
+    """Test that size estimation falls back to repr for odd values"""
+    assert cache_service.estimate_size({1, 2, 3}) > 0
+
+
+class TestSingleFlight:
+    """Test coalescing of concurrent calls that share a key"""
+
+    def _run_concurrently(self, flight, key, func, callers):
+        """Starts `callers` threads on flight.do and returns their outcomes"""
+        outcomes = []
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                value = flight.do(key, func)
+            except Exception as e:
+                value = e
+            with lock:
+                outcomes.append(value)
+
+        threads = [threading.Thread(target=worker) for _ in range(callers)]
+        for thread in threads:
+            thread.start()
+        return threads, outcomes
+
+    def test_concurrent_callers_share_one_execution(self):
+        """Test that waiters receive the leader's result"""
+        flight = SingleFlight(wait_timeout_seconds=5)
+        release = threading.Event()
+        calls = []
+
+        def slow_fetch():
+            calls.append(1)
+            release.wait(5)
+            return {"common_name": "Monstera"}
+
+        threads, outcomes = self._run_concurrently(
+            flight, "monstera", slow_fetch, 5)
+
+        # Wait until every waiter has joined the in-flight call
+        for _ in range(500):
+            if flight.stats()["collapsed"] == 4:
+                break
+            threading.Event().wait(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert outcomes == [{"common_name": "Monstera"}] * 5
+        stats = flight.stats()
+        assert stats["executions"] == 1
+        assert stats["collapsed"] == 4
+        assert stats["in_flight"] == 0
+
+    def test_error_is_shared_with_waiters(self):
+        """Test that the leader's exception is re-raised by every waiter"""
+        flight = SingleFlight(wait_timeout_seconds=5)
+        release = threading.Event()
+
+        def failing_fetch():
+            release.wait(5)
+            raise ValueError("upstream broke")
+
+        threads, outcomes = self._run_concurrently(
+            flight, "key", failing_fetch, 3)
+        for _ in range(500):
+            if flight.stats()["collapsed"] == 2:
+                break
+            threading.Event().wait(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(outcomes) == 3
+        assert all(isinstance(o, ValueError) for o in outcomes)
+        assert flight.stats()["errors"] == 1
+
+    def test_waiter_times_out(self):
+        """Test that a waiter gives up after the wait timeout"""
+        flight = SingleFlight(wait_timeout_seconds=0.05)
+        release = threading.Event()
+        started = threading.Event()
+
+        def hung_fetch():
+            started.set()
+            release.wait(5)
+            return "late"
+
+        leader = threading.Thread(target=flight.do, args=("k", hung_fetch))
+        leader.start()
+        started.wait(5)
+
+        with pytest.raises(SingleFlightTimeout):
+            flight.do("k", hung_fetch)
+
+        release.set()
+        leader.join()
+        assert flight.stats()["timeouts"] == 1
+
+    def test_sequential_calls_run_again(self):
+        """Test that a finished call does not answer later callers"""
+        flight = SingleFlight()
+        results = iter([1, 2])
+
+        assert flight.do("k", lambda: next(results)) == 1
+        assert flight.do("k", lambda: next(results)) == 2
+        assert flight.stats()["collapsed"] == 0
+
+
+class TestSQLiteTTLStore:
+    """Test the persistent SQLite-backed key/value store"""
+
+    def test_round_trip_json_values(self, tmp_path):
+        """Test that JSON values survive a write and read"""
+        store = SQLiteTTLStore(str(tmp_path / "kv.sqlite3"), ttl_seconds=60)
+        store.set("plan", {"text": "Plant basil", "tags": [1, 2]})
+
+        assert store.get("plan") == {"text": "Plant basil", "tags": [1, 2]}
+
+    def test_values_persist_across_instances(self, tmp_path):
+        """Test that a new store on the same file sees earlier writes"""
+        path = str(tmp_path / "nested" / "kv.sqlite3")
+        SQLiteTTLStore(path, table='ids').set("oak", 5)
+
+        assert SQLiteTTLStore(path, table='ids').get("oak") == 5
+
+    def test_delete_and_expiry(self, tmp_path):
+        """Test that deleted and expired keys read as missing"""
+        store = SQLiteTTLStore(str(tmp_path / "kv.sqlite3"), ttl_seconds=60)
+        store.set("a", 1)
+        store.set("b", 2, ttl_seconds=-1)
+        store.delete("a")
+
+        assert store.get("a") is None
+        assert store.get("b", "gone") == "gone"
+
+    def test_storage_errors_read_as_miss(self, tmp_path):
+        """Test that an unusable database file does not raise"""
+        store = SQLiteTTLStore(str(tmp_path), ttl_seconds=60)  # a directory
+
+        store.set("a", 1)
+        assert store.get("a") is None
@@ -0,0 +1,126 @@
+"""
+Unit tests for circuit_breaker.py
+
+Tests the closed/open/half-open transitions of the upstream circuit
+breaker.
+"""
+
+import pytest
+from unittest.mock import patch
+import sys
+import os
+
+# Add backend directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from circuit_breaker import CircuitBreaker, CircuitOpen
+
+
+def _open_breaker(now=100.0):
+    breaker = CircuitBreaker('perenual', failure_threshold=2, reset_timeout_seconds=30)
+    with patch('circuit_breaker.time.monotonic', return_value=now):
+        breaker.record_failure("HTML")
+        breaker.record_failure("HTML")
+    return breaker
+
+
+class TestClosedCircuit:
+    """Test counting failures while closed"""
+
+    def test_opens_after_threshold(self):
+        """Test that consecutive failures open the circuit"""
+        breaker = _open_breaker()
+
+        stats = breaker.stats()
+        assert stats["state"] == "open"
+        assert stats["opened"] == 1
+        assert stats["last_failure"] == "HTML"
+
+    def test_success_resets_failure_count(self):
+        """Test that only failures in a row count"""
+        breaker = CircuitBreaker('perenual', failure_threshold=2)
+        breaker.record_failure("timeout")
+        breaker.record_success()
+        breaker.record_failure("timeout")
+
+        assert breaker.state == "closed"
+        breaker.check()
+
+
+class TestOpenCircuit:
+    """Test rejection and recovery"""
+
+    def test_rejects_until_reset_timeout(self):
+        """Test that calls fail fast with the remaining wait as Retry-After"""
+        breaker = _open_breaker(now=100.0)
+
+        with patch('circuit_breaker.time.monotonic', return_value=110.0):
+            with pytest.raises(CircuitOpen) as excinfo:
+                breaker.check()
+
+        assert excinfo.value.name == 'perenual'
+        assert excinfo.value.retry_after == 20
+        assert excinfo.value.code == 'upstream_unavailable'
+        assert breaker.stats()["rejected"] == 1
+
+    def test_half_open_allows_one_trial(self):
+        """Test that one trial call is let through after the timeout"""
+        breaker = _open_breaker(now=100.0)
+
+        with patch('circuit_breaker.time.monotonic', return_value=131.0):
+            breaker.check()
+            assert breaker.state == "half_open"
+            with pytest.raises(CircuitOpen):
+                breaker.check()
+
+    def test_trial_success_closes(self):
+        """Test that a successful trial closes the circuit"""
+        breaker = _open_breaker(now=100.0)
+
+        with patch('circuit_breaker.time.monotonic', return_value=131.0):
+            breaker.check()
+            breaker.record_success()
+            breaker.check()
+
+        assert breaker.state == "closed"
+
+    def test_trial_failure_reopens(self):
+        """Test that a failed trial opens the circuit for another timeout"""
+        breaker = _open_breaker(now=100.0)
+
+        with patch('circuit_breaker.time.monotonic', return_value=131.0):
+            breaker.check()
+            breaker.record_failure("HTTP 503")
+
+        with patch('circuit_breaker.time.monotonic', return_value=150.0):
+            with pytest.raises(CircuitOpen):
+                breaker.check()
+        assert breaker.stats()["opened"] == 2
+
+    def test_abandoned_trial_is_replaced(self):
+        """Test that a trial that never reports does not block forever"""
+        breaker = _open_breaker(now=100.0)
+
+        with patch('circuit_breaker.time.monotonic', return_value=131.0):
+            breaker.check()
+        with patch('circuit_breaker.time.monotonic', return_value=162.0):
+            breaker.check()
+
+        assert breaker.state == "half_open"
+
+    def test_released_trial_lets_next_call_try(self):
+        """Test that a trial ending without a verdict frees the slot at once"""
+        breaker = _open_breaker(now=100.0)
+
+        with patch('circuit_breaker.time.monotonic', return_value=131.0):
+            assert breaker.check() is True
+            breaker.release_trial()
+            assert breaker.check() is True
+
+        assert breaker.state == "half_open"
+
+    def test_closed_check_is_not_a_trial(self):
+        """Test that calls through a closed circuit hold no trial"""
+        breaker = CircuitBreaker('perenual')
+
+        assert breaker.check() is False
@@ -0,0 +1,100 @@
+"""
+Unit tests for api/collections.py routes
+
+Tests request handling for the collection endpoints with the database
+service and token verification mocked out.
+"""
+
+import pytest
+from unittest.mock import patch
+import sys
+import os
+
+# Add backend directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+
+from api.collections import collections_bp
+
+
+AUTH = {"Authorization": "Bearer test-token"}
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(collections_bp, url_prefix='/api/v1')
+    with patch('api.collections.auth_service.verify_access_token',
+               return_value={"sub": "user-123"}):
+        yield app.test_client()
+
+
+class TestCollectionSummaryRoute:
+    """Test GET /collections/summary and its conditional GET support"""
+
+    SUMMARY = {"status": "success", "data": [
+        {"id": 1, "collection_name": "Herbs", "plant_count": 3,
+         "last_modified": "2025-05-01T00:00:00Z"},
+    ]}
+
+    @patch('api.collections.db_service.get_collection_summaries')
+    def test_summary_returns_etag(self, mock_summaries, client):
+        """Test that the summary is returned with an ETag"""
+        mock_summaries.return_value = self.SUMMARY
+
+        response = client.get('/api/v1/collections/summary', headers=AUTH)
+
+        assert response.status_code == 200
+        assert response.get_json()[0]["collection_name"] == "Herbs"
+        assert response.headers.get('ETag')
+        mock_summaries.assert_called_once_with("user-123")
+
+    @patch('api.collections.db_service.get_collection_summaries')
+    def test_matching_etag_returns_304(self, mock_summaries, client):
+        """Test that revalidating with the same ETag returns 304"""
+        mock_summaries.return_value = self.SUMMARY
+
+        first = client.get('/api/v1/collections/summary', headers=AUTH)
+        second = client.get('/api/v1/collections/summary', headers={
+            **AUTH, "If-None-Match": first.headers['ETag']})
+
+        assert second.status_code == 304
+        assert second.data == b''
+
+    @patch('api.collections.db_service.get_collection_summaries')
+    def test_changed_summary_returns_200(self, mock_summaries, client):
+        """Test that a stale ETag gets the new summary"""
+        mock_summaries.return_value = self.SUMMARY
+        first = client.get('/api/v1/collections/summary', headers=AUTH)
+
+        mock_summaries.return_value = {"status": "success", "data": []}
+        second = client.get('/api/v1/collections/summary', headers={
+            **AUTH, "If-None-Match": first.headers['ETag']})
+
+        assert second.status_code == 200
+        assert second.get_json() == []
+
+
+class TestGetCollectionsRoute:
+    """Test GET /collections field projection handling"""
+
+    @patch('api.collections.db_service.get_user_collections')
+    def test_fields_param_passed_through(self, mock_get, client):
+        """Test that ?fields= is split and forwarded"""
+        mock_get.return_value = {"status": "success", "data": {}}
+
+        client.get('/api/v1/collections?fields=id, common_name', headers=AUTH)
+
+        mock_get.assert_called_once_with("user-123",
+                                         fields=["id", "common_name"])
+
+    @patch('api.collections.db_service.get_user_collections')
+    def test_invalid_fields_return_400(self, mock_get, client):
+        """Test that unknown projection fields are a client error"""
+        mock_get.return_value = {"status": "error", "code": "invalid_fields",
+                                 "message": "Unknown plant fields: x"}
+
+        response = client.get('/api/v1/collections?fields=x', headers=AUTH)
+
+        assert response.status_code == 400
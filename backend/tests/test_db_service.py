@@ -6,7 +6,7 @@ Uses mocking to avoid requiring actual Supabase connection.
 """
 
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import Mock, patch
 import sys
 import os
 
@@ -14,6 +14,38 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import db_service
+from bulkhead_service import Bulkhead, BulkheadFull
+
+
+@pytest.fixture(autouse=True)
+def clear_collection_id_cache():
+    """Start every test with an empty collection ID cache"""
+    db_service.COLLECTION_ID_CACHE.clear()
+    yield
+    db_service.COLLECTION_ID_CACHE.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_author_cache():
+    """Start every test with an empty forum author cache"""
+    db_service.AUTHOR_CACHE.clear()
+    yield
+    db_service.AUTHOR_CACHE.clear()
+
+
+def _route_tables(mock_supabase, **tables):
+    """Makes supabase.table(name) return the given mock per table"""
+    mock_supabase.table.side_effect = lambda name: tables[name]
+
+
+def _profiles_table(*rows):
+    """A profiles table mock answering the bulk author lookup"""
+    mock_profiles = Mock()
+    mock_response = Mock()
+    mock_response.data = list(rows)
+    mock_response.error = None
+    mock_profiles.select.return_value.in_.return_value.execute.return_value = mock_response
+    return mock_profiles
 
 
 class TestDatabaseServiceImport:
@@ -65,6 +97,7 @@ class TestCreateEmptyCollection:
 class TestSavePlantToCollection:
     """Test saving plants to collections"""
 
+    @patch('db_service._save_plant_rpc_available', False)
     @patch('db_service.supabase')
     def test_save_plant_to_existing_collection(self, mock_supabase):
         """Test saving a plant to an existing collection"""
@@ -91,6 +124,7 @@ class TestSavePlantToCollection:
 
         assert result["status"] == "success"
 
+    @patch('db_service._save_plant_rpc_available', False)
     @patch('db_service.create_empty_collection')
     @patch('db_service.supabase')
     def test_save_plant_creates_collection_if_not_exists(self, mock_supabase, mock_create):
@@ -118,6 +152,123 @@ class TestSavePlantToCollection:
 
         # Verify collection creation was called
         mock_create.assert_called_once_with("user-123", "New Garden")
+        assert result["status"] == "success"
+
+
+class TestSinglePlantSave:
+    """Test the single-round-trip save path and collection ID cache"""
+
+    def _response(self, data):
+        response = Mock()
+        response.data = data
+        response.error = None
+        return response
+
+    @patch('db_service._save_plant_rpc_available', True)
+    @patch('db_service.supabase')
+    def test_save_uses_rpc_for_unknown_collection(self, mock_supabase):
+        """Test that an uncached collection is saved with one RPC call"""
+        mock_supabase.rpc.return_value.execute.return_value = self._response(
+            [{"id": 10, "collection_id": 3, "common_name": "Fern"}])
+
+        result = db_service.save_plant_to_collection(
+            "user-123", {"common_name": "Fern"}, "Herbs")
+
+        assert result["status"] == "success"
+        rpc_name, params = mock_supabase.rpc.call_args[0]
+        assert rpc_name == "save_plant_to_collection"
+        assert params["p_collection_name"] == "Herbs"
+        assert params["p_plant_details"] == {"common_name": "Fern"}
+        mock_supabase.table.assert_not_called()
+        assert db_service.COLLECTION_ID_CACHE.get(("user-123", "Herbs")) == 3
+
+    @patch('db_service._save_plant_rpc_available', False)
+    @patch('db_service.supabase')
+    def test_cached_collection_inserts_directly(self, mock_supabase):
+        """Test that without the RPC a cached collection ID skips the lookup"""
+        db_service.COLLECTION_ID_CACHE.set(("user-123", "Herbs"), 3)
+        mock_table = Mock()
+        mock_supabase.table.return_value = mock_table
+        mock_table.insert.return_value.execute.return_value = self._response(
+            [{"id": 11}])
+
+        result = db_service.save_plant_to_collection(
+            "user-123", {"common_name": "Basil"}, "Herbs")
+
+        assert result["status"] == "success"
+        mock_supabase.rpc.assert_not_called()
+        inserted = mock_table.insert.call_args[0][0]
+        assert inserted["collection_id"] == 3
+        assert inserted["common_name"] == "Basil"
+
+    @patch('db_service._save_plant_rpc_available', True)
+    @patch('db_service.supabase')
+    def test_rpc_preferred_over_cached_id(self, mock_supabase):
+        """Test that a cached ID is not trusted while the RPC can resolve the name"""
+        db_service.COLLECTION_ID_CACHE.set(("user-123", "Herbs"), 3)
+        mock_supabase.rpc.return_value.execute.return_value = self._response(
+            [{"id": 13, "collection_id": 5, "common_name": "Sage"}])
+
+        result = db_service.save_plant_to_collection(
+            "user-123", {"common_name": "Sage"}, "Herbs")
+
+        assert result["data"][0]["collection_id"] == 5
+        mock_supabase.table.assert_not_called()
+        assert db_service.COLLECTION_ID_CACHE.get(("user-123", "Herbs")) == 5
+
+    @patch('db_service._save_plant_rpc_available', False)
+    @patch('db_service.supabase')
+    def test_deleted_cached_collection_evicted(self, mock_supabase):
+        """Test that a foreign key error drops the cached ID and looks it up again"""
+        db_service.COLLECTION_ID_CACHE.set(("user-123", "Herbs"), 3)
+        violation = Exception("violates foreign key constraint")
+        violation.code = '23503'
+
+        mock_table = Mock()
+        mock_supabase.table.return_value = mock_table
+        mock_table.select.return_value.eq.return_value.eq.return_value.limit.return_value.execute.return_value = self._response([{"id": 4}])
+        mock_table.insert.return_value.execute.side_effect = [
+            violation, self._response([{"id": 14}])]
+
+        result = db_service.save_plant_to_collection(
+            "user-123", {"common_name": "Dill"}, "Herbs")
+
+        assert result["status"] == "success"
+        assert mock_table.insert.call_args[0][0]["collection_id"] == 4
+        assert db_service.COLLECTION_ID_CACHE.get(("user-123", "Herbs")) == 4
+
+    @patch('db_service._save_plant_rpc_available', True)
+    @patch('db_service.supabase')
+    def test_missing_rpc_falls_back_to_multi_step(self, mock_supabase):
+        """Test that a missing RPC function uses the old lookup path"""
+        missing = Exception("Could not find the function")
+        missing.code = 'PGRST202'
+        mock_supabase.rpc.return_value.execute.side_effect = missing
+
+        mock_table = Mock()
+        mock_supabase.table.return_value = mock_table
+        mock_table.select.return_value.eq.return_value.eq.return_value.limit.return_value.execute.return_value = self._response([{"id": 1}])
+        mock_table.insert.return_value.execute.return_value = self._response(
+            [{"id": 12}])
+
+        result = db_service.save_plant_to_collection(
+            "user-123", {"common_name": "Mint"}, "Herbs")
+
+        assert result["status"] == "success"
+        assert db_service._save_plant_rpc_available is False
+        assert db_service.COLLECTION_ID_CACHE.get(("user-123", "Herbs")) == 1
+
+    @patch('db_service.supabase')
+    def test_rename_and_delete_invalidate_cache(self, mock_supabase):
+        """Test that rename and delete drop cached collection IDs"""
+        db_service.COLLECTION_ID_CACHE.set(("user-123", "Old"), 1)
+        db_service.COLLECTION_ID_CACHE.set(("user-123", "Gone"), 2)
+
+        db_service.rename_collection("user-123", "Old", "New")
+        db_service.delete_collection_container("user-123", "Gone")
+
+        assert ("user-123", "Old") not in db_service.COLLECTION_ID_CACHE
+        assert ("user-123", "Gone") not in db_service.COLLECTION_ID_CACHE
 
 
 class TestGetUserCollections:
@@ -126,31 +277,22 @@ class TestGetUserCollections:
     @patch('db_service.supabase')
     def test_get_collections_with_plants(self, mock_supabase):
         """Test retrieving collections with plants"""
-        # Mock parent collections
-        mock_parents = Mock()
-        mock_parents.data = [
-            {"id": 1, "collection_name": "Indoor Plants"},
-            {"id": 2, "collection_name": "Outdoor Garden"}
-        ]
-        mock_parents.error = None
-
-        # Mock child plants
-        mock_children = Mock()
-        mock_children.data = [
-            {"id": 10, "collection_id": 1, "common_name": "Snake Plant"},
-            {"id": 11, "collection_id": 1, "common_name": "Pothos"},
-            {"id": 12, "collection_id": 2, "common_name": "Tomato"}
+        # Collections with their plants embedded
+        mock_response = Mock()
+        mock_response.data = [
+            {"id": 1, "collection_name": "Indoor Plants", "collection_plants": [
+                {"id": 10, "collection_id": 1, "common_name": "Snake Plant"},
+                {"id": 11, "collection_id": 1, "common_name": "Pothos"},
+            ]},
+            {"id": 2, "collection_name": "Outdoor Garden", "collection_plants": [
+                {"id": 12, "collection_id": 2, "common_name": "Tomato"},
+            ]},
         ]
-        mock_children.error = None
+        mock_response.error = None
 
         mock_table = Mock()
         mock_supabase.table.return_value = mock_table
-
-        # First call gets parents, second gets children
-        execute_mock = Mock()
-        execute_mock.execute.side_effect = [mock_parents, mock_children]
-        mock_table.select.return_value.eq.return_value.order.return_value = execute_mock
-        mock_table.select.return_value.in_.return_value.order.return_value.execute.return_value = mock_children
+        mock_table.select.return_value.eq.return_value.order.return_value.execute.return_value = mock_response
 
         result = db_service.get_user_collections("user-123")
 
@@ -159,6 +301,56 @@ class TestGetUserCollections:
         assert "Outdoor Garden" in result["data"]
         assert len(result["data"]["Indoor Plants"]) == 2
         assert len(result["data"]["Outdoor Garden"]) == 1
+        # One embedded query instead of parents + children
+        assert mock_supabase.table.call_count == 1
+        mock_table.select.assert_called_once_with(
+            'id, collection_name, collection_plants(*)')
+
+    @patch('db_service.supabase')
+    def test_get_collections_with_empty_collection(self, mock_supabase):
+        """Test that a collection without plants maps to an empty list"""
+        mock_response = Mock()
+        mock_response.data = [
+            {"id": 1, "collection_name": "Empty", "collection_plants": []},
+        ]
+        mock_response.error = None
+
+        mock_table = Mock()
+        mock_supabase.table.return_value = mock_table
+        mock_table.select.return_value.eq.return_value.order.return_value.execute.return_value = mock_response
+
+        result = db_service.get_user_collections("user-123")
+
+        assert result["data"] == {"Empty": []}
+
+    @patch('db_service.supabase')
+    def test_get_collections_field_projection(self, mock_supabase):
+        """Test that fields limits the embedded plant columns"""
+        mock_response = Mock()
+        mock_response.data = [
+            {"id": 1, "collection_name": "Herbs",
+             "collection_plants": [{"id": 10, "common_name": "Basil"}]},
+        ]
+        mock_response.error = None
+
+        mock_table = Mock()
+        mock_supabase.table.return_value = mock_table
+        mock_table.select.return_value.eq.return_value.order.return_value.execute.return_value = mock_response
+
+        result = db_service.get_user_collections(
+            "user-123", fields=["id", "common_name"])
+
+        assert result["data"]["Herbs"] == [{"id": 10, "common_name": "Basil"}]
+        mock_table.select.assert_called_once_with(
+            'id, collection_name, collection_plants(id, common_name)')
+
+    def test_get_collections_rejects_unknown_fields(self):
+        """Test that unknown projection fields are rejected"""
+        result = db_service.get_user_collections(
+            "user-123", fields=["id", "password"])
+
+        assert result["status"] == "error"
+        assert result["code"] == "invalid_fields"
 
     @patch('db_service.supabase')
     def test_get_collections_empty(self, mock_supabase):
@@ -177,6 +369,92 @@ class TestGetUserCollections:
         assert "No collections found" in result["message"]
 
 
+class TestCollectionSummaries:
+    """Test the lightweight collection summary query"""
+
+    @patch('db_service._collection_summaries_rpc_available', True)
+    @patch('db_service.supabase')
+    def test_summaries_from_rpc(self, mock_supabase):
+        """Test that summaries come from the aggregate RPC"""
+        mock_response = Mock()
+        mock_response.data = [{"id": 1, "collection_name": "Herbs",
+                               "plant_count": 3,
+                               "last_modified": "2025-05-01T00:00:00Z"}]
+        mock_response.error = None
+        mock_supabase.rpc.return_value.execute.return_value = mock_response
+
+        result = db_service.get_collection_summaries("user-123")
+
+        assert result["status"] == "success"
+        assert result["data"][0]["plant_count"] == 3
+        mock_supabase.rpc.assert_called_once_with(
+            "collection_summaries", {"p_user_id": "user-123"})
+        mock_supabase.table.assert_not_called()
+
+    @patch('db_service._collection_summaries_rpc_available', True)
+    @patch('db_service.supabase')
+    def test_summaries_fall_back_to_embedded_count(self, mock_supabase):
+        """Test the embedded-count fallback when the RPC is missing"""
+        missing = Exception("function not found")
+        missing.code = '42883'
+        mock_supabase.rpc.return_value.execute.side_effect = missing
+
+        mock_response = Mock()
+        mock_response.data = [{"id": 1, "collection_name": "Herbs",
+                               "created_at": "2025-01-01T00:00:00Z",
+                               "collection_plants": [{"count": 2}]}]
+        mock_response.error = None
+        mock_table = Mock()
+        mock_supabase.table.return_value = mock_table
+        mock_table.select.return_value.eq.return_value.order.return_value.execute.return_value = mock_response
+
+        result = db_service.get_collection_summaries("user-123")
+
+        assert result["data"] == [{
+            "id": 1,
+            "collection_name": "Herbs",
+            "plant_count": 2,
+            "last_modified": "2025-01-01T00:00:00Z",
+        }]
+        assert db_service._collection_summaries_rpc_available is False
+
+
+class TestCollectionPlanningFields:
+    """Test loading one collection's planning fields"""
+
+    @patch('db_service.supabase')
+    def test_selects_only_planning_fields(self, mock_supabase):
+        """Test that JSON fields are extracted by the query itself"""
+        mock_response = Mock()
+        mock_response.data = [{"id": 1, "collection_plants": [{"common_name": "Basil"}]}]
+        mock_response.error = None
+        mock_table = mock_supabase.table.return_value
+        query = mock_table.select.return_value.eq.return_value.eq.return_value
+        query.order.return_value.limit.return_value.execute.return_value = mock_response
+
+        result = db_service.get_collection_planning_fields("user-123", "Herbs")
+
+        assert result == {"status": "success", "data": [{"common_name": "Basil"}]}
+        columns = mock_table.select.call_args[0][0]
+        assert "light:plant_details_json->care_instructions->>light" in columns
+        assert "description" not in columns
+        query.order.assert_called_once_with('id', foreign_table='collection_plants')
+
+    @patch('db_service.supabase')
+    def test_missing_collection(self, mock_supabase):
+        """Test that an unknown collection is reported as not found"""
+        mock_response = Mock()
+        mock_response.data = []
+        mock_response.error = None
+        query = mock_supabase.table.return_value.select.return_value.eq.return_value.eq.return_value
+        query.order.return_value.limit.return_value.execute.return_value = mock_response
+
+        result = db_service.get_collection_planning_fields("user-123", "Nope")
+
+        assert result["status"] == "empty"
+        assert result["code"] == "collection_not_found"
+
+
 class TestDeleteOperations:
     """Test delete operations"""
 
@@ -289,22 +567,160 @@ class TestForumOperations:
         mock_response.data = [
             {
                 "id": 1,
+                "user_id": "user-1",
                 "title": "Test Post",
                 "content": "Content",
-                "profiles": {"email": "user@example.com"}
             }
         ]
         mock_response.error = None
 
         mock_table = Mock()
-        mock_supabase.table.return_value = mock_table
-        mock_table.select.return_value.order.return_value.limit.return_value.execute.return_value = mock_response
+        mock_table.select.return_value.order.return_value.order.return_value.limit.return_value.execute.return_value = mock_response
+        _route_tables(mock_supabase, forum_posts=mock_table,
+                      profiles=_profiles_table(
+                          {"id": "user-1", "email": "user@example.com"}))
 
         result = db_service.get_recent_forum_posts()
 
         assert result["status"] == "success"
         assert result["data"][0]["author_email"] == "user@example.com"
         assert "profiles" not in result["data"][0]
+        assert result["next_cursor"] is None
+        mock_table.select.assert_called_once_with('*')
+
+    @patch('db_service.supabase')
+    def test_authors_resolved_in_one_lookup_then_cached(self, mock_supabase):
+        """Test that a page's authors cost one lookup, then none"""
+        mock_response = Mock()
+        mock_response.data = [
+            {"id": 3, "user_id": "user-1", "created_at": "2025-05-01T12:00:03+00:00"},
+            {"id": 2, "user_id": "user-2", "created_at": "2025-05-01T12:00:02+00:00"},
+            {"id": 1, "user_id": "user-1", "created_at": "2025-05-01T12:00:01+00:00"},
+        ]
+        mock_response.error = None
+
+        mock_table = Mock()
+        mock_table.select.return_value.order.return_value.order.return_value.limit.return_value.execute.return_value = mock_response
+        mock_profiles = _profiles_table(
+            {"id": "user-1", "email": "one@example.com"})
+        _route_tables(mock_supabase, forum_posts=mock_table,
+                      profiles=mock_profiles)
+
+        first = db_service.get_recent_forum_posts()
+        second = db_service.get_recent_forum_posts()
+
+        assert [p["author_email"] for p in first["data"]] == [
+            "one@example.com", "Anonymous User", "one@example.com"]
+        assert [p["author_email"] for p in second["data"]] == [
+            "one@example.com", "Anonymous User", "one@example.com"]
+        mock_profiles.select.return_value.in_.assert_called_once_with(
+            'id', ['user-1', 'user-2'])
+
+    @patch('db_service.supabase')
+    def test_failed_author_lookup_not_cached(self, mock_supabase):
+        """Test that a failed lookup falls back without caching"""
+        records = [{"id": 1, "user_id": "user-1"}]
+        mock_profiles = Mock()
+        mock_profiles.select.return_value.in_.return_value.execute.side_effect = Exception("timeout")
+        _route_tables(mock_supabase, profiles=mock_profiles)
+
+        db_service._attach_authors(records)
+
+        assert records[0]["author_email"] == "Anonymous User"
+        assert "user-1" not in db_service.AUTHOR_CACHE
+
+    def test_invalidate_author(self):
+        """Test that an email change can drop the cached author"""
+        db_service.AUTHOR_CACHE.set("user-1", "old@example.com")
+
+        db_service.invalidate_author("user-1")
+
+        assert "user-1" not in db_service.AUTHOR_CACHE
+
+    @staticmethod
+    def _feed_posts(count):
+        return [
+            {"id": 100 - i, "title": f"Post {i}", "content": "x" * 500,
+             "created_at": f"2025-05-01T12:00:{59 - i:02d}+00:00",
+             "profiles": {"email": "user@example.com"}}
+            for i in range(count)
+        ]
+
+    @patch('db_service.supabase')
+    def test_forum_feed_first_page_sets_next_cursor(self, mock_supabase):
+        """Test that a full page returns a cursor for the last post shown"""
+        mock_response = Mock()
+        mock_response.data = self._feed_posts(3)
+        mock_response.error = None
+
+        mock_query = mock_supabase.table.return_value.select.return_value
+        mock_limit = mock_query.order.return_value.order.return_value.limit
+        mock_limit.return_value.execute.return_value = mock_response
+
+        result = db_service.get_recent_forum_posts(limit=2)
+
+        assert [p["id"] for p in result["data"]] == [100, 99]
+        mock_limit.assert_called_once_with(3)
+        assert db_service.decode_feed_cursor(result["next_cursor"]) == (
+            "2025-05-01T12:00:58+00:00", 99)
+        mock_query.or_.assert_not_called()
+
+    @patch('db_service.supabase')
+    def test_forum_feed_cursor_seeks_past_last_post(self, mock_supabase):
+        """Test that a cursor becomes a (created_at, id) keyset filter"""
+        mock_response = Mock()
+        mock_response.data = self._feed_posts(1)
+        mock_response.error = None
+
+        mock_query = mock_supabase.table.return_value.select.return_value
+        mock_query.or_.return_value.order.return_value.order.return_value.limit.return_value.execute.return_value = mock_response
+
+        cursor = db_service.encode_feed_cursor(
+            {"created_at": "2025-05-01T12:00:58+00:00", "id": 99})
+        result = db_service.get_recent_forum_posts(limit=2, cursor=cursor)
+
+        mock_query.or_.assert_called_once_with(
+            'created_at.lt."2025-05-01T12:00:58+00:00",'
+            'and(created_at.eq."2025-05-01T12:00:58+00:00",id.lt.99)')
+        assert result["next_cursor"] is None
+
+    @patch('db_service.supabase')
+    def test_forum_feed_excerpt_mode(self, mock_supabase):
+        """Test that excerpt mode truncates content server-side"""
+        mock_response = Mock()
+        mock_response.data = self._feed_posts(1)
+        mock_response.data[0]["content"] = "y" * 1000
+        mock_response.error = None
+
+        mock_query = mock_supabase.table.return_value.select.return_value
+        mock_query.order.return_value.order.return_value.limit.return_value.execute.return_value = mock_response
+
+        result = db_service.get_recent_forum_posts(excerpt=True)
+
+        post = result["data"][0]
+        assert len(post["content"]) <= db_service.FORUM_EXCERPT_LENGTH + 1
+        assert post["content_truncated"] is True
+
+    @patch('db_service.supabase')
+    def test_forum_feed_rejects_tampered_cursor(self, mock_supabase):
+        """Test that a cursor that is not ours never reaches the query"""
+        cursor = db_service.encode_feed_cursor(
+            {"created_at": "2025-01-01),id.gt.0,(", "id": 1})
+
+        result = db_service.get_recent_forum_posts(cursor=cursor)
+
+        assert result["code"] == "invalid_cursor"
+        mock_supabase.table.assert_not_called()
+
+    def test_feed_cursor_round_trip(self):
+        """Test that cursors decode to what was encoded"""
+        cursor = db_service.encode_feed_cursor(
+            {"created_at": "2025-05-01T12:00:00.123456+00:00", "id": 42})
+
+        assert db_service.decode_feed_cursor(cursor) == (
+            "2025-05-01T12:00:00.123456+00:00", 42)
+        with pytest.raises(ValueError):
+            db_service.decode_feed_cursor("not-a-cursor")
 
     @patch('db_service.supabase')
     def test_create_forum_comment(self, mock_supabase):
@@ -337,40 +753,221 @@ class TestForumOperations:
         assert result["status"] == "success"
 
     @patch('db_service.supabase')
-    def test_get_post_comments(self, mock_supabase):
-        """Test retrieving comments for a post"""
+    def test_get_forum_post_by_id(self, mock_supabase):
+        """Test retrieving a single post without comments"""
         mock_response = Mock()
-        mock_response.data = [
-            {
-                "id": 1,
-                "content": "Comment 1",
-                "profiles": {"email": "user1@example.com"},
-                "parent_comment_id": None
-            },
-            {
-                "id": 2,
-                "content": "Reply",
-                "profiles": [{"email": "user2@example.com"}],
-                "parent_comment_id": 1
-            }
-        ]
+        mock_response.data = [{"id": 7, "title": "Old Post",
+                               "user_id": "user-1"}]
         mock_response.error = None
 
         mock_table = Mock()
-        mock_supabase.table.return_value = mock_table
-        mock_table.select.return_value.eq.return_value.order.return_value.execute.return_value = mock_response
+        mock_table.select.return_value.eq.return_value.limit.return_value.execute.return_value = mock_response
+        _route_tables(mock_supabase, forum_posts=mock_table,
+                      profiles=_profiles_table(
+                          {"id": "user-1", "email": "user@example.com"}))
 
-        result = db_service.get_post_comments("1")
+        result = db_service.get_forum_post(7)
 
         assert result["status"] == "success"
-        assert len(result["data"]) == 2
-        assert result["data"][0]["author_email"] == "user1@example.com"
-        assert result["data"][1]["author_email"] == "user2@example.com"
+        assert result["data"]["author_email"] == "user@example.com"
+        assert "comments" not in result["data"]
+        mock_table.select.assert_called_once_with('*')
+        mock_table.select.return_value.eq.assert_called_once_with('id', 7)
+
+    @patch('db_service.get_comment_tree')
+    @patch('db_service.supabase')
+    def test_get_forum_post_with_comments(self, mock_supabase, mock_tree):
+        """Test that comments come from the first page of the comment tree"""
+        mock_response = Mock()
+        mock_response.data = [{"id": 7, "title": "Old Post",
+                               "user_id": "author"}]
+        mock_response.error = None
+
+        mock_table = Mock()
+        mock_table.select.return_value.eq.return_value.limit.return_value.execute.return_value = mock_response
+        _route_tables(mock_supabase, forum_posts=mock_table,
+                      profiles=_profiles_table(
+                          {"id": "author", "email": "author@example.com"}))
+        mock_tree.return_value = {
+            "status": "success", "data": [{"id": 1, "replies": []}],
+            "next_cursor": "abc", "comment_count": 40}
+
+        result = db_service.get_forum_post(7, include_comments=True)
+
+        post = result["data"]
+        assert post["comments"] == [{"id": 1, "replies": []}]
+        assert post["comment_count"] == 40
+        assert post["comments_next_cursor"] == "abc"
+        assert post["author_email"] == "author@example.com"
+        mock_table.select.assert_called_once_with('*')
+        mock_tree.assert_called_once_with(7)
+
+    @patch('db_service.get_comment_tree')
+    @patch('db_service.supabase')
+    def test_get_forum_post_without_comments_yet(self, mock_supabase, mock_tree):
+        """Test that a post with no comments gets an empty tree"""
+        mock_response = Mock()
+        mock_response.data = [{"id": 7, "title": "Quiet Post"}]
+        mock_response.error = None
+
+        mock_table = Mock()
+        mock_supabase.table.return_value = mock_table
+        mock_table.select.return_value.eq.return_value.limit.return_value.execute.return_value = mock_response
+        mock_tree.return_value = {"status": "empty",
+                                  "message": "No records found."}
+
+        post = db_service.get_forum_post(7, include_comments=True)["data"]
+
+        assert post["comments"] == []
+        assert post["comment_count"] == 0
+        assert post["comments_next_cursor"] is None
+
+    @patch('db_service.supabase')
+    def test_get_forum_post_not_found(self, mock_supabase):
+        """Test that a missing post is reported as empty"""
+        mock_response = Mock()
+        mock_response.data = []
+        mock_response.error = None
+
+        mock_table = Mock()
+        mock_supabase.table.return_value = mock_table
+        mock_table.select.return_value.eq.return_value.limit.return_value.execute.return_value = mock_response
+
+        result = db_service.get_forum_post(999)
+
+        assert result["status"] == "empty"
+
+
+class TestQueryInstrumentation:
+    """Test timing and metrics recorded by _handle_supabase_query"""
+
+    @pytest.fixture(autouse=True)
+    def reset_metrics(self):
+        db_service.DB_METRICS.reset()
+        yield
+        db_service.DB_METRICS.reset()
+
+    @patch('db_service.supabase')
+    def test_successful_query_recorded(self, mock_supabase):
+        """Test that rows and size are recorded per operation"""
+        mock_response = Mock()
+        mock_response.data = [{"id": 1}, {"id": 2}]
+        mock_response.error = None
+
+        db_service._handle_supabase_query(lambda: mock_response,
+                                          'collections.select')
+
+        stats = db_service.DB_METRICS.snapshot()['collections.select']
+        assert stats["calls"] == 1
+        assert stats["errors"] == 0
+        assert stats["rows"]["sum"] == 2
+        assert stats["size_bytes"]["sum"] > 0
+
+    @patch('db_service.supabase')
+    def test_failed_query_counted_as_error(self, mock_supabase):
+        """Test that exceptions are recorded as errors"""
+        def failing_query():
+            raise Exception("connection reset")
+
+        result = db_service._handle_supabase_query(failing_query,
+                                                   'forum_posts.insert')
+
+        assert result["status"] == "error"
+        stats = db_service.DB_METRICS.snapshot()['forum_posts.insert']
+        assert stats["errors"] == 1
+
+    @patch('db_service.DB_SLOW_QUERY_MS', 0.001)
+    @patch('db_service.supabase')
+    def test_slow_query_logged_with_filters(self, mock_supabase, capsys):
+        """Test that queries over the threshold are logged"""
+        mock_response = Mock()
+        mock_response.data = []
+        mock_response.error = None
+
+        db_service._handle_supabase_query(
+            lambda: mock_response, 'collections.select',
+            {'user_id': 'user-123'})
+
+        output = capsys.readouterr().out
+        assert "Slow query: collections.select" in output
+        assert "user-123" in output
+
+    @patch('db_service.supabase')
+    def test_crud_functions_name_their_operation(self, mock_supabase):
+        """Test that call sites pass their table.verb name"""
+        mock_response = Mock()
+        mock_response.data = [{"id": 1}]
+        mock_response.error = None
+        mock_supabase.table.return_value.insert.return_value.execute.return_value = mock_response
+
+        db_service.create_forum_comment("user-123", "1", "Nice")
+
+        assert 'forum_comments.insert' in db_service.DB_METRICS.snapshot()
+
+    @patch('db_service.supabase')
+    def test_full_bulkhead_rejects_query(self, mock_supabase):
+        """Test that queries fail fast once Supabase's budget is used up"""
+        bulkhead = Bulkhead('supabase', max_limit=1, target_latency_ms=1000)
+        bulkhead.acquire()
+        query_func = Mock()
+
+        with patch.dict(db_service.BULKHEADS, {'supabase': bulkhead}):
+            with pytest.raises(BulkheadFull):
+                db_service._handle_supabase_query(query_func, 'collections.select')
+
+        query_func.assert_not_called()
+
+    @patch('db_service.supabase')
+    def test_query_releases_bulkhead_slot(self, mock_supabase):
+        """Test that a transport failure frees the slot and counts as overload"""
+        bulkhead = Bulkhead('supabase', max_limit=4, target_latency_ms=1000)
+
+        def failing_query():
+            raise Exception("connection reset")
+
+        with patch.dict(db_service.BULKHEADS, {'supabase': bulkhead}):
+            db_service._handle_supabase_query(failing_query, 'collections.select')
+
+        assert bulkhead.stats()["in_flight"] == 0
+        assert bulkhead.stats()["overloaded"] == 1
+
+
+class TestLazyStorageClient:
+    """Test that the storage client is created on first use"""
+
+    @patch('db_service._storage_client_created', False)
+    @patch('db_service.supabase', None)
+    @patch('db_service.create_storage_client')
+    def test_client_created_once_on_first_query(self, mock_create):
+        """Test that the first query creates the client and later ones reuse it"""
+        mock_client = mock_create.return_value
+        mock_response = Mock()
+        mock_response.data = [{"id": 1}]
+        mock_response.error = None
+        mock_client.table.return_value.insert.return_value.execute.return_value = mock_response
+
+        db_service.create_forum_post("user-123", "Title", "Body")
+        db_service.create_forum_post("user-123", "Title", "Body")
+
+        mock_create.assert_called_once()
+        assert db_service.supabase is mock_client
+
+    @patch('db_service._storage_client_created', False)
+    @patch('db_service.supabase', None)
+    @patch('db_service.create_storage_client', return_value=None)
+    def test_failed_client_not_retried(self, mock_create):
+        """Test that a backend that failed to initialize is not retried"""
+        db_service.create_empty_collection("user-123", "Test")
+        result = db_service.create_empty_collection("user-123", "Test")
+
+        assert result["status"] == "error"
+        mock_create.assert_called_once()
 
 
 class TestErrorHandling:
     """Test error handling scenarios"""
 
+    @patch('db_service._storage_client_created', True)
     @patch('db_service.supabase', None)
     def test_operations_fail_when_supabase_not_initialized(self):
         """Test that operations fail gracefully when Supabase is not initialized"""
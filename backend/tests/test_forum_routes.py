@@ -0,0 +1,264 @@
+"""
+Unit tests for api/forum.py routes
+
+Tests request handling for the forum endpoints with the database service
+mocked out.
+"""
+
+import pytest
+from unittest.mock import Mock, patch
+import sys
+import os
+
+# Add backend directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+
+import db_service
+from api.forum import forum_bp
+
+
+@pytest.fixture(autouse=True)
+def clear_feed_cache():
+    """Start every test with an empty forum feed cache"""
+    db_service.FORUM_FEED_CACHE.clear()
+    yield
+    db_service.FORUM_FEED_CACHE.clear()
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(forum_bp, url_prefix='/api/v1')
+    return app.test_client()
+
+
+class TestFeedRoute:
+    """Test GET /forum/posts paging parameters"""
+
+    @patch('db_service.get_recent_forum_posts')
+    def test_next_cursor_in_header(self, mock_get, client):
+        """Test that the body stays a list and the cursor is a header"""
+        mock_get.return_value = {"status": "success", "data": [{"id": 1}],
+                                 "next_cursor": "abc"}
+
+        response = client.get('/api/v1/forum/posts?limit=1&excerpt=true')
+
+        assert response.get_json() == [{"id": 1}]
+        assert response.headers['X-Next-Cursor'] == "abc"
+        mock_get.assert_called_once_with(limit=1, cursor=None, excerpt=True)
+
+    @patch('db_service.get_recent_forum_posts')
+    def test_last_page_has_no_cursor(self, mock_get, client):
+        """Test that X-Next-Cursor is omitted on the last page"""
+        mock_get.return_value = {"status": "success", "data": [{"id": 1}],
+                                 "next_cursor": None}
+
+        response = client.get('/api/v1/forum/posts?cursor=abc')
+
+        assert 'X-Next-Cursor' not in response.headers
+        mock_get.assert_called_once_with(limit=None, cursor="abc",
+                                         excerpt=False)
+
+    @patch('db_service.get_recent_forum_posts')
+    def test_invalid_limit_returns_400(self, mock_get, client):
+        """Test that a non-numeric page size is a client error"""
+        response = client.get('/api/v1/forum/posts?limit=ten')
+
+        assert response.status_code == 400
+        mock_get.assert_not_called()
+
+    @patch('db_service.get_recent_forum_posts')
+    def test_invalid_cursor_returns_400(self, mock_get, client):
+        """Test that a malformed cursor is a client error"""
+        mock_get.return_value = {"status": "error", "code": "invalid_cursor",
+                                 "message": "Invalid cursor"}
+
+        response = client.get('/api/v1/forum/posts?cursor=junk')
+
+        assert response.status_code == 400
+
+
+class TestFeedCaching:
+    """Test the cached feed's validators and write invalidation"""
+
+    PAGE = {"status": "success", "data": [{"id": 1, "title": "Hi"}],
+            "next_cursor": None}
+
+    @patch('db_service.get_recent_forum_posts')
+    def test_repeat_views_served_from_cache(self, mock_get, client):
+        """Test that the database is queried once per page per TTL"""
+        mock_get.return_value = self.PAGE
+
+        first = client.get('/api/v1/forum/posts')
+        second = client.get('/api/v1/forum/posts')
+
+        assert first.get_json() == second.get_json() == [{"id": 1, "title": "Hi"}]
+        assert mock_get.call_count == 1
+
+    @patch('db_service.get_recent_forum_posts')
+    def test_etag_revalidation_returns_304(self, mock_get, client):
+        """Test that a matching If-None-Match gets an empty 304"""
+        mock_get.return_value = self.PAGE
+
+        first = client.get('/api/v1/forum/posts')
+        assert first.headers.get('ETag')
+        assert first.headers.get('Last-Modified')
+
+        second = client.get('/api/v1/forum/posts', headers={
+            "If-None-Match": first.headers['ETag']})
+
+        assert second.status_code == 304
+        assert second.data == b''
+
+    @patch('db_service.get_recent_forum_posts')
+    def test_if_modified_since_returns_304(self, mock_get, client):
+        """Test that Last-Modified revalidation works without an ETag"""
+        mock_get.return_value = self.PAGE
+
+        first = client.get('/api/v1/forum/posts')
+        second = client.get('/api/v1/forum/posts', headers={
+            "If-Modified-Since": first.headers['Last-Modified']})
+
+        assert second.status_code == 304
+
+    @patch('db_service.supabase')
+    @patch('db_service.get_recent_forum_posts')
+    def test_new_post_invalidates_feed(self, mock_get, mock_supabase, client):
+        """Test that creating a post forces the next view to re-query"""
+        mock_get.return_value = self.PAGE
+        insert_response = Mock(data=[{"id": 2}], error=None)
+        mock_supabase.table.return_value.insert.return_value.execute.return_value = insert_response
+
+        first = client.get('/api/v1/forum/posts')
+        db_service.create_forum_post("user-123", "New", "Post")
+
+        mock_get.return_value = {"status": "success",
+                                 "data": [{"id": 2}, {"id": 1}],
+                                 "next_cursor": None}
+        second = client.get('/api/v1/forum/posts', headers={
+            "If-None-Match": first.headers['ETag']})
+
+        assert second.status_code == 200
+        assert [p["id"] for p in second.get_json()] == [2, 1]
+        assert mock_get.call_count == 2
+
+    @patch('db_service.supabase')
+    @patch('db_service.get_recent_forum_posts')
+    def test_new_comment_invalidates_feed(self, mock_get, mock_supabase, client):
+        """Test that commenting also refreshes the feed"""
+        mock_get.return_value = self.PAGE
+        insert_response = Mock(data=[{"id": 9}], error=None)
+        mock_supabase.table.return_value.insert.return_value.execute.return_value = insert_response
+
+        client.get('/api/v1/forum/posts')
+        db_service.create_forum_comment("user-123", "1", "Nice")
+        client.get('/api/v1/forum/posts')
+
+        assert mock_get.call_count == 2
+
+    @patch('db_service.supabase')
+    @patch('db_service.get_recent_forum_posts')
+    def test_failed_write_keeps_cache(self, mock_get, mock_supabase, client):
+        """Test that a failed insert does not drop cached pages"""
+        mock_get.return_value = self.PAGE
+        mock_supabase.table.return_value.insert.return_value.execute.side_effect = Exception("down")
+
+        client.get('/api/v1/forum/posts')
+        db_service.create_forum_post("user-123", "New", "Post")
+        client.get('/api/v1/forum/posts')
+
+        assert mock_get.call_count == 1
+
+
+class TestSinglePostRoute:
+    """Test GET /forum/posts/<id>"""
+
+    @patch('api.forum.get_forum_post')
+    def test_post_returned(self, mock_get, client):
+        """Test that a single post is returned without comments by default"""
+        mock_get.return_value = {"status": "success",
+                                 "data": {"id": 7, "title": "Old Post"}}
+
+        response = client.get('/api/v1/forum/posts/7')
+
+        assert response.status_code == 200
+        assert response.get_json()["title"] == "Old Post"
+        mock_get.assert_called_once_with(7, include_comments=False)
+
+    @patch('api.forum.get_forum_post')
+    def test_include_comments(self, mock_get, client):
+        """Test that ?include=comments asks for embedded comments"""
+        mock_get.return_value = {"status": "success",
+                                 "data": {"id": 7, "comments": []}}
+
+        client.get('/api/v1/forum/posts/7?include=comments')
+
+        mock_get.assert_called_once_with(7, include_comments=True)
+
+    @patch('api.forum.get_forum_post')
+    def test_missing_post_returns_404(self, mock_get, client):
+        """Test that an unknown post id is a 404"""
+        mock_get.return_value = {"status": "empty",
+                                 "message": "No records found."}
+
+        response = client.get('/api/v1/forum/posts/999')
+
+        assert response.status_code == 404
+
+    @patch('api.forum.get_forum_post')
+    def test_non_numeric_id_returns_404(self, mock_get, client):
+        """Test that non-numeric ids never reach the database"""
+        response = client.get('/api/v1/forum/posts/abc')
+
+        assert response.status_code == 404
+        mock_get.assert_not_called()
+
+
+class TestCommentTreeRoute:
+    """Test GET /forum/posts/<id>/comments"""
+
+    @patch('api.forum.get_comment_tree')
+    def test_tree_page_with_headers(self, mock_tree, client):
+        """Test that the page of roots comes with total and cursor headers"""
+        mock_tree.return_value = {"status": "success",
+                                  "data": [{"id": 1, "replies": []}],
+                                  "next_cursor": "abc", "comment_count": 12}
+
+        response = client.get('/api/v1/forum/posts/7/comments?limit=1')
+
+        assert response.get_json() == [{"id": 1, "replies": []}]
+        assert response.headers['X-Total-Count'] == '12'
+        assert response.headers['X-Next-Cursor'] == 'abc'
+        mock_tree.assert_called_once_with('7', parent_id=None, limit=1,
+                                          cursor=None)
+
+    @patch('api.forum.get_comment_tree')
+    def test_parent_param_loads_subtree(self, mock_tree, client):
+        """Test that ?parent= is passed through as an integer"""
+        mock_tree.return_value = {"status": "success", "data": [],
+                                  "next_cursor": None, "comment_count": 3}
+
+        client.get('/api/v1/forum/posts/7/comments?parent=2')
+
+        assert mock_tree.call_args.kwargs["parent_id"] == 2
+
+    @patch('api.forum.get_comment_tree')
+    def test_non_numeric_parent_returns_400(self, mock_tree, client):
+        """Test that a bad parent id is a client error"""
+        response = client.get('/api/v1/forum/posts/7/comments?parent=x')
+
+        assert response.status_code == 400
+        mock_tree.assert_not_called()
+
+    @patch('api.forum.get_comment_tree')
+    def test_unknown_parent_returns_404(self, mock_tree, client):
+        """Test that expanding a comment that doesn't exist is a 404"""
+        mock_tree.return_value = {"status": "error",
+                                  "code": "parent_not_found",
+                                  "message": "Comment not found."}
+
+        response = client.get('/api/v1/forum/posts/7/comments?parent=99')
+
+        assert response.status_code == 404
@@ -0,0 +1,264 @@
+"""
+Unit tests for http_client.py
+
+Tests the shared pooled HTTP client: retries, backoff and per-host stats.
+Uses mocking so no real network calls are made.
+"""
+
+import pytest
+from unittest.mock import Mock, patch
+import sys
+import os
+
+# Add backend directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import requests
+import http_client
+from bulkhead_service import Bulkhead, BulkheadFull
+
+
+@pytest.fixture(autouse=True)
+def reset_stats():
+    """Start every test with empty per-host counters and no real sleeping"""
+    http_client.reset_http_stats()
+    with patch('http_client.time.sleep'):
+        yield
+    http_client.reset_http_stats()
+
+
+def _response(status_code, headers=None):
+    response = Mock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    return response
+
+
+class TestSharedSession:
+    """Test the pooled session configuration"""
+
+    def test_session_mounts_pooled_adapters(self):
+        """Test that http and https share the configured pooled adapter"""
+        adapter = http_client._session.get_adapter('https://perenual.com')
+
+        assert adapter is http_client._session.get_adapter('http://example.com')
+        assert adapter._pool_maxsize == http_client.HTTP_POOL_MAXSIZE
+
+    @patch('http_client._session.request')
+    def test_helpers_forward_method_and_kwargs(self, mock_request):
+        """Test that get/post/put/patch pass through to the session"""
+        mock_request.return_value = _response(200)
+
+        http_client.post('https://api.example.com/x', json={"a": 1}, timeout=5)
+
+        mock_request.assert_called_once_with(
+            'POST', 'https://api.example.com/x', json={"a": 1}, timeout=5)
+
+
+class TestRetries:
+    """Test retry behaviour for idempotent and non-idempotent calls"""
+
+    @patch('http_client._session.request')
+    def test_get_retries_connection_errors(self, mock_request):
+        """Test that a GET is retried after a connection error"""
+        mock_request.side_effect = [
+            requests.exceptions.ConnectionError("reset"),
+            _response(200),
+        ]
+
+        response = http_client.get('https://perenual.com/api')
+
+        assert response.status_code == 200
+        assert mock_request.call_count == 2
+        stats = http_client.get_http_stats()['perenual.com']
+        assert stats["retries"] == 1
+        assert stats["errors"] == 1
+
+    @patch('http_client._session.request')
+    def test_get_retries_retryable_status(self, mock_request):
+        """Test that 503 responses are retried until the attempts run out"""
+        mock_request.return_value = _response(503)
+
+        response = http_client.get('https://perenual.com/api')
+
+        assert response.status_code == 503
+        assert mock_request.call_count == 1 + http_client.HTTP_MAX_RETRIES
+
+    @patch('http_client._session.request')
+    def test_post_not_retried_by_default(self, mock_request):
+        """Test that POST requests are not retried"""
+        mock_request.side_effect = requests.exceptions.ConnectionError("down")
+
+        with pytest.raises(requests.exceptions.ConnectionError):
+            http_client.post('https://gemini.example.com/generate')
+
+        assert mock_request.call_count == 1
+
+    @patch('http_client._session.request')
+    def test_read_timeout_not_retried(self, mock_request):
+        """Test that read timeouts are raised without retrying"""
+        mock_request.side_effect = requests.exceptions.ReadTimeout("slow")
+
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            http_client.get('https://perenual.com/api')
+
+        assert mock_request.call_count == 1
+
+    @patch('http_client._session.request')
+    def test_client_errors_returned_immediately(self, mock_request):
+        """Test that a 404 is returned without retrying"""
+        mock_request.return_value = _response(404)
+
+        response = http_client.get('https://perenual.com/api')
+
+        assert response.status_code == 404
+        assert mock_request.call_count == 1
+
+
+class TestDeadline:
+    """Test requests bounded by a per-thread deadline"""
+
+    @patch('http_client._session.request')
+    def test_timeout_cut_to_time_left(self, mock_request):
+        """Test that the timeout never runs past the deadline"""
+        mock_request.return_value = _response(200)
+
+        with http_client.deadline(http_client.time.monotonic() + 2):
+            http_client.get('https://perenual.com/api', timeout=10)
+
+        assert 0 < mock_request.call_args.kwargs["timeout"] <= 2
+
+    @patch('http_client._session.request')
+    def test_split_timeout_cut(self, mock_request):
+        """Test that (connect, read) timeouts are each cut"""
+        mock_request.return_value = _response(200)
+
+        with http_client.deadline(http_client.time.monotonic() + 2):
+            http_client.get('https://perenual.com/api', timeout=(1, 10))
+
+        connect, read = mock_request.call_args.kwargs["timeout"]
+        assert connect == 1
+        assert 0 < read <= 2
+
+    @patch('http_client._session.request')
+    def test_passed_deadline_sends_nothing(self, mock_request):
+        """Test that a request after the deadline fails without being sent"""
+        with http_client.deadline(http_client.time.monotonic() - 1):
+            with pytest.raises(requests.exceptions.Timeout):
+                http_client.get('https://perenual.com/api', timeout=10)
+
+        mock_request.assert_not_called()
+
+    @patch('http_client._backoff_delay', return_value=5)
+    @patch('http_client._session.request')
+    def test_no_retry_past_deadline(self, mock_request, mock_delay):
+        """Test that a retry which would start after the deadline is skipped"""
+        mock_request.return_value = _response(503)
+
+        with http_client.deadline(http_client.time.monotonic() + 2):
+            response = http_client.get('https://perenual.com/api')
+
+        assert response.status_code == 503
+        assert mock_request.call_count == 1
+
+    @patch('http_client._session.request')
+    def test_deadline_ends_with_block(self, mock_request):
+        """Test that requests after the block are unbounded again"""
+        mock_request.return_value = _response(200)
+
+        with http_client.deadline(http_client.time.monotonic() + 2):
+            pass
+        http_client.get('https://perenual.com/api', timeout=10)
+
+        assert mock_request.call_args.kwargs["timeout"] == 10
+
+
+class TestBackoff:
+    """Test the jittered backoff delay"""
+
+    def test_backoff_is_bounded(self):
+        """Test that the delay never exceeds the configured maximum"""
+        for attempt in range(10):
+            delay = http_client._backoff_delay(attempt)
+            assert 0 <= delay <= http_client.HTTP_BACKOFF_MAX_SECONDS
+
+    def test_backoff_honours_short_retry_after(self):
+        """Test that a numeric Retry-After header is used (capped)"""
+        response = _response(429, {'Retry-After': '1'})
+
+        assert http_client._backoff_delay(0, response) == 1.0
+
+
+class TestHostStats:
+    """Test per-host latency and error counters"""
+
+    @patch('http_client._session.request')
+    def test_stats_tracked_per_host(self, mock_request):
+        """Test that each host gets its own counters"""
+        mock_request.return_value = _response(200)
+
+        http_client.get('https://a.example.com/1')
+        http_client.get('https://a.example.com/2')
+        http_client.get('https://b.example.com/1')
+
+        stats = http_client.get_http_stats()
+        assert stats['a.example.com']["requests"] == 2
+        assert stats['b.example.com']["requests"] == 1
+        assert stats['a.example.com']["errors"] == 0
+
+
+class TestBulkheads:
+    """Test that upstream calls hold a slot in their bulkhead"""
+
+    @patch('http_client.bulkhead_for_host')
+    @patch('http_client._session.request')
+    def test_full_bulkhead_fails_fast(self, mock_request, mock_for_host):
+        """Test that nothing is sent when the upstream's budget is used up"""
+        bulkhead = Bulkhead('perenual', max_limit=1, target_latency_ms=1000)
+        bulkhead.acquire()
+        mock_for_host.return_value = bulkhead
+
+        with pytest.raises(BulkheadFull):
+            http_client.get('https://perenual.com/api/v2/species-list')
+
+        mock_request.assert_not_called()
+
+    @patch('http_client.bulkhead_for_host')
+    @patch('http_client._session.request')
+    def test_slot_released_and_overload_reported(self, mock_request, mock_for_host):
+        """Test that the slot is freed and a 503 counts as overload"""
+        bulkhead = Bulkhead('perenual', max_limit=4, target_latency_ms=1000)
+        mock_for_host.return_value = bulkhead
+        mock_request.return_value = _response(503)
+
+        http_client.post('https://perenual.com/api/x')
+
+        stats = bulkhead.stats()
+        assert stats["in_flight"] == 0
+        assert stats["overloaded"] == 1
+        assert stats["limit"] == 2
+
+    @patch('http_client.bulkhead_for_host')
+    @patch('http_client._session.request')
+    def test_slot_released_on_exception(self, mock_request, mock_for_host):
+        """Test that a failed call frees its slot"""
+        bulkhead = Bulkhead('perenual', max_limit=4, target_latency_ms=1000)
+        mock_for_host.return_value = bulkhead
+        mock_request.side_effect = requests.exceptions.ReadTimeout("slow")
+
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            http_client.get('https://perenual.com/api/x')
+
+        assert bulkhead.stats()["in_flight"] == 0
+        assert bulkhead.stats()["overloaded"] == 1
+
+    @patch('http_client.bulkhead_for_host')
+    @patch('http_client._session.request')
+    def test_bulkhead_can_be_skipped(self, mock_request, mock_for_host):
+        """Test that callers already holding a slot can bypass the check"""
+        mock_request.return_value = _response(200)
+
+        http_client.post('https://perenual.com/api/x', bulkhead=False)
+
+        mock_for_host.assert_not_called()
+        mock_request.assert_called_once_with('POST', 'https://perenual.com/api/x')
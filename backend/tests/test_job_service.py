@@ -0,0 +1,195 @@
+"""
+Unit tests for job_service.py
+
+Tests the persistent job queue with real SQLite files in a temporary
+directory and small handler functions.
+"""
+
+import pytest
+import json
+import sqlite3
+import sys
+import os
+import threading
+import time
+
+# Add backend directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from job_service import JobQueue, JobRejected
+
+
+def _queue(tmp_path, handler, **kwargs):
+    return JobQueue(str(tmp_path / "jobs.sqlite3"), handler, **kwargs)
+
+
+class TestJobQueue:
+    """Test job submission and execution"""
+
+    def test_job_runs_and_stores_result(self, tmp_path):
+        """Test that a submitted job is executed and its result kept"""
+        queue = _queue(tmp_path, lambda payload: ({"echo": payload["value"]}, 200))
+
+        job = queue.submit("user-1", {"value": 42})
+        finished = queue.wait(job["id"], timeout=5)
+
+        assert job["state"] in ("queued", "running", "succeeded")
+        assert finished["state"] == "succeeded"
+        assert finished["result"] == {"echo": 42}
+        assert finished["result_code"] == 200
+        assert finished["finished_at"] is not None
+        queue.shutdown()
+
+    def test_error_status_marks_job_failed(self, tmp_path):
+        """Test that handler error statuses and exceptions fail the job"""
+        def handler(payload):
+            if payload["raise"]:
+                raise RuntimeError("boom")
+            return {"status": "error"}, 500
+
+        queue = _queue(tmp_path, handler)
+
+        returned = queue.wait(queue.submit("u", {"raise": False})["id"], 5)
+        raised = queue.wait(queue.submit("u", {"raise": True})["id"], 5)
+
+        assert returned["state"] == "failed"
+        assert raised["state"] == "failed"
+        assert raised["result_code"] == 500
+        assert queue.stats()["failed"] == 2
+        queue.shutdown()
+
+    def test_unknown_job(self, tmp_path):
+        """Test that an unknown id returns None"""
+        queue = _queue(tmp_path, lambda payload: ({}, 200))
+
+        assert queue.get("missing") is None
+
+
+class TestJobLimits:
+    """Test queue depth and per-user caps"""
+
+    @pytest.fixture
+    def blocked_queue(self, tmp_path):
+        """A one-worker queue whose jobs wait for release.set()"""
+        release = threading.Event()
+
+        def handler(payload):
+            release.wait(5)
+            return {"done": True}, 200
+
+        queue = _queue(tmp_path, handler, max_workers=1, max_queue_depth=2,
+                       max_active_per_user=2)
+        yield queue
+        release.set()
+        queue.shutdown()
+
+    def test_per_user_cap(self, blocked_queue):
+        """Test that a user's pending jobs are capped"""
+        blocked_queue.submit("user-1", {})
+        blocked_queue.submit("user-1", {})
+
+        with pytest.raises(JobRejected) as error:
+            blocked_queue.submit("user-1", {})
+
+        assert error.value.code == 'user_limit'
+        assert blocked_queue.stats()["rejected"] == 1
+
+    def test_queue_depth_cap(self, blocked_queue):
+        """Test that submissions are rejected once the queue is full"""
+        blocked_queue.submit("user-1", {})
+        # Let the single worker claim the first job
+        time.sleep(0.1)
+        blocked_queue.submit("user-2", {})
+        blocked_queue.submit("user-3", {})
+
+        with pytest.raises(JobRejected) as error:
+            blocked_queue.submit("user-4", {})
+
+        assert error.value.code == 'queue_full'
+        stats = blocked_queue.stats()
+        assert stats["queue_depth"] == 2
+        assert stats["running"] == 1
+
+    def test_queue_position(self, blocked_queue):
+        """Test that queued jobs report their place in line"""
+        blocked_queue.submit("user-1", {})
+        time.sleep(0.1)
+        second = blocked_queue.submit("user-2", {})
+
+        assert blocked_queue.get(second["id"])["queue_position"] == 1
+
+
+def _insert_job(path, job_id, state, started_at=None):
+    """Writes a job row directly, as left behind by a process that died"""
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "INSERT INTO jobs (id, user_id, state, payload, created_at, "
+            "started_at) VALUES (?, 'u', ?, ?, ?, ?)",
+            (job_id, state, json.dumps({"id": job_id}), time.time(), started_at)
+        )
+
+
+class TestJobRecovery:
+    """Test that jobs survive a restart"""
+
+    def test_queued_and_abandoned_jobs_resume(self, tmp_path):
+        """Test that a new queue on the same file runs leftover jobs"""
+        queue = _queue(tmp_path, lambda payload: ({"id": payload["id"]}, 200),
+                       lease_seconds=60, recover_interval_seconds=0)
+        queue.get("create-schema")
+        _insert_job(queue.path, "queued-job", "queued")
+        _insert_job(queue.path, "abandoned-job", "running", started_at=0)
+
+        queue.submit("other", {"id": "new-job"})
+
+        assert queue.wait("queued-job", 5)["result"] == {"id": "queued-job"}
+        assert queue.wait("abandoned-job", 5)["result"] == {"id": "abandoned-job"}
+        assert queue.stats()["recovered"] == 1
+        queue.shutdown()
+
+    def test_live_running_job_not_stolen(self, tmp_path):
+        """Test that running jobs within their lease are left alone"""
+        queue = _queue(tmp_path, lambda payload: ({}, 200), lease_seconds=60)
+        queue.get("create-schema")
+        _insert_job(queue.path, "live-job", "running", started_at=time.time())
+
+        queue.submit("other", {"id": "new-job"})
+
+        assert queue.get("live-job")["state"] == "running"
+        queue.shutdown()
+
+    def test_restarted_queue_resumes_on_first_read(self, tmp_path):
+        """Test that polling a job after a restart runs it without a new submit"""
+        before = _queue(tmp_path, lambda payload: ({}, 200))
+        before.get("create-schema")
+        before.shutdown()
+        _insert_job(before.path, "left-over", "queued")
+
+        after = _queue(tmp_path, lambda payload: ({"id": payload["id"]}, 200))
+        after.get("left-over")
+
+        assert after.wait("left-over", 5)["state"] == "succeeded"
+        after.shutdown()
+
+    def test_expired_lease_requeued_while_running(self, tmp_path):
+        """Test that a job abandoned after startup is picked up by a later sweep"""
+        queue = _queue(tmp_path, lambda payload: ({"id": payload["id"]}, 200),
+                       lease_seconds=60, recover_interval_seconds=0)
+        queue.get("create-schema")
+        _insert_job(queue.path, "abandoned-job", "running", started_at=0)
+
+        queue.get("abandoned-job")
+
+        assert queue.wait("abandoned-job", 5)["state"] == "succeeded"
+        assert queue.stats()["recovered"] == 1
+        queue.shutdown()
+
+    def test_sweeps_are_rate_limited(self, tmp_path):
+        """Test that reads within the interval do not sweep again"""
+        queue = _queue(tmp_path, lambda payload: ({}, 200),
+                       lease_seconds=60, recover_interval_seconds=3600)
+        queue.get("create-schema")
+        _insert_job(queue.path, "abandoned-job", "running", started_at=0)
+
+        assert queue.get("abandoned-job")["state"] == "running"
+        queue.shutdown()
@@ -0,0 +1,146 @@
+"""
+Unit tests for layout_service.py
+
+Tests the local garden layout engine: spacing, height ordering, sun
+matching and input validation.
+"""
+
+import pytest
+import sys
+import os
+
+# Add backend directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import layout_service
+
+
+BED = {"width_ft": 8, "length_ft": 4}
+
+
+def _layout(plants, bed=BED, sun_map=None):
+    result = layout_service.compute_layout(bed, plants, sun_map)
+    assert result["status"] == "success", result
+    return result["layout"]
+
+
+def _overlaps(a, b):
+    return (a["x_in"] < b["x_in"] + b["size_in"] and b["x_in"] < a["x_in"] + a["size_in"]
+            and a["y_in"] < b["y_in"] + b["size_in"] and b["y_in"] < a["y_in"] + a["size_in"])
+
+
+class TestComputeLayout:
+    """Test plant placement"""
+
+    def test_places_every_plant_without_overlap(self):
+        """Test that footprints stay inside the bed and never overlap"""
+        layout = _layout([
+            {"name": "Tomato", "spacing_in": 24, "height_in": 60},
+            {"name": "Basil", "quantity": 4, "spacing_in": 12, "height_in": 18},
+            {"name": "Carrot", "quantity": 6, "spacing_in": 6, "height_in": 10},
+        ])
+
+        placements = layout["placements"]
+        assert len(placements) == 11
+        assert layout["unplaced"] == []
+        for i, a in enumerate(placements):
+            assert a["x_in"] + a["size_in"] <= 96
+            assert a["y_in"] + a["size_in"] <= 48
+            for b in placements[i + 1:]:
+                assert not _overlaps(a, b)
+
+    def test_tall_plants_go_north(self):
+        """Test that taller plants are placed nearer the north edge"""
+        layout = _layout([
+            {"name": "Lettuce", "spacing_in": 12, "height_in": 8},
+            {"name": "Corn", "spacing_in": 12, "height_in": 72},
+        ])
+
+        by_name = {p["name"]: p for p in layout["placements"]}
+        assert by_name["Corn"]["y_in"] < by_name["Lettuce"]["y_in"]
+
+    def test_sun_map_matches_needs(self):
+        """Test that shade plants take the shaded part of the bed"""
+        # North half full sun, south half shade
+        sun_map = [[8, 8], [2, 2]]
+
+        layout = _layout([
+            {"name": "Pepper", "spacing_in": 12, "height_in": 12, "sun": "full"},
+            {"name": "Hosta", "spacing_in": 12, "height_in": 12, "sun": "shade"},
+        ], sun_map=sun_map)
+
+        by_name = {p["name"]: p for p in layout["placements"]}
+        assert by_name["Pepper"]["y_in"] < 24 and by_name["Pepper"]["sun_ok"]
+        assert by_name["Hosta"]["y_in"] >= 24 and by_name["Hosta"]["sun_ok"]
+
+    def test_reports_plants_that_do_not_fit(self):
+        """Test that overflow and oversized plants are listed as unplaced"""
+        layout = _layout([
+            {"name": "Oak", "spacing_in": 120},
+            {"name": "Squash", "quantity": 3, "spacing_in": 36},
+        ])
+
+        reasons = sorted(p["reason"] for p in layout["unplaced"])
+        assert len(layout["placements"]) == 2
+        assert reasons == ["no free space left", "wider than the bed"]
+
+    def test_map_and_legend(self):
+        """Test the text rendering of the grid"""
+        layout = _layout([{"name": "Sage", "spacing_in": 12}], bed={"width_ft": 1, "length_ft": 1})
+
+        assert layout["legend"] == {"A": "Sage"}
+        assert layout["map"] == ["AA", "AA"]
+        assert layout["utilization"] == 1.0
+
+
+class TestLayoutValidation:
+    """Test input validation"""
+
+    @pytest.mark.parametrize("bed, plants, sun_map", [
+        (None, [{"name": "Basil"}], None),
+        ({"width_ft": -1, "length_ft": 4}, [{"name": "Basil"}], None),
+        (BED, [], None),
+        (BED, [{"spacing_in": 12}], None),
+        (BED, [{"name": "Basil", "quantity": 0}], None),
+        (BED, [{"name": "Basil", "quantity": True}], None),
+        (BED, [{"name": "Basil", "sun": "moonlight"}], None),
+        (BED, [{"name": "Basil"}], [[1, "x"]]),
+        (BED, [{"name": "Basil"}], [1, 2, 3]),
+        ({"width_ft": 1000, "length_ft": 1000}, [{"name": "Basil"}], None),
+    ])
+    def test_invalid_input(self, bed, plants, sun_map):
+        """Test that bad input is reported, not raised"""
+        result = layout_service.compute_layout(bed, plants, sun_map)
+
+        assert result["status"] == "error"
+        assert result["code"] == "invalid_layout_input"
+
+    def test_huge_quantity_rejected_before_expansion(self):
+        """Test that the plant cap is checked on the running total of quantities"""
+        plants = [{"name": "Basil", "quantity": 150},
+                  {"name": "Carrot", "quantity": 10 ** 12}]
+
+        # Expanding 10**12 instances first would never return
+        result = layout_service.compute_layout(BED, plants)
+
+        assert result["code"] == "invalid_layout_input"
+        assert "At most" in result["message"]
+
+    def test_more_names_than_map_symbols_rejected(self):
+        """Test that every distinct plant keeps its own map symbol"""
+        plants = [{"name": f"Plant {i}", "spacing_in": 1}
+                  for i in range(len(layout_service._SYMBOLS) + 1)]
+
+        result = layout_service.compute_layout(BED, plants)
+
+        assert result["code"] == "invalid_layout_input"
+        assert "different plants" in result["message"]
+
+    def test_one_symbol_per_name(self):
+        """Test that the legend lists every name when all symbols are used"""
+        count = len(layout_service._SYMBOLS)
+        plants = [{"name": f"Plant {i}", "spacing_in": 1} for i in range(count)]
+
+        layout = _layout(plants)
+
+        assert len(layout["legend"]) == count
@@ -0,0 +1,45 @@
+"""
+Unit tests for api/metrics.py
+
+Tests that the metrics endpoint reports database and HTTP metrics.
+"""
+
+import pytest
+import sys
+import os
+
+# Add backend directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+
+import db_service
+from api.metrics import metrics_bp
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(metrics_bp, url_prefix='/api/v1')
+    return app.test_client()
+
+
+class TestMetricsRoute:
+    """Test GET /metrics"""
+
+    def test_reports_db_operations(self, client):
+        """Test that recorded DB operations appear in the snapshot"""
+        db_service.DB_METRICS.reset()
+        db_service.DB_METRICS.record('collections.select', 20.0, rows=4)
+
+        response = client.get('/api/v1/metrics')
+
+        body = response.get_json()
+        assert response.status_code == 200
+        assert body["db"]["operations"]['collections.select']["calls"] == 1
+        assert "forum_feed" in body["db"]["caches"]
+        assert "http" in body
+        assert body["bulkheads"]["gemini"]["in_flight"] == 0
+        assert body["ai"]["cache"]["name"] == "ai_plans"
+        assert "plants" in body
+        db_service.DB_METRICS.reset()
@@ -0,0 +1,77 @@
+"""
+Unit tests for metrics_service.py
+
+Tests the fixed-bucket histograms and per-operation metrics used to
+instrument database calls.
+"""
+
+import sys
+import os
+
+# Add backend directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from metrics_service import Histogram, OperationMetrics
+
+
+class TestHistogram:
+    """Test bucket counts and percentile estimates"""
+
+    def test_values_land_in_buckets(self):
+        """Test that each value is counted in the first bucket that fits"""
+        histogram = Histogram((10, 100))
+
+        for value in (1, 10, 50, 1000):
+            histogram.observe(value)
+
+        snapshot = histogram.snapshot()
+        assert snapshot["buckets"] == {"le_10": 2, "le_100": 1, "overflow": 1}
+        assert snapshot["count"] == 4
+        assert snapshot["max"] == 1000
+
+    def test_percentiles_use_bucket_bounds(self):
+        """Test that percentiles resolve to the bucket upper bound"""
+        histogram = Histogram((10, 100, 1000))
+
+        for _ in range(95):
+            histogram.observe(5)
+        for _ in range(5):
+            histogram.observe(500)
+
+        assert histogram.percentile(0.50) == 10
+        assert histogram.percentile(0.99) == 500
+
+    def test_empty_histogram(self):
+        """Test that an empty histogram reports zeros"""
+        snapshot = Histogram((10,)).snapshot()
+
+        assert snapshot["count"] == 0
+        assert snapshot["p95"] == 0
+        assert snapshot["avg"] == 0
+
+
+class TestOperationMetrics:
+    """Test per-operation recording"""
+
+    def test_operations_tracked_separately(self):
+        """Test that calls, errors and histograms are kept per operation"""
+        metrics = OperationMetrics()
+
+        metrics.record('collections.select', 12.5, rows=3, size_bytes=900)
+        metrics.record('collections.select', 40.0, rows=0, error=True)
+        metrics.record('forum_posts.insert', 8.0, rows=1)
+
+        snapshot = metrics.snapshot()
+        assert snapshot['collections.select']["calls"] == 2
+        assert snapshot['collections.select']["errors"] == 1
+        assert snapshot['collections.select']["rows"]["sum"] == 3
+        assert snapshot['forum_posts.insert']["latency_ms"]["count"] == 1
+
+    def test_reset(self):
+        """Test that reset drops all operations"""
+        metrics = OperationMetrics()
+        metrics.record('profiles.select', 1.0)
+
+        metrics.reset()
+
+        assert metrics.snapshot() == {}
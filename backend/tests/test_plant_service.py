@@ -9,6 +9,8 @@ import pytest
 from unittest.mock import Mock, patch, MagicMock
 import sys
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Add backend directory to path for imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -20,13 +22,48 @@ os.environ['RAPID_API_HOST'] = 'test.rapidapi.com'
 os.environ['RAPIDAPI_BASE_URL'] = 'https://test.rapidapi.com/search'
 os.environ['PLANT_API_KEY'] = 'test_plant_api_key'
 
+import requests
+import http_client
 import plant_service
+from bulkhead_service import BulkheadFull
+from circuit_breaker import CircuitBreaker, CircuitOpen
+
+
+@pytest.fixture(autouse=True)
+def clear_plant_cache():
+    """Start every test with an empty plant details cache"""
+    plant_service.PLANT_CACHE.clear()
+    yield
+    plant_service.PLANT_CACHE.clear()
+
+
+@pytest.fixture(autouse=True)
+def plant_circuits():
+    """Give every test closed provider circuits"""
+    circuits = {
+        name: CircuitBreaker(name, failure_threshold=2, reset_timeout_seconds=60)
+        for name in ('rapidapi', 'perenual')
+    }
+    with patch.dict(plant_service.PLANT_CIRCUITS, circuits):
+        yield circuits
+
+
+@pytest.fixture(autouse=True)
+def species_index(tmp_path):
+    """Point the Perenual species index at a throwaway SQLite file"""
+    index = plant_service.SQLiteTTLStore(
+        str(tmp_path / "species.sqlite3"),
+        table='perenual_species_ids',
+        ttl_seconds=plant_service.PERENUAL_SPECIES_ID_TTL_SECONDS
+    )
+    with patch('plant_service.PERENUAL_SPECIES_INDEX', index):
+        yield index
 
 
 class TestRapidAPIPlantSearch:
     """Test indoor plant search using RapidAPI"""
 
-    @patch('plant_service.requests.get')
+    @patch('plant_service.http_client.get')
     def test_fetch_indoor_plant_success(self, mock_get):
         """Test successful indoor plant search"""
         # Mock API response
@@ -59,7 +96,7 @@ class TestRapidAPIPlantSearch:
         assert result["care_instructions"]["light"] == "Low to bright indirect light"
         assert result["image_url"] == "https://example.com/snake-plant.jpg"
 
-    @patch('plant_service.requests.get')
+    @patch('plant_service.http_client.get')
     def test_fetch_indoor_plant_with_list_common_name(self, mock_get):
         """Test handling of common name as list"""
         mock_response = Mock()
@@ -85,7 +122,7 @@ class TestRapidAPIPlantSearch:
 
         assert result["common_name"] == "Pothos"  # Should take first from list
 
-    @patch('plant_service.requests.get')
+    @patch('plant_service.http_client.get')
     def test_fetch_indoor_plant_not_found(self, mock_get):
         """Test handling when plant is not found"""
         mock_response = Mock()
@@ -97,7 +134,7 @@ class TestRapidAPIPlantSearch:
 
         assert result is None
 
-    @patch('plant_service.requests.get')
+    @patch('plant_service.http_client.get')
     def test_fetch_indoor_plant_http_error(self, mock_get):
         """Test handling of HTTP errors (401, 404, 500, etc.)"""
         mock_response = Mock()
@@ -110,7 +147,7 @@ class TestRapidAPIPlantSearch:
 
         assert result is None
 
-    @patch('plant_service.requests.get')
+    @patch('plant_service.http_client.get')
     def test_fetch_indoor_plant_network_error(self, mock_get):
         """Test handling of network errors"""
         mock_get.side_effect = Exception("Network timeout")
@@ -119,7 +156,7 @@ class TestRapidAPIPlantSearch:
 
         assert result is None
 
-    @patch('plant_service.requests.get')
+    @patch('plant_service.http_client.get')
     def test_fetch_indoor_plant_missing_description(self, mock_get):
         """Test handling when description is None or empty"""
         mock_response = Mock()
@@ -145,11 +182,21 @@ class TestRapidAPIPlantSearch:
 
         assert result["description"] == "No detailed description available."
 
+    @patch('plant_service.RAPIDAPI_KEY', None)
+    @patch('plant_service.http_client.get')
+    def test_missing_config_fails_search_not_import(self, mock_get):
+        """Test that missing RapidAPI settings fail the search without a request"""
+        result = plant_service.fetch_and_cache_plant_details("test plant")
+
+        assert result is None
+        assert plant_service.missing_rapidapi_config() == ["RAPID_API_KEY"]
+        mock_get.assert_not_called()
+
 
 class TestPerenualPlantSearch:
     """Test outdoor plant search using Perenual API"""
 
-    @patch('plant_service.requests.get')
+    @patch('plant_service.http_client.get')
     def test_fetch_outdoor_plant_success(self, mock_get):
         """Test successful outdoor plant search"""
         # Mock search response
@@ -197,7 +244,7 @@ class TestPerenualPlantSearch:
         assert result["care_instructions"]["watering"] == "Regular"
         assert result["care_instructions"]["light"] == "Full sun"
 
-    @patch('plant_service.requests.get')
+    @patch('plant_service.http_client.get')
     def test_fetch_outdoor_plant_not_found(self, mock_get):
         """Test handling when plant is not found in Perenual"""
         mock_response = Mock()
@@ -211,7 +258,7 @@ class TestPerenualPlantSearch:
 
         assert result is None
 
-    @patch('plant_service.requests.get')
+    @patch('plant_service.http_client.get')
     def test_fetch_outdoor_plant_html_response(self, mock_get):
         """Test handling when API returns HTML instead of JSON (invalid key)"""
         mock_response = Mock()
@@ -224,7 +271,7 @@ class TestPerenualPlantSearch:
 
         assert result is None
 
-    @patch('plant_service.requests.get')
+    @patch('plant_service.http_client.get')
     def test_fetch_outdoor_plant_missing_image(self, mock_get):
         """Test handling when plant has no image"""
         mock_search_response = Mock()
@@ -252,7 +299,7 @@ class TestPerenualPlantSearch:
 
         assert result["image_url"] == "/default_image.jpg"
 
-    @patch('plant_service.requests.get')
+    @patch('plant_service.http_client.get')
     def test_fetch_outdoor_plant_multiple_sunlight(self, mock_get):
         """Test handling multiple sunlight requirements"""
         mock_search_response = Mock()
@@ -283,6 +330,66 @@ class TestPerenualPlantSearch:
         assert result["care_instructions"]["light"] == "Full sun, Part shade"
 
 
+class TestPerenualSpeciesIndex:
+    """Test the persistent name -> species ID index for Perenual"""
+
+    def _json_response(self, payload, status_code=200):
+        response = Mock()
+        response.status_code = status_code
+        response.headers = {'Content-Type': 'application/json'}
+        response.text = '{}'
+        response.json.return_value = payload
+        return response
+
+    @patch('plant_service.http_client.get')
+    def test_search_populates_index(self, mock_get, species_index):
+        """Test that a successful search stores the species ID"""
+        mock_get.side_effect = [
+            self._json_response({"data": [{"id": 42}]}),
+            self._json_response({"id": 42, "common_name": "Lavender"}),
+        ]
+
+        result = plant_service.fetch_perenual_plant_details("Lavender")
+
+        assert result["common_name"] == "Lavender"
+        assert species_index.get("lavender") == 42
+
+    @patch('plant_service.http_client.get')
+    def test_indexed_name_skips_species_search(self, mock_get, species_index):
+        """Test that a known name goes straight to the details endpoint"""
+        species_index.set("lavender", 42)
+        mock_get.return_value = self._json_response(
+            {"id": 42, "common_name": "Lavender"})
+
+        result = plant_service.fetch_perenual_plant_details("lavender")
+
+        assert result["common_name"] == "Lavender"
+        assert mock_get.call_count == 1
+        assert mock_get.call_args[0][0].endswith("/v2/species/details/42")
+
+    @patch('plant_service.http_client.get')
+    def test_stale_index_entry_falls_back_to_search(self, mock_get, species_index):
+        """Test that a species ID that now 404s is replaced via search"""
+        species_index.set("lavender", 7)
+        mock_get.side_effect = [
+            self._json_response({}, status_code=404),
+            self._json_response({"data": [{"id": 42}]}),
+            self._json_response({"id": 42, "common_name": "Lavender"}),
+        ]
+
+        result = plant_service.fetch_perenual_plant_details("lavender")
+
+        assert result["common_name"] == "Lavender"
+        assert species_index.get("lavender") == 42
+
+    def test_index_entries_expire(self, species_index):
+        """Test that index entries honour their TTL"""
+        species_index.set("fern", 1, ttl_seconds=-1)
+
+        assert species_index.get("fern") is None
+        assert species_index.purge_expired() == 1
+
+
 class TestPlantTypeRouter:
     """Test the main routing function that directs to appropriate API"""
 
@@ -316,10 +423,243 @@ class TestPlantTypeRouter:
         mock_indoor.assert_called_once_with("fern")
 
 
+class TestPlantDetailsCache:
+    """Test caching of normalized plant records in fetch_plant_by_type"""
+
+    @patch('plant_service.fetch_and_cache_plant_details')
+    def test_repeat_search_served_from_cache(self, mock_indoor):
+        """Test that a repeated search does not call the provider again"""
+        mock_indoor.return_value = {"common_name": "Snake Plant"}
+
+        first = plant_service.fetch_plant_by_type("Snake Plant", "indoor")
+        second = plant_service.fetch_plant_by_type("  snake   plant ", "indoor")
+
+        mock_indoor.assert_called_once_with("Snake Plant")
+        assert first == second
+        assert plant_service.PLANT_CACHE.stats()["hits"] == 1
+
+    @patch('plant_service.fetch_perenual_plant_details')
+    @patch('plant_service.fetch_and_cache_plant_details')
+    def test_cache_key_includes_plant_type(self, mock_indoor, mock_outdoor):
+        """Test that indoor and other results are cached separately"""
+        mock_indoor.return_value = {"common_name": "Indoor Mint"}
+        mock_outdoor.return_value = {"common_name": "Garden Mint"}
+
+        indoor = plant_service.fetch_plant_by_type("mint", "indoor")
+        outdoor = plant_service.fetch_plant_by_type("mint", "other")
+
+        assert indoor["common_name"] == "Indoor Mint"
+        assert outdoor["common_name"] == "Garden Mint"
+        mock_outdoor.assert_called_once_with("mint")
+
+    @patch('plant_service.fetch_perenual_plant_details')
+    def test_failed_lookup_not_cached(self, mock_outdoor):
+        """Test that a None result is retried on the next search"""
+        mock_outdoor.side_effect = [None, {"common_name": "Oak"}]
+
+        assert plant_service.fetch_plant_by_type("oak", "other") is None
+        result = plant_service.fetch_plant_by_type("oak", "other")
+
+        assert result["common_name"] == "Oak"
+        assert mock_outdoor.call_count == 2
+
+    def test_concurrent_identical_searches_coalesced(self):
+        """Test that concurrent searches for one plant hit the API once"""
+        release = threading.Event()
+        calls = []
+
+        def slow_provider(name):
+            calls.append(name)
+            release.wait(5)
+            return {"common_name": "Monstera"}
+
+        results = []
+        with patch('plant_service.fetch_and_cache_plant_details',
+                   side_effect=slow_provider):
+            threads = [
+                threading.Thread(target=lambda: results.append(
+                    plant_service.fetch_plant_by_type("monstera", "indoor")))
+                for _ in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for _ in range(500):
+                if plant_service.PLANT_FETCHES.stats()["in_flight"] == 1 and \
+                        len(calls) == 1 and \
+                        plant_service.PLANT_FETCHES.stats()["collapsed"] >= 3:
+                    break
+                threading.Event().wait(0.01)
+            release.set()
+            for thread in threads:
+                thread.join()
+
+        assert calls == ["monstera"]
+        assert results == [{"common_name": "Monstera"}] * 4
+        assert plant_service.get_plant_lookup_stats()["single_flight"]["collapsed"] >= 3
+
+    def test_normalize_plant_name(self):
+        """Test that names are lower-cased and whitespace collapsed"""
+        assert plant_service.normalize_plant_name("  Monstera   Deliciosa ") == "monstera deliciosa"
+        assert plant_service.normalize_plant_name(None) == ""
+
+
+class TestPlantAnyTypeFanOut:
+    """Test the parallel type=any search across both providers"""
+
+    @patch('plant_service.fetch_perenual_plant_details')
+    @patch('plant_service.fetch_and_cache_plant_details')
+    def test_rejected_providers_raise(self, mock_indoor, mock_outdoor):
+        """Test that a bulkhead rejection surfaces when nobody answered"""
+        mock_indoor.return_value = None
+        mock_outdoor.side_effect = BulkheadFull('perenual', retry_after=2)
+
+        with pytest.raises(BulkheadFull):
+            plant_service.fetch_plant_any_type("oak")
+
+    @patch('plant_service.fetch_perenual_plant_details')
+    @patch('plant_service.fetch_and_cache_plant_details')
+    def test_rejection_ignored_when_other_answers(self, mock_indoor, mock_outdoor):
+        """Test that one provider's rejection does not hide the other's answer"""
+        mock_indoor.side_effect = BulkheadFull('rapidapi', retry_after=2)
+        mock_outdoor.return_value = {"common_name": "Oak"}
+
+        result = plant_service.fetch_plant_any_type("oak")
+
+        assert result["provider"] == "perenual"
+
+    @patch('plant_service.fetch_perenual_plant_details')
+    @patch('plant_service.fetch_and_cache_plant_details')
+    def test_falls_back_to_other_provider(self, mock_indoor, mock_outdoor):
+        """Test that a RapidAPI miss is answered by Perenual"""
+        mock_indoor.return_value = None
+        mock_outdoor.return_value = {"common_name": "Oak"}
+
+        result = plant_service.fetch_plant_any_type("oak")
+
+        assert result["common_name"] == "Oak"
+        assert result["plant_type"] == "other"
+        assert result["provider"] == "perenual"
+
+    @patch('plant_service.fetch_perenual_plant_details')
+    @patch('plant_service.fetch_and_cache_plant_details')
+    def test_preferred_provider_wins_and_merges(self, mock_indoor, mock_outdoor):
+        """Test that the preferred record is returned, filled from the other"""
+        mock_indoor.return_value = {
+            "common_name": "Mint",
+            "description": "No detailed description available.",
+            "care_instructions": {"light": "Bright", "watering": "Unknown"},
+        }
+        mock_outdoor.return_value = {
+            "common_name": "Garden Mint",
+            "description": "A hardy herb.",
+            "care_instructions": {"light": "Full sun", "watering": "Average"},
+        }
+
+        result = plant_service.fetch_plant_any_type("mint", prefer="indoor")
+
+        assert result["plant_type"] == "indoor"
+        assert result["common_name"] == "Mint"
+        assert result["care_instructions"]["light"] == "Bright"
+        if result["provider"] == "rapidapi+perenual":
+            assert result["description"] == "A hardy herb."
+            assert result["care_instructions"]["watering"] == "Average"
+
+    @patch('plant_service.fetch_perenual_plant_details')
+    @patch('plant_service.fetch_and_cache_plant_details')
+    def test_waits_for_preferred_provider(self, mock_indoor, mock_outdoor):
+        """Test that a fast non-preferred answer does not beat the preferred one"""
+        def slow_outdoor(name):
+            threading.Event().wait(0.1)
+            return {"common_name": "Perenual Fern"}
+
+        mock_indoor.return_value = {"common_name": "Indoor Fern"}
+        mock_outdoor.side_effect = slow_outdoor
+
+        result = plant_service.fetch_plant_any_type("fern", prefer="other")
+
+        assert result["plant_type"] == "other"
+        assert result["common_name"] == "Perenual Fern"
+        assert result["provider"] == "perenual+rapidapi"
+
+    @patch('plant_service.fetch_perenual_plant_details')
+    @patch('plant_service.fetch_and_cache_plant_details')
+    def test_deadline_uses_answered_provider(self, mock_indoor, mock_outdoor):
+        """Test that a preferred provider missing the deadline is skipped"""
+        release = threading.Event()
+
+        def slow_outdoor(name):
+            release.wait(5)
+            return {"common_name": "Perenual Fern"}
+
+        def fast_indoor(name):
+            return {"common_name": "Indoor Fern"}
+
+        mock_indoor.side_effect = fast_indoor
+        mock_outdoor.side_effect = slow_outdoor
+
+        try:
+            result = plant_service.fetch_plant_any_type("fern", prefer="other",
+                                                        deadline_seconds=0.2)
+        finally:
+            release.set()
+
+        # The preferred provider missed the deadline, so the other one answers
+        assert result["plant_type"] == "indoor"
+        assert result["provider"] == "rapidapi"
+
+    @patch('plant_service.fetch_perenual_plant_details')
+    @patch('plant_service.fetch_and_cache_plant_details')
+    def test_queued_provider_cancelled_at_deadline(self, mock_indoor, mock_outdoor):
+        """Test that a call still queued at the deadline never takes a worker"""
+        release = threading.Event()
+        remaining = []
+
+        def slow_indoor(name):
+            remaining.append(http_client._remaining())
+            release.wait(5)
+            return None
+
+        mock_indoor.side_effect = slow_indoor
+        pool = ThreadPoolExecutor(max_workers=1)
+
+        try:
+            with patch('plant_service.PLANT_FANOUT_POOL', pool):
+                result = plant_service.fetch_plant_any_type(
+                    "fern", deadline_seconds=0.2)
+        finally:
+            release.set()
+            pool.shutdown(wait=True)
+
+        assert result is None
+        mock_outdoor.assert_not_called()
+        # The running call's HTTP timeouts were bounded by the deadline
+        assert 0 < remaining[0] <= 0.2
+
+    @patch('plant_service.fetch_perenual_plant_details')
+    @patch('plant_service.fetch_and_cache_plant_details')
+    def test_both_providers_miss(self, mock_indoor, mock_outdoor):
+        """Test that None is returned when neither provider finds the plant"""
+        mock_indoor.return_value = None
+        mock_outdoor.return_value = None
+
+        assert plant_service.fetch_plant_any_type("nothing") is None
+
+    @patch('plant_service.fetch_perenual_plant_details')
+    @patch('plant_service.fetch_and_cache_plant_details')
+    def test_provider_exception_treated_as_miss(self, mock_indoor, mock_outdoor):
+        """Test that one provider raising does not fail the whole search"""
+        mock_indoor.side_effect = RuntimeError("boom")
+        mock_outdoor.return_value = {"common_name": "Rose"}
+
+        result = plant_service.fetch_plant_any_type("rose")
+
+        assert result["provider"] == "perenual"
+
+
 class TestDataNormalization:
     """Test that data is properly normalized across different API responses"""
 
-    @patch('plant_service.requests.get')
+    @patch('plant_service.http_client.get')
     def test_normalized_structure_indoor(self, mock_get):
         """Test that indoor plant data is properly normalized"""
         mock_response = Mock()
@@ -356,3 +696,123 @@ class TestDataNormalization:
         assert "watering" in result["care_instructions"]
         assert "fertilization" in result["care_instructions"]
         assert "ideal_temp" in result["care_instructions"]
+
+
+def _html_response():
+    response = Mock()
+    response.status_code = 200
+    response.headers = {'Content-Type': 'text/html'}
+    response.text = '<!DOCTYPE html><html>Rate limit exceeded</html>'
+    return response
+
+
+class TestProviderCircuits:
+    """Test the per-provider circuit breakers and stale fallback"""
+
+    @patch('plant_service.http_client.get')
+    def test_html_responses_open_circuit(self, mock_get, plant_circuits):
+        """Test that repeated HTML error pages open Perenual's circuit"""
+        mock_get.return_value = _html_response()
+
+        plant_service.fetch_plant_by_type("oak", 'other')
+        plant_service.fetch_plant_by_type("elm", 'other')
+
+        assert plant_circuits['perenual'].state == 'open'
+        assert plant_circuits['rapidapi'].state == 'closed'
+
+        with pytest.raises(CircuitOpen):
+            plant_service.fetch_plant_by_type("ash", 'other')
+        assert mock_get.call_count == 2
+
+    @patch('plant_service.http_client.get')
+    def test_misses_do_not_count_as_failures(self, mock_get, plant_circuits):
+        """Test that a valid empty answer keeps the circuit closed"""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {'Content-Type': 'application/json'}
+        mock_response.text = '{"data": []}'
+        mock_response.json.return_value = {"data": []}
+        mock_get.return_value = mock_response
+
+        for name in ("a", "b", "c"):
+            plant_service.fetch_plant_by_type(name, 'other')
+
+        assert plant_circuits['perenual'].stats()["failures"] == 0
+
+    @patch('plant_service.http_client.get')
+    def test_server_errors_open_rapidapi_circuit(self, mock_get, plant_circuits):
+        """Test that 5xx answers count against RapidAPI"""
+        mock_response = Mock()
+        mock_response.status_code = 502
+        mock_response.text = 'Bad gateway'
+        mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError(
+            response=mock_response)
+        mock_get.return_value = mock_response
+
+        plant_service.fetch_plant_by_type("fern", 'indoor')
+        plant_service.fetch_plant_by_type("ivy", 'indoor')
+
+        assert plant_circuits['rapidapi'].state == 'open'
+        assert plant_circuits['rapidapi'].last_failure == 'HTTP 502'
+
+    @patch('plant_service.fetch_perenual_plant_details')
+    def test_open_circuit_serves_stale_record(self, mock_fetch, plant_circuits):
+        """Test that an expired record is served, marked stale, while open"""
+        with patch('cache_service.time.monotonic', return_value=1000.0):
+            plant_service.PLANT_CACHE.set(("oak", 'other'), {"common_name": "Oak"},
+                                          ttl_seconds=1)
+        plant_circuits['perenual'].record_failure("HTML")
+        plant_circuits['perenual'].record_failure("HTML")
+
+        result = plant_service.fetch_plant_by_type("Oak", 'other')
+
+        assert result == {"common_name": "Oak", "stale": True}
+        mock_fetch.assert_not_called()
+        assert plant_service.PLANT_CACHE.stats()["stale_hits"] == 1
+
+    @patch('plant_service.fetch_perenual_plant_details')
+    def test_fresh_record_not_marked_stale(self, mock_fetch, plant_circuits):
+        """Test that a fresh cache hit is unaffected by the circuit"""
+        plant_service.PLANT_CACHE.set(("oak", 'other'), {"common_name": "Oak"})
+        plant_circuits['perenual'].record_failure("HTML")
+        plant_circuits['perenual'].record_failure("HTML")
+
+        result = plant_service.fetch_plant_by_type("oak", 'other')
+
+        assert "stale" not in result
+
+    @patch('plant_service.fetch_and_cache_plant_details')
+    @patch('plant_service.fetch_perenual_plant_details')
+    def test_any_type_skips_open_provider(self, mock_outdoor, mock_indoor, plant_circuits):
+        """Test that the fan-out answers from the provider that is up"""
+        plant_circuits['perenual'].record_failure("HTML")
+        plant_circuits['perenual'].record_failure("HTML")
+        mock_indoor.return_value = {"common_name": "Mint"}
+
+        result = plant_service.fetch_plant_any_type("mint")
+
+        assert result["provider"] == "rapidapi"
+        mock_outdoor.assert_not_called()
+
+    @patch('plant_service.fetch_perenual_plant_details')
+    def test_trial_without_verdict_is_released(self, mock_fetch, plant_circuits):
+        """Test that a half-open trial rejected by its bulkhead does not block later searches"""
+        circuit = plant_circuits['perenual']
+        circuit.record_failure("HTML")
+        circuit.record_failure("HTML")
+        circuit._opened_at -= circuit.reset_timeout_seconds
+        mock_fetch.side_effect = [BulkheadFull('perenual', retry_after=1), None]
+
+        with pytest.raises(BulkheadFull):
+            plant_service.fetch_plant_by_type("oak", 'other')
+        result = plant_service.fetch_plant_by_type("elm", 'other')
+
+        assert result is None
+        assert mock_fetch.call_count == 2
+        assert circuit.state == "half_open"
+
+    def test_stats_report_circuits(self, plant_circuits):
+        """Test that lookup stats include each circuit's state"""
+        stats = plant_service.get_plant_lookup_stats()
+
+        assert stats["circuits"]["perenual"]["state"] == "closed"
@@ -0,0 +1,136 @@
+"""
+Unit tests for api/profile.py
+
+Tests local token verification for the profile routes and the fallback
+to the Supabase user endpoint. Uses mocking for both.
+"""
+
+import pytest
+from unittest.mock import Mock, patch
+import sys
+import os
+import time
+
+# Add backend directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import jwt
+from flask import Flask
+
+from api import profile
+
+
+@pytest.fixture(autouse=True)
+def clear_profile_caches():
+    """Start every test with empty profile caches"""
+    profile.PROFILE_CACHE.clear()
+    profile.PROFILE_CHANGES.clear()
+    yield
+    profile.PROFILE_CACHE.clear()
+    profile.PROFILE_CHANGES.clear()
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(profile.profile_bp, url_prefix='/api/v1')
+    return app.test_client()
+
+
+AUTH = {"Authorization": "Bearer test-token"}
+CLAIMS = {"sub": "user-123", "email": "old@example.com", "iat": int(time.time()) - 10}
+
+
+def _remote_user(email="old@example.com"):
+    response = Mock()
+    response.status_code = 200
+    response.json.return_value = {
+        "id": "user-123",
+        "email": email,
+        "created_at": "2025-01-01T00:00:00Z",
+    }
+    return response
+
+
+class TestGetUserFromToken:
+    """Test the local-first user lookup"""
+
+    @patch('api.profile.http_client.get')
+    @patch('api.profile.auth_service.verify_access_token', return_value=CLAIMS)
+    def test_claims_used_without_remote_call(self, mock_verify, mock_get):
+        """Test that id/email come straight from the verified claims"""
+        user_data, error, status = profile.get_user_from_token(
+            "Bearer test-token")
+
+        assert error is None
+        assert user_data == {"id": "user-123", "email": "old@example.com"}
+        mock_get.assert_not_called()
+
+    @patch('api.profile.auth_service.verify_access_token',
+           side_effect=jwt.ExpiredSignatureError)
+    def test_invalid_token_returns_401(self, mock_verify):
+        """Test that a locally rejected token is a 401"""
+        user_data, error, status = profile.get_user_from_token(
+            "Bearer test-token")
+
+        assert user_data is None
+        assert status == 401
+
+    @patch('api.profile.http_client.get', return_value=_remote_user())
+    @patch('api.profile.auth_service.verify_access_token',
+           return_value={"sub": "user-123"})
+    def test_missing_claims_fall_back_to_remote(self, mock_verify, mock_get):
+        """Test that a token without an email claim uses Supabase"""
+        user_data, error, status = profile.get_user_from_token(
+            "Bearer test-token")
+
+        assert user_data["email"] == "old@example.com"
+        mock_get.assert_called_once()
+
+    @patch('api.profile.http_client.get', return_value=_remote_user())
+    @patch('api.profile.auth_service.verify_access_token',
+           side_effect=ValueError("SUPABASE_JWT_X missing"))
+    def test_misconfigured_key_falls_back_to_remote(self, mock_verify, mock_get):
+        """Test that Supabase verifies the token if local keys are missing"""
+        user_data, error, status = profile.get_user_from_token(
+            "Bearer test-token")
+
+        assert error is None
+        mock_get.assert_called_once()
+
+
+class TestProfileRoutes:
+    """Test the profile endpoints"""
+
+    @patch('api.profile.http_client.get', return_value=_remote_user())
+    @patch('api.profile.auth_service.verify_access_token', return_value=CLAIMS)
+    def test_profile_read_cached_per_user(self, mock_verify, mock_get, client):
+        """Test that created_at is fetched once and then served from cache"""
+        first = client.get('/api/v1/profile', headers=AUTH)
+        second = client.get('/api/v1/profile', headers=AUTH)
+
+        assert first.status_code == 200
+        assert second.get_json()["created_at"] == "2025-01-01T00:00:00Z"
+        assert mock_get.call_count == 1
+
+    @patch('api.profile.http_client.patch')
+    @patch('api.profile.http_client.put')
+    @patch('api.profile.http_client.get')
+    @patch('api.profile.auth_service.verify_access_token', return_value=CLAIMS)
+    def test_email_change_marks_claims_stale(self, mock_verify, mock_get,
+                                             mock_put, mock_patch, client):
+        """Test that claims issued before an email change are not trusted"""
+        mock_put.return_value = Mock(status_code=200)
+        mock_patch.return_value = Mock(status_code=204)
+        mock_get.return_value = _remote_user(email="new@example.com")
+
+        response = client.put('/api/v1/profile/email', headers=AUTH,
+                              json={"email": "new@example.com"})
+        assert response.status_code == 200
+        mock_get.assert_not_called()
+
+        user_data, error, status = profile.get_user_from_token(
+            "Bearer test-token")
+
+        assert user_data["email"] == "new@example.com"
+        mock_get.assert_called_once()
@@ -0,0 +1,366 @@
+"""
+Unit tests for sqlite_backend.py
+
+Runs the db_service functions against the embedded SQLite backend (an
+in-memory database per test) to check it behaves like the Supabase one.
+"""
+
+import pytest
+from unittest.mock import patch
+import sys
+import os
+
+# Add backend directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import db_service
+from sqlite_backend import SQLiteAPIError, SQLiteClient
+
+
+@pytest.fixture
+def client():
+    """A fresh in-memory database wired in as db_service's backend"""
+    sqlite_client = SQLiteClient(':memory:')
+    db_service.COLLECTION_ID_CACHE.clear()
+    db_service.FORUM_FEED_CACHE.clear()
+    db_service.AUTHOR_CACHE.clear()
+    with patch('db_service.supabase', sqlite_client), \
+            patch('db_service._save_plant_rpc_available', True), \
+            patch('db_service._collection_summaries_rpc_available', True), \
+            patch('db_service._comment_replies_rpc_available', True):
+        yield sqlite_client
+    db_service.COLLECTION_ID_CACHE.clear()
+    db_service.FORUM_FEED_CACHE.clear()
+    db_service.AUTHOR_CACHE.clear()
+
+
+class TestQueryBuilder:
+    """Test the supabase-py compatible query builder"""
+
+    def test_insert_returns_row_with_defaults(self, client):
+        """Test that inserts return the stored row with id and timestamp"""
+        response = client.table('collections').insert(
+            {"user_id": "u1", "collection_name": "Herbs"}).execute()
+
+        row = response.data[0]
+        assert row["id"] == 1
+        assert row["created_at"]
+
+    def test_count_ignores_limit(self, client):
+        """Test that count='exact' counts every matching row"""
+        for name in ("A", "B", "C"):
+            client.table('collections').insert(
+                {"user_id": "u1", "collection_name": name}).execute()
+
+        response = client.table('collections').select(
+            'id', count='exact').eq('user_id', 'u1').limit(1).execute()
+
+        assert len(response.data) == 1
+        assert response.count == 3
+
+    def test_unique_violation_code(self, client):
+        """Test that duplicates raise the Postgres unique violation code"""
+        client.table('collections').insert(
+            {"user_id": "u1", "collection_name": "Herbs"}).execute()
+
+        with pytest.raises(SQLiteAPIError) as error:
+            client.table('collections').insert(
+                {"user_id": "u1", "collection_name": "Herbs"}).execute()
+
+        assert error.value.code == '23505'
+
+    def test_unknown_column_rejected(self, client):
+        """Test that identifiers are validated against the schema"""
+        with pytest.raises(SQLiteAPIError) as error:
+            client.table('collections').select('*').eq(
+                'name; drop table collections', 'x').execute()
+
+        assert error.value.code == '42703'
+
+    def test_or_filter_with_nested_and(self, client):
+        """Test the PostgREST logic filter syntax used by keyset paging"""
+        for title, created_at in (("a", "2025-01-01T00:00:00.000000+00:00"),
+                                  ("b", "2025-01-02T00:00:00.000000+00:00"),
+                                  ("c", "2025-01-02T00:00:00.000000+00:00")):
+            client.table('forum_posts').insert(
+                {"title": title, "created_at": created_at}).execute()
+
+        response = client.table('forum_posts').select('title').or_(
+            'created_at.lt."2025-01-02T00:00:00.000000+00:00",'
+            'and(created_at.eq."2025-01-02T00:00:00.000000+00:00",id.lt.3)'
+        ).order('id').execute()
+
+        assert [row["title"] for row in response.data] == ["a", "b"]
+
+    def test_json_path_columns(self, client):
+        """Test PostgREST JSON path selection with aliases"""
+        client.table('collections').insert(
+            {"user_id": "u1", "collection_name": "Herbs"}).execute()
+        client.table('collection_plants').insert({
+            "collection_id": 1,
+            "common_name": "Basil",
+            "plant_details_json": {"care_instructions": {"light": "Full sun"},
+                                   "tags": ["herb"]},
+        }).execute()
+
+        response = client.table('collection_plants').select(
+            'common_name, light:plant_details_json->care_instructions->>light, '
+            'plant_details_json->>tags, plant_details_json->missing->>x'
+        ).execute()
+
+        assert response.data == [{"common_name": "Basil", "light": "Full sun",
+                                  "tags": '["herb"]', "x": None}]
+
+    def test_unknown_rpc_reports_missing_function(self, client):
+        """Test that unknown functions use PostgREST's missing-RPC code"""
+        with pytest.raises(SQLiteAPIError) as error:
+            client.rpc('no_such_function', {}).execute()
+
+        assert error.value.code == 'PGRST202'
+
+    def test_reply_previews_rpc_caps_rows(self, client):
+        """Test that the reply preview RPC returns counts but few rows"""
+        post_id = client.table('forum_posts').insert(
+            {"user_id": "u1", "title": "T", "content": "C"}).execute().data[0]["id"]
+        parent = client.table('forum_comments').insert(
+            {"post_id": post_id, "content": "Top"}).execute().data[0]["id"]
+        for i in range(5):
+            client.table('forum_comments').insert(
+                {"post_id": post_id, "content": f"Reply {i}",
+                 "parent_comment_id": parent}).execute()
+
+        response = client.rpc('comment_reply_previews', {
+            "p_parent_ids": [parent, parent + 100], "p_preview": 2}).execute()
+
+        [row] = response.data
+        assert row["parent_comment_id"] == parent
+        assert row["reply_count"] == 5
+        assert [r["content"] for r in row["replies"]] == ["Reply 0", "Reply 1"]
+        assert "reply_rank" not in row["replies"][0]
+
+
+class TestCollectionsOnSQLite:
+    """Test the collection functions end to end on SQLite"""
+
+    PLANT = {"common_name": "Basil", "scientific_name": "Ocimum basilicum"}
+
+    def test_save_and_list_collections(self, client):
+        """Test saving via the RPC port and reading with embedded plants"""
+        assert db_service.save_plant_to_collection(
+            "u1", self.PLANT, "Herbs")["status"] == "success"
+        # Second save finds the existing collection
+        db_service.save_plant_to_collection(
+            "u1", {"common_name": "Mint"}, "Herbs")
+
+        result = db_service.get_user_collections(
+            "u1", fields=["id", "common_name"])
+
+        assert list(result["data"]) == ["Herbs"]
+        assert [p["common_name"] for p in result["data"]["Herbs"]] == [
+            "Basil", "Mint"]
+        assert "plant_details_json" not in result["data"]["Herbs"][0]
+
+    def test_collection_renamed_elsewhere(self, client):
+        """Test that a rename by another worker cannot receive the next save"""
+        db_service.save_plant_to_collection("u1", self.PLANT, "Herbs")
+        # Another process renames it, so this cache is not invalidated
+        client.table('collections').update(
+            {"collection_name": "Kitchen"}).eq('user_id', 'u1').execute()
+
+        db_service.save_plant_to_collection("u1", {"common_name": "Mint"}, "Herbs")
+
+        collections = db_service.get_user_collections("u1")["data"]
+        assert [p["common_name"] for p in collections["Herbs"]] == ["Mint"]
+        assert [p["common_name"] for p in collections["Kitchen"]] == ["Basil"]
+
+    def test_collection_deleted_elsewhere_without_rpc(self, client):
+        """Test that a stale cached id is dropped when its collection is gone"""
+        with patch('db_service._save_plant_rpc_available', False):
+            db_service.save_plant_to_collection("u1", self.PLANT, "Herbs")
+            stale_id = db_service.COLLECTION_ID_CACHE.get(("u1", "Herbs"))
+            client.table('collections').delete().eq('id', stale_id).execute()
+
+            result = db_service.save_plant_to_collection(
+                "u1", {"common_name": "Mint"}, "Herbs")
+
+        assert result["status"] == "success"
+        assert result["data"][0]["collection_id"] != stale_id
+        assert db_service.COLLECTION_ID_CACHE.get(
+            ("u1", "Herbs")) == result["data"][0]["collection_id"]
+
+    def test_plant_details_round_trip_as_json(self, client):
+        """Test that plant_details_json comes back as a dict"""
+        db_service.save_plant_to_collection("u1", self.PLANT, "Herbs")
+
+        plants = db_service.get_user_collections("u1")["data"]["Herbs"]
+
+        assert plants[0]["plant_details_json"] == self.PLANT
+
+    def test_summaries_count_plants(self, client):
+        """Test the collection_summaries port"""
+        db_service.create_empty_collection("u1", "Empty")
+        db_service.save_plant_to_collection("u1", self.PLANT, "Herbs")
+        db_service.save_plant_to_collection("u1", self.PLANT, "Herbs")
+
+        result = db_service.get_collection_summaries("u1")
+
+        counts = {s["collection_name"]: s["plant_count"] for s in result["data"]}
+        assert counts == {"Empty": 0, "Herbs": 2}
+
+    def test_duplicate_collection_name(self, client):
+        """Test that creating an existing collection reports the conflict"""
+        db_service.create_empty_collection("u1", "Herbs")
+
+        result = db_service.create_empty_collection("u1", "Herbs")
+
+        assert result["status"] == "error"
+        assert result["code"] == '23505'
+
+    def test_planning_fields(self, client):
+        """Test the planning field query against the JSON details"""
+        db_service.save_plant_to_collection("u1", {
+            "common_name": "Basil",
+            "description": "Long text",
+            "care_instructions": {"light": "Full sun", "watering": "Moderate"},
+        }, "Herbs")
+
+        result = db_service.get_collection_planning_fields("u1", "Herbs")
+        missing = db_service.get_collection_planning_fields("u1", "Nope")
+
+        assert result["data"] == [{
+            "common_name": "Basil", "scientific_name": None, "light": "Full sun",
+            "watering": "Moderate", "ideal_temp": None,
+        }]
+        assert missing["code"] == "collection_not_found"
+
+    def test_rename_and_delete_cascade(self, client):
+        """Test rename plus ON DELETE CASCADE of the plants"""
+        db_service.save_plant_to_collection("u1", self.PLANT, "Herbs")
+
+        assert db_service.rename_collection(
+            "u1", "Herbs", "Kitchen")["status"] == "success"
+        db_service.delete_collection_container("u1", "Kitchen")
+
+        assert db_service.get_user_collections("u1")["status"] == "empty"
+        plants = client.table('collection_plants').select('*').execute()
+        assert plants.data == []
+
+
+class TestForumOnSQLite:
+    """Test the forum functions end to end on SQLite"""
+
+    def test_feed_pages_with_cursor(self, client):
+        """Test keyset paging through the feed"""
+        for i in range(5):
+            db_service.create_forum_post("u1", f"Post {i}", "Body")
+
+        first = db_service.get_recent_forum_posts(limit=2)
+        second = db_service.get_recent_forum_posts(
+            limit=2, cursor=first["next_cursor"])
+        third = db_service.get_recent_forum_posts(
+            limit=2, cursor=second["next_cursor"])
+
+        titles = [p["title"] for page in (first, second, third)
+                  for p in page["data"]]
+        assert titles == [f"Post {i}" for i in (4, 3, 2, 1, 0)]
+        assert third["next_cursor"] is None
+
+    def test_post_with_comment_tree_and_authors(self, client):
+        """Test the embedded comment tree and author lookup"""
+        client.table('profiles').insert(
+            {"id": "u1", "email": "one@example.com"}).execute()
+        post_id = db_service.create_forum_post(
+            "u1", "Hello", "Body")["data"][0]["id"]
+        top = db_service.create_forum_comment(
+            "u1", post_id, "Top")["data"][0]["id"]
+        db_service.create_forum_comment("u2", post_id, "Reply",
+                                        parent_comment_id=top)
+
+        result = db_service.get_forum_post(post_id, include_comments=True)
+
+        post = result["data"]
+        assert post["author_email"] == "one@example.com"
+        assert post["comment_count"] == 2
+        assert post["comments"][0]["reply_count"] == 1
+        assert post["comments"][0]["replies"][0]["author_email"] == "Anonymous User"
+
+    def test_comment_tree_pages_one_level(self, client):
+        """Test that the paged tree counts every comment and expands by parent"""
+        post_id = db_service.create_forum_post(
+            "u1", "Hello", "Body")["data"][0]["id"]
+        tops = [db_service.create_forum_comment(
+            "u1", post_id, f"Top {i}")["data"][0]["id"] for i in range(3)]
+        for i in range(3):
+            db_service.create_forum_comment("u2", post_id, f"Reply {i}",
+                                            parent_comment_id=tops[0])
+
+        first = db_service.get_comment_tree(post_id, limit=2)
+        second = db_service.get_comment_tree(
+            post_id, limit=2, cursor=first["next_cursor"])
+        replies = db_service.get_comment_tree(
+            post_id, parent_id=tops[0], limit=2)
+
+        assert first["comment_count"] == 6
+        assert [c["id"] for c in first["data"]] == tops[:2]
+        assert first["data"][0]["reply_count"] == 3
+        assert [c["id"] for c in second["data"]] == tops[2:]
+        assert second["next_cursor"] is None
+        assert [c["content"] for c in replies["data"]] == ["Reply 0", "Reply 1"]
+        assert replies["next_cursor"]
+
+    def test_comment_tree_parent_checks(self, client):
+        """Test leaf expansions versus parents outside the post"""
+        post_id = db_service.create_forum_post(
+            "u1", "Hello", "Body")["data"][0]["id"]
+        leaf = db_service.create_forum_comment(
+            "u1", post_id, "Leaf")["data"][0]["id"]
+
+        expanded = db_service.get_comment_tree(post_id, parent_id=leaf)
+        missing = db_service.get_comment_tree(post_id, parent_id=leaf + 100)
+
+        assert expanded["status"] == "success"
+        assert expanded["data"] == []
+        assert missing["code"] == "parent_not_found"
+
+    @pytest.mark.parametrize("rpc_available", [True, False])
+    @patch('db_service.COMMENT_TREE_DEPTH', 2)
+    @patch('db_service.COMMENT_REPLY_PREVIEW', 2)
+    def test_comment_tree_previews(self, client, rpc_available):
+        """Test reply previews and depth cut-off, with and without the RPC"""
+        post_id = db_service.create_forum_post(
+            "u1", "Hello", "Body")["data"][0]["id"]
+        top = db_service.create_forum_comment(
+            "u1", post_id, "Top")["data"][0]["id"]
+        replies = [db_service.create_forum_comment(
+            "u2", post_id, f"Reply {i}", parent_comment_id=top)["data"][0]["id"]
+            for i in range(3)]
+        db_service.create_forum_comment("u3", post_id, "Deep",
+                                        parent_comment_id=replies[0])
+
+        with patch('db_service._comment_replies_rpc_available', rpc_available):
+            root = db_service.get_comment_tree(post_id)["data"][0]
+
+        assert root["reply_count"] == 3
+        assert root["has_more_replies"] is True
+        assert [c["id"] for c in root["replies"]] == replies[:2]
+        level_two = root["replies"][0]
+        assert level_two["replies"] == []
+        assert level_two["reply_count"] == 1
+        assert level_two["has_more_replies"] is True
+        assert root["replies"][1]["reply_count"] == 0
+
+
+class TestStorageClientSelection:
+    """Test DB_BACKEND selection"""
+
+    def test_sqlite_backend_selected(self, tmp_path):
+        """Test that DB_BACKEND=sqlite opens the embedded database"""
+        with patch('db_service.SQLITE_DB_PATH', str(tmp_path / "dev.sqlite3")):
+            storage = db_service.create_storage_client('sqlite')
+
+        assert isinstance(storage, SQLiteClient)
+        assert (tmp_path / "dev.sqlite3").exists()
+
+    def test_unknown_backend(self):
+        """Test that an unknown backend name yields no client"""
+        assert db_service.create_storage_client('mysql') is None
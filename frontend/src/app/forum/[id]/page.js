@@ -160,9 +160,29 @@ const styles = {
     },
 };
 
-function CommentComponent({ comment, onReply, replyingTo, replyContent, setReplyContent, handleReplySubmit, cancelReply, getReplies, isAuthenticated }) {
+// Returns a copy of the comment tree with fn applied to the node with the given id
+function updateCommentNode(nodes, commentId, fn) {
+    return nodes.map(node => {
+        if (node.id === commentId) return fn(node);
+        if (!node.replies || node.replies.length === 0) return node;
+        return { ...node, replies: updateCommentNode(node.replies, commentId, fn) };
+    });
+}
+
+function findCommentNode(nodes, commentId) {
+    for (const node of nodes) {
+        if (node.id === commentId) return node;
+        const found = findCommentNode(node.replies || [], commentId);
+        if (found) return found;
+    }
+    return null;
+}
+
+function CommentComponent({ comment, onReply, replyingTo, replyContent, setReplyContent, handleReplySubmit, cancelReply, onLoadReplies, isAuthenticated }) {
     const isNested = !!comment.parent_comment_id;
-    const replies = getReplies(comment.id);
+    // Replies arrive already nested from the server
+    const replies = comment.replies || [];
+    const hiddenReplies = (comment.reply_count || 0) - replies.length;
 
     return (
         <div style={isNested ? { ...styles.comment, ...styles.nestedComment } : styles.comment}>
@@ -218,10 +238,18 @@ function CommentComponent({ comment, onReply, replyingTo, replyContent, setReply
                     setReplyContent={setReplyContent}
                     handleReplySubmit={handleReplySubmit}
                     cancelReply={cancelReply}
-                    getReplies={getReplies}
+                    onLoadReplies={onLoadReplies}
                     isAuthenticated={isAuthenticated}
                 />
             ))}
+
+            {/* Deep or long subtrees are loaded on demand */}
+            {comment.has_more_replies && (
+                <button onClick={() => onLoadReplies(comment.id)} style={styles.replyButton}>
+                    <LuMessageSquare size={14} />
+                    {hiddenReplies > 0 ? `Show ${hiddenReplies} more ${hiddenReplies === 1 ? 'reply' : 'replies'}` : 'Show more replies'}
+                </button>
+            )}
         </div>
     );
 }
@@ -233,6 +261,8 @@ export default function ForumPostDetail() {
 
     const [post, setPost] = useState(null);
     const [comments, setComments] = useState([]);
+    const [commentCount, setCommentCount] = useState(0);
+    const [commentsCursor, setCommentsCursor] = useState(null);
     const [isLoading, setIsLoading] = useState(true);
     const [newComment, setNewComment] = useState('');
     const [replyingTo, setReplyingTo] = useState(null);
@@ -245,29 +275,35 @@ export default function ForumPostDetail() {
                 const token = localStorage.getItem('supabase.token');
                 const headers = token ? { 'Authorization': `Bearer ${token}` } : {};
 
-                // Fetch all posts and find the one we need
-                const postResponse = await fetch(`http://localhost:5000/api/v1/forum/posts`, { headers });
-                const postsData = await postResponse.json();
-                const foundPost = postsData.find(p => p.id === postId);
-                setPost(foundPost);
-
-                // Fetch comments for this post
-                console.log('Fetching comments for post:', postId);
-                const commentsResponse = await fetch(
-                    `http://localhost:5000/api/v1/forum/posts/${postId}/comments`,
+                // Fetch the post with its comments embedded in a single request
+                console.log('Fetching post with comments:', postId);
+                const postResponse = await fetch(
+                    `http://localhost:5000/api/v1/forum/posts/${postId}?include=comments`,
                     { headers }
                 );
-                
-                console.log('Comments response status:', commentsResponse.status);
-                const commentsData = await commentsResponse.json();
-                console.log('Comments data received:', commentsData);
-                
-                // Handle both array response and error response
+
+                console.log('Post response status:', postResponse.status);
+                if (!postResponse.ok) {
+                    // 404 leaves post as null so "Post not found." is shown
+                    setPost(null);
+                    setComments([]);
+                    return;
+                }
+
+                const postData = await postResponse.json();
+                const {
+                    comments: commentsData,
+                    comment_count: totalComments,
+                    comments_next_cursor: nextCursor,
+                    ...foundPost
+                } = postData;
+                setPost(foundPost);
+
+                // First page of top-level comments, with replies nested by the server
                 if (Array.isArray(commentsData)) {
                     setComments(commentsData);
-                } else if (commentsData.error) {
-                    console.error('Error fetching comments:', commentsData.error);
-                    setComments([]);
+                    setCommentCount(totalComments || 0);
+                    setCommentsCursor(nextCursor || null);
                 } else {
                     setComments([]);
                 }
@@ -282,6 +318,53 @@ export default function ForumPostDetail() {
         fetchPostAndComments();
     }, [postId]);
 
+    const fetchCommentPage = async (params) => {
+        const query = new URLSearchParams(params).toString();
+        const response = await fetch(
+            `http://localhost:5000/api/v1/forum/posts/${postId}/comments?${query}`
+        );
+        if (!response.ok) {
+            throw new Error(`Failed to load comments. Status: ${response.status}`);
+        }
+        const data = await response.json();
+        return { data: Array.isArray(data) ? data : [], nextCursor: response.headers.get('X-Next-Cursor') };
+    };
+
+    const handleLoadMoreComments = async () => {
+        if (!commentsCursor) return;
+        try {
+            const { data, nextCursor } = await fetchCommentPage({ cursor: commentsCursor });
+            setComments(prev => [...prev, ...data]);
+            setCommentsCursor(nextCursor);
+        } catch (e) {
+            console.error("Error loading comments:", e);
+        }
+    };
+
+    const handleLoadReplies = async (commentId) => {
+        try {
+            // Continue from the last reply already shown under this comment
+            const cursorNode = findCommentNode(comments, commentId);
+            const params = { parent: commentId };
+            if (cursorNode && cursorNode.replies_cursor) {
+                params.cursor = cursorNode.replies_cursor;
+            }
+
+            const { data, nextCursor } = await fetchCommentPage(params);
+            setComments(prev => updateCommentNode(prev, commentId, node => {
+                const merged = params.cursor ? [...node.replies, ...data] : data;
+                return {
+                    ...node,
+                    replies: merged,
+                    has_more_replies: !!nextCursor,
+                    replies_cursor: nextCursor,
+                };
+            }));
+        } catch (e) {
+            console.error("Error loading replies:", e);
+        }
+    };
+
     const handleCommentSubmit = async (e) => {
         e.preventDefault();
         if (!isAuthenticated) {
@@ -323,8 +406,12 @@ export default function ForumPostDetail() {
                     author_email: 'You',
                     created_at: new Date().toISOString(),
                     parent_comment_id: null,
+                    replies: [],
+                    reply_count: 0,
+                    has_more_replies: false,
                 };
                 setComments([...comments, newCommentObj]);
+                setCommentCount(count => count + 1);
                 setNewComment('');
                 alert('Comment posted successfully!');
             } else {
@@ -373,8 +460,16 @@ export default function ForumPostDetail() {
                     author_email: 'You',
                     created_at: new Date().toISOString(),
                     parent_comment_id: parentId,
+                    replies: [],
+                    reply_count: 0,
+                    has_more_replies: false,
                 };
-                setComments([...comments, newReply]);
+                setComments(updateCommentNode(comments, parentId, node => ({
+                    ...node,
+                    replies: [...(node.replies || []), newReply],
+                    reply_count: (node.reply_count || 0) + 1,
+                })));
+                setCommentCount(count => count + 1);
                 setReplyContent('');
                 setReplyingTo(null);
                 alert('Reply posted successfully!');
@@ -397,10 +492,6 @@ export default function ForumPostDetail() {
         setReplyContent('');
     };
 
-    // Organize comments into threads
-    const topLevelComments = comments.filter(c => !c.parent_comment_id);
-    const getReplies = (commentId) => comments.filter(c => c.parent_comment_id === commentId);
-
     if (isLoading) return <p style={{ textAlign: 'center', padding: '3rem' }}>Loading post...</p>;
     if (!post) return <p style={{ textAlign: 'center', padding: '3rem' }}>Post not found.</p>;
 
@@ -428,7 +519,7 @@ export default function ForumPostDetail() {
             <div style={styles.commentsSection}>
                 <h2 style={styles.commentsTitle}>
                     <LuMessageSquare size={24} />
-                    Comments ({comments.length})
+                    Comments ({commentCount})
                 </h2>
 
                 {isAuthenticated ? (
@@ -453,12 +544,12 @@ export default function ForumPostDetail() {
                     </div>
                 )}
 
-                {topLevelComments.length === 0 ? (
+                {comments.length === 0 ? (
                     <p style={{ textAlign: 'center', color: GRAY_TEXT, padding: '2rem' }}>
                         No comments yet. Be the first to share your thoughts!
                     </p>
                 ) : (
-                    topLevelComments.map(comment => (
+                    comments.map(comment => (
                         <CommentComponent 
                             key={comment.id} 
                             comment={comment}
@@ -468,11 +559,17 @@ export default function ForumPostDetail() {
                             setReplyContent={setReplyContent}
                             handleReplySubmit={handleReplySubmit}
                             cancelReply={cancelReply}
-                            getReplies={getReplies}
+                            onLoadReplies={handleLoadReplies}
                             isAuthenticated={isAuthenticated}
                         />
                     ))
                 )}
+
+                {commentsCursor && (
+                    <button onClick={handleLoadMoreComments} style={styles.replyButton}>
+                        Load more comments
+                    </button>
+                )}
             </div>
         </div>
     );
@@ -161,6 +161,16 @@ const styles = {
         fontWeight: '600',
         cursor: 'pointer',
     },
+    loadMoreButton: {
+        width: '100%',
+        padding: '0.75rem',
+        background: 'none',
+        border: `1px solid ${GRAY_BORDER}`,
+        borderRadius: '0.75rem',
+        color: GREEN_PRIMARY,
+        fontWeight: '600',
+        cursor: 'pointer',
+    },
     emptyState: {
         textAlign: 'center',
         padding: '2rem',
@@ -199,7 +209,7 @@ export default function ForumPage() {
     const { isAuthenticated, isChecking } = useRequireAuth();
     
     // ViewModel hook - handles all business logic
-    const { posts, isLoading, error, isPosting, createPost } = useForumPosts();
+    const { posts, isLoading, error, isPosting, hasMore, isLoadingMore, createPost, loadMorePosts } = useForumPosts();
     
     // Local UI state only
     const [newPostTitle, setNewPostTitle] = useState('');
@@ -304,6 +314,15 @@ export default function ForumPage() {
                             />
                         ))
                     )}
+                    {hasMore && (
+                        <button
+                            onClick={loadMorePosts}
+                            style={styles.loadMoreButton}
+                            disabled={isLoadingMore}
+                        >
+                            {isLoadingMore ? 'Loading...' : 'Load older threads'}
+                        </button>
+                    )}
                 </div>
             </div>
             
@@ -4,6 +4,37 @@ import { useState } from 'react';
 import { useRouter } from 'next/navigation';
 import { authenticatedFetch } from '../utils/api';
 
+/**
+ * Reads a Server-Sent Events response body and calls onEvent(event, data)
+ * for every event, with data parsed from JSON.
+ */
+const readPlanStream = async (apiResponse, onEvent) => {
+    const reader = apiResponse.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            let data = '';
+            for (const line of rawEvent.split('\n')) {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            }
+            if (data) onEvent(event, JSON.parse(data));
+        }
+    }
+};
+
 /**
  * ViewModel Hook for managing the AI Garden Planner chat session.
  * Handles state, user input, and secure API communication.
@@ -27,23 +58,27 @@ export const useAIPlanner = () => {
         setPrompt(''); // Clear the input immediately after submission
 
         try {
-            const apiResponse = await authenticatedFetch('/ai/plan', {
+            // Streaming endpoint: the plan arrives as Server-Sent Events
+            const apiResponse = await authenticatedFetch('/ai/plan/stream', {
                 method: 'POST',
                 body: JSON.stringify(payload),
             });
 
             if (!apiResponse.ok) {
                 const errorData = await apiResponse.json();
-                throw new Error(errorData.message || `Server error (Status ${apiResponse.status}).`);
+                throw new Error(errorData.message || errorData.error || `Server error (Status ${apiResponse.status}).`);
             }
 
-            const data = await apiResponse.json();
-
-            if (data.status === 'success') {
-                setResponse(data.plan);
-            } else {
-                throw new Error(data.message || "Plan generation failed.");
-            }
+            await readPlanStream(apiResponse, (event, data) => {
+                if (event === 'chunk') {
+                    setResponse(prev => (prev || '') + data.text);
+                } else if (event === 'done') {
+                    // The assembled plan replaces the streamed pieces
+                    setResponse(data.plan);
+                } else if (event === 'error') {
+                    throw new Error(data.message || "Plan generation failed.");
+                }
+            });
 
         } catch (err) {
             if (err.message.includes('Session expired')) {
@@ -30,7 +30,9 @@ export const useCollectionPicker = () => {
             try {
                 console.log('Fetching collections from API');
 
-                const response = await authenticatedFetch('/collections', {
+                // The summary endpoint returns names and counts only (no plant bodies)
+                // and supports ETag revalidation, so reopening the picker is cheap.
+                const response = await authenticatedFetch('/collections/summary', {
                     method: 'GET',
                 });
 
@@ -41,21 +43,11 @@ export const useCollectionPicker = () => {
                     throw new Error(errorData.message || `Failed to load collections.`);
                 }
 
-                const apiResponse = await response.json();
-                console.log('Raw API Response:', apiResponse);
+                const summaries = await response.json();
 
-                // The backend returns collections directly as an object keyed by collection name
-                // Example: { "Favorites": [...], "wishlist": [...] }
-                // OR wrapped in a data field: { data: { "Favorites": [...] } }
-
-                const collectionsData = apiResponse.data || apiResponse;
-
-                if (collectionsData && typeof collectionsData === 'object') {
-                    console.log('Collections data:', collectionsData);
-                    console.log('Type of data:', typeof collectionsData);
-
-                    // Extract just the names into an array
-                    const names = Object.keys(collectionsData);
+                // Example: [{ "id": 1, "collection_name": "Favorites", "plant_count": 3, ... }]
+                if (Array.isArray(summaries)) {
+                    const names = summaries.map(summary => summary.collection_name);
                     console.log('Collection names extracted:', names);
                     setCollections(names);
                 } else {
@@ -13,6 +13,9 @@ export const useForumPosts = () => {
     const [isLoading, setIsLoading] = useState(true);
     const [error, setError] = useState(null);
     const [isPosting, setIsPosting] = useState(false);
+    // Keyset pagination: cursor for the next (older) page, null on the last page
+    const [nextCursor, setNextCursor] = useState(null);
+    const [isLoadingMore, setIsLoadingMore] = useState(false);
 
     // Fetch posts (on mount)
     useEffect(() => {
@@ -24,7 +27,8 @@ export const useForumPosts = () => {
         setError(null);
 
         try {
-            const response = await authenticatedFetch('/forum/posts', {
+            // Excerpts only; the thread page loads the full post
+            const response = await authenticatedFetch('/forum/posts?excerpt=true', {
                 method: 'GET',
             });
 
@@ -35,6 +39,7 @@ export const useForumPosts = () => {
 
             const data = await response.json();
             setPosts(Array.isArray(data) ? data : []);
+            setNextCursor(response.headers.get('X-Next-Cursor'));
 
         } catch (e) {
             if (e.message.includes('Session expired')) {
@@ -47,6 +52,38 @@ export const useForumPosts = () => {
         }
     }, []);
 
+    const loadMorePosts = useCallback(async () => {
+        if (!nextCursor) return;
+
+        setIsLoadingMore(true);
+        setError(null);
+
+        try {
+            const response = await authenticatedFetch(
+                `/forum/posts?excerpt=true&cursor=${encodeURIComponent(nextCursor)}`,
+                { method: 'GET' }
+            );
+
+            if (!response.ok) {
+                const errorData = await response.json();
+                throw new Error(errorData.error || `Failed to load posts. Status: ${response.status}`);
+            }
+
+            const data = await response.json();
+            setPosts(prevPosts => [...prevPosts, ...(Array.isArray(data) ? data : [])]);
+            setNextCursor(response.headers.get('X-Next-Cursor'));
+
+        } catch (e) {
+            if (e.message.includes('Session expired')) {
+                return;
+            }
+            console.error("Forum Fetch Error:", e);
+            setError(e.message);
+        } finally {
+            setIsLoadingMore(false);
+        }
+    }, [nextCursor]);
+
     const createPost = useCallback(async (title, content) => {
         setIsPosting(true);
         setError(null);
@@ -97,9 +134,12 @@ export const useForumPosts = () => {
         isLoading,
         error,
         isPosting,
+        hasMore: !!nextCursor,
+        isLoadingMore,
         
         // Actions
         createPost,
+        loadMorePosts,
         refreshPosts: fetchPosts,
     };
 };
\ No newline at end of file
@@ -52,7 +52,8 @@ export default function AIPlannerPage() {
             borderStyle: 'solid',
         };
         
-        if (isLoading) {
+        // Once the first streamed chunk arrives the plan is shown as it grows
+        if (isLoading && !response) {
             return (
                 <div style={styles.chatBox}>
                     <LuLoader size={20} style={{marginRight: '10px', animation: 'spin 1s linear infinite'}} /> 
@@ -205,28 +205,21 @@ export default function PlantDetailPage() {
 
             console.log(`Fetching plant with type: ${plantType}${typeFromUrl ? ' (from saved plant data)' : ' (from type selector)'}`);
 
-            let API_URL = `http://localhost:5000/api/v1/plants?name=${encodeURIComponent(plantName)}&type=${plantType}`;
+            // Search both providers in one request; the backend prefers the known type
+            // and reports which one answered, so a miss no longer costs a second round trip.
+            const API_URL = `http://localhost:5000/api/v1/plants?name=${encodeURIComponent(plantName)}&type=any&prefer=${plantType}`;
 
             try {
-                let response = await fetch(API_URL);
-                let data = await response.json();
+                const response = await fetch(API_URL);
+                const data = await response.json();
 
-                // If first attempt fails, try the other plant type
                 if (!response.ok) {
-                    console.log(`Failed to fetch with type '${plantType}', trying alternate type...`);
-                    const alternateType = plantType === 'indoor' ? 'other' : 'indoor';
-                    API_URL = `http://localhost:5000/api/v1/plants?name=${encodeURIComponent(plantName)}&type=${alternateType}`;
-
-                    response = await fetch(API_URL);
-                    data = await response.json();
-
-                    if (!response.ok) {
-                        throw new Error(data.message || `Failed to fetch plant details. Status: ${response.status}`);
-                    }
+                    throw new Error(data.message || `Failed to fetch plant details. Status: ${response.status}`);
+                }
 
-                    // Update plantType to the one that worked
-                    plantType = alternateType;
-                    console.log(`Successfully found plant with type '${alternateType}'`);
+                if (data.plant_type && data.plant_type !== plantType) {
+                    console.log(`Found plant with type '${data.plant_type}' via ${data.provider}`);
+                    plantType = data.plant_type;
                 }
 
                 setPlant(data);